@@ -4,10 +4,21 @@ load_dotenv()
 print(f"GROQ_API_KEY loaded: {bool(os.getenv('GROQ_API_KEY'))}")
 print(f" GROQ_MODEL: {os.getenv('GROQ_MODEL')}")
 
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .router.upload import router as upload_router
 from .router.stream import router as stream_router
+from .router.stats import router as stats_router
+from .services.llm import llm_service
+from .services.job_store import job_store
+from .services.page_renderer import page_renderer
+from .services.reranker import reranker
+from .services.rag import rag_system
+from .services.metrics import metrics, COLLECTION_CHUNKS, JOBS, LLM_IN_FLIGHT, QUEUE_DEPTH
+from .job_queue.queue import job_queue
+from .job_queue.worker import job_worker_pool
 import uvicorn
 import shutil
 import atexit
@@ -27,7 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition", "Content-Type"],
+    expose_headers=["Content-Disposition", "Content-Type", "X-Cache"],
 )
 
 # Clean temp directory on startup
@@ -60,15 +71,46 @@ atexit.register(cleanup_on_exit)
 # Include routers
 app.include_router(upload_router)
 app.include_router(stream_router)
+app.include_router(stats_router)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start the job store and the job worker pool, and load the reranker if enabled"""
+    await job_store.start()
+    job_worker_pool.start()
+    try:
+        await asyncio.to_thread(reranker.warmup)
+    except Exception as e:
+        print(f"⚠️ Reranker warmup failed: {str(e)}")
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    """Stop background tasks, release pooled Groq connections and render workers, write pending index changes"""
+    await job_worker_pool.stop()
+    await job_store.stop()
+    await llm_service.aclose()
+    page_renderer.shutdown()
+    await asyncio.to_thread(rag_system.bm25.flush)
 
 @app.get("/health")
 async def health():
     return {
         "status": "ok",
+        "llm_backend": llm_service.backend,
         "groq_configured": bool(os.getenv("GROQ_API_KEY")),
         "groq_model": os.getenv("GROQ_MODEL")
     }
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms, counters and gauges in Prometheus text format"""
+    # Point-in-time gauges are sampled at scrape time
+    JOBS.set(await job_store.count())
+    QUEUE_DEPTH.set(job_queue.depth())
+    LLM_IN_FLIGHT.set(job_worker_pool.llm_in_flight)
+    COLLECTION_CHUNKS.set(rag_system.count())
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     if not os.getenv("GROQ_API_KEY"):
         print(" WARNING: GROQ_API_KEY is not set!")
@@ -0,0 +1,110 @@
+"""Compare chunking strategies on retrieval quality and ingestion throughput
+
+Usage (from the project root):
+    python -m backend.benchmarks.bench_chunking --queries 200 --k 1 3 5
+
+Retrieval quality is self-supervised: sentences sampled from the PDF are
+trimmed to their middle words and used as queries, and a hit means a top-k
+chunk covers the page the sentence came from. Retrieval is exact cosine
+search over the chunk embeddings, so only the chunking differs between rows.
+Throughput covers chunking plus embedding (extraction is timed once, apart).
+"""
+import argparse
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.services.chunking import Chunker, split_sentences
+from backend.services.embeddings import embedding_engine
+from backend.services.pdf_loader import pdf_loader
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "data", "uploads", "transcriptreliance.pdf")
+
+CONFIGS = [
+    ("words (500, legacy)", dict(strategy="words", chunk_words=500)),
+    ("tokens 200/0", dict(strategy="tokens", chunk_tokens=200, overlap=0)),
+    ("tokens 200/40", dict(strategy="tokens", chunk_tokens=200, overlap=40)),
+    ("sentence 200/40", dict(strategy="sentence", chunk_tokens=200, overlap=40)),
+    ("sentence 128/32", dict(strategy="sentence", chunk_tokens=128, overlap=32)),
+    ("paragraph 200/40", dict(strategy="paragraph", chunk_tokens=200, overlap=40)),
+]
+
+
+def build_queries(pages: List[Tuple[int, str]], count: int, seed: int) -> List[Tuple[str, int]]:
+    """(query, gold page) pairs from sentences of at least 12 words"""
+    candidates = []
+    for page, text in pages:
+        for sentence in split_sentences(text):
+            words = sentence.split()
+            if len(words) >= 12:
+                # Drop the edges so queries aren't verbatim chunk boundaries
+                trim = len(words) // 5
+                candidates.append((" ".join(words[trim:len(words) - trim]), page))
+
+    random.Random(seed).shuffle(candidates)
+    return candidates[:count]
+
+
+def evaluate(chunks: List[Dict], embeddings: np.ndarray, query_vectors: np.ndarray, gold: List[int], ks: List[int]) -> Dict:
+    spans = [(c['metadata'].get('page_start', c['page']), c['metadata'].get('page_end', c['page'])) for c in chunks]
+    ranking = np.argsort(-(query_vectors @ embeddings.T), axis=1)
+
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    for row, page in zip(ranking, gold):
+        first = next((rank for rank, i in enumerate(row) if spans[i][0] <= page <= spans[i][1]), None)
+        reciprocal_ranks.append(1 / (first + 1) if first is not None else 0.0)
+        for k in ks:
+            hits[k] += first is not None and first < k
+
+    return {
+        **{f"hit@{k}": hits[k] / len(gold) for k in ks},
+        "mrr": float(np.mean(reciprocal_ranks))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=SAMPLE_PDF)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages = [(page, text) for page, _, text in pdf_loader.iter_pages(args.pdf) if text.strip()]
+    extract_seconds = time.perf_counter() - start
+
+    queries = build_queries(pages, args.queries, args.seed)
+    query_vectors = embedding_engine.embed([query for query, _ in queries])
+    gold = [page for _, page in queries]
+    limit = embedding_engine.max_tokens - 2
+
+    print(f"{os.path.basename(args.pdf)}: {len(pages)} pages, extracted in {extract_seconds:.2f}s, {len(queries)} queries")
+    header = f"{'strategy':<20} {'chunks':>6} {'avg tok':>8} {'trunc':>6} " + " ".join(f"{f'hit@{k}':>6}" for k in args.k)
+    print(header + f" {'mrr':>6} {'pages/s':>8} {'chunks/s':>9}")
+
+    for name, config in CONFIGS:
+        chunker = Chunker(**config)
+
+        start = time.perf_counter()
+        chunks = list(chunker.chunk(pages))
+        embeddings = embedding_engine.embed([c['content'] for c in chunks])
+        seconds = time.perf_counter() - start
+
+        token_counts = embedding_engine.count_tokens([c['content'] for c in chunks])
+        truncated = sum(1 for n in token_counts if n > limit)
+        scores = evaluate(chunks, embeddings, query_vectors, gold, args.k)
+
+        print(
+            f"{name:<20} {len(chunks):>6} {np.mean(token_counts):>8.0f} {truncated:>6} "
+            + " ".join(f"{scores[f'hit@{k}']:>6.3f}" for k in args.k)
+            + f" {scores['mrr']:>6.3f} {len(pages) / seconds:>8.1f} {len(chunks) / seconds:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark serial vs process-pool PDF text extraction
+
+Usage (from the project root):
+    python -m backend.benchmarks.bench_pdf_extract --pages 400 --workers 1 4 8 16
+
+Without --pdf the bundled transcript is repeated until the document has
+--pages pages, so the comparison runs on a multi-hundred-page filing.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from pypdf import PdfReader, PdfWriter
+
+from backend.services.chunking import Chunker
+from backend.services.pdf_loader import pdf_loader
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "data", "uploads", "transcriptreliance.pdf")
+
+
+def build_long_pdf(source: str, pages: int) -> str:
+    """Repeat source pages until the output has the requested page count"""
+    reader = PdfReader(source)
+    writer = PdfWriter()
+    while len(writer.pages) < pages:
+        for page in reader.pages:
+            if len(writer.pages) >= pages:
+                break
+            writer.add_page(page)
+
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="bench_")
+    with os.fdopen(fd, "wb") as f:
+        writer.write(f)
+    return path
+
+
+# Plain word chunking so the timings are extraction, not tokenization
+CHUNKER = Chunker(strategy="words")
+
+
+def run(pdf_path: str, workers: int, repeat: int):
+    # Untimed pass so process-pool start-up isn't billed to the first run
+    if workers > 1:
+        pdf_loader.extract_text(pdf_path, CHUNKER, workers=workers)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = pdf_loader.extract_text(pdf_path, CHUNKER, workers=workers)
+        timings.append(time.perf_counter() - start)
+    return timings, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to extract (default: bundled transcript, repeated)")
+    parser.add_argument("--pages", type=int, default=300, help="Page count when synthesising from the sample")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf_path = args.pdf or build_long_pdf(SAMPLE_PDF, args.pages)
+    total_pages = len(PdfReader(pdf_path).pages)
+    print(f"Benchmarking {pdf_path} ({total_pages} pages, {args.repeat} runs each)\n")
+
+    baseline = None
+    print(f"{'workers':>8} {'median s':>10} {'pages/s':>10} {'speedup':>8} {'chunks':>7}")
+    for workers in args.workers:
+        timings, chunk_count = run(pdf_path, workers, args.repeat)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"{workers:>8} {median:>10.2f} {total_pages / median:>10.1f} {baseline / median:>7.2f}x {chunk_count:>7}")
+
+    if not args.pdf:
+        os.remove(pdf_path)
+
+
+if __name__ == "__main__":
+    main()
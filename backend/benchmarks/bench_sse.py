@@ -0,0 +1,113 @@
+"""Benchmark SSE frame writes with and without token coalescing
+
+Usage (from the project root):
+    python -m backend.benchmarks.bench_sse --clients 200 --tokens 1500 --windows 0 30
+
+Each client gets its own job; a stubbed LLM publishes --tokens deltas at
+--token-rate tokens/s through the job store, exactly as a worker would,
+and the client drains /stream's frame generator. Every yielded chunk is
+one ASGI send, so "frames" is the number of writes per stream.
+--redis-url runs the same thing against the Redis store (fakeredis:// works).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from backend.services.job_store import InMemoryJobStore, JobStore, RedisJobStore
+from backend.services.sse import SSECoalescer
+
+TOKENS = [" Revenue", " grew", " 12%", " year", " on", " year", ",", " driven", " by", " retail", " and", " digital", " services", "."]
+
+
+async def stub_llm(store: JobStore, job_id: str, tokens: int, token_rate: float):
+    """Publish a job's events the way JobWorkerPool.run_job does"""
+    delay = 1 / token_rate if token_rate > 0 else 0
+    await store.publish(job_id, "tool_call", json.dumps({"message": "🤖 Generating response..."}))
+
+    for i in range(tokens):
+        await store.publish(job_id, "text", json.dumps(TOKENS[i % len(TOKENS)]))
+        await asyncio.sleep(delay)
+
+    await store.publish(job_id, "citation", json.dumps({"id": 1, "page": 1, "source": "bench.pdf"}))
+    await store.publish(job_id, "end", "complete")
+    await store.close_stream(job_id)
+
+
+async def client(store: JobStore, coalescer: SSECoalescer, job_id: str):
+    frames = 0
+    size = 0
+    text = []
+
+    async for chunk in coalescer.frames(store.subscribe(job_id)):
+        frames += 1
+        size += len(chunk)
+        for frame in chunk.split(b"\n\n"):
+            if frame and b"event: text\n" in frame:
+                text.append(json.loads(frame.split(b"data: ", 1)[1]))
+
+    return frames, size, "".join(text)
+
+
+async def run(store: JobStore, window_ms: float, clients: int, tokens: int, token_rate: float, max_bytes: int):
+    coalescer = SSECoalescer(window_ms=window_ms, max_bytes=max_bytes)
+    job_ids = [await store.create_job(f"bench {i}") for i in range(clients)]
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    producers = [asyncio.create_task(stub_llm(store, job_id, tokens, token_rate)) for job_id in job_ids]
+    results = await asyncio.gather(*(client(store, coalescer, job_id) for job_id in job_ids))
+    await asyncio.gather(*producers)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    for job_id in job_ids:
+        await store.delete_job(job_id)
+
+    expected = "".join(TOKENS[i % len(TOKENS)] for i in range(tokens))
+    assert all(text == expected for _, _, text in results), "coalesced text differs from the token stream"
+
+    frames = sum(r[0] for r in results)
+    return {
+        "frames": frames,
+        "frames_per_stream": frames / clients,
+        "frames_per_sec": frames / wall,
+        "bytes_per_stream": sum(r[1] for r in results) / clients,
+        "cpu_ms_per_stream": cpu * 1000 / clients,
+        "wall": wall
+    }
+
+
+async def main_async(args):
+    store = RedisJobStore(args.redis_url) if args.redis_url else InMemoryJobStore()
+
+    print(f"{args.clients} clients x {args.tokens} tokens at {args.token_rate:.0f} tok/s ({store.backend} store)")
+    print(f"{'window':>8} {'frames/stream':>14} {'frames/s':>10} {'KB/stream':>10} {'CPU ms/stream':>14} {'wall s':>8}")
+
+    for window in args.windows:
+        result = await run(store, window, args.clients, args.tokens, args.token_rate, args.max_bytes)
+        print(
+            f"{window:>6.0f}ms {result['frames_per_stream']:>14.1f} {result['frames_per_sec']:>10.0f} "
+            f"{result['bytes_per_stream'] / 1024:>10.1f} {result['cpu_ms_per_stream']:>14.2f} {result['wall']:>8.2f}"
+        )
+
+    await store.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=1500, help="Text deltas per answer")
+    parser.add_argument("--token-rate", type=float, default=300, help="Stub LLM tokens/s per stream (0 = as fast as possible)")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 30], help="Coalescing windows in ms (0 = off)")
+    parser.add_argument("--max-bytes", type=int, default=16384)
+    parser.add_argument("--redis-url", help="Benchmark the Redis job store instead, e.g. fakeredis://")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""End-to-end load test: POST /ask -> GET /stream/{job_id}, plus POST /upload/
+
+Usage (from the project root):
+    # against a running server
+    python -m backend.benchmarks.load_test --url http://localhost:8000 --concurrency 50 --requests 500
+
+    # CI: start a server on the stub LLM backend, fail on regressions
+    python -m backend.benchmarks.load_test --spawn --concurrency 50 --requests 500 \\
+        --uploads 4 --max-ttft-p95-ms 1500 --max-error-rate 0.01 --json load_test.json
+
+Each ask is timed from the POST to the first text event (TTFT) and to the
+"end" event. Answer-cache hits (X-Cache: HIT) are reported separately and
+don't count towards the TTFT thresholds; run the server with
+ANSWER_CACHE_ENABLED=false to send every ask to the LLM. Tokens are
+counted as whitespace-separated words of the streamed answer, which is
+exact for the stub backend (one word per token) and close for Groq. Uploads send --upload-pdf with a unique
+trailer per request, so every upload is fully ingested rather than
+deduplicated, and are timed until their ingestion completes.
+
+--spawn runs uvicorn on --port with LLM_BACKEND=stub and
+ANSWER_CACHE_ENABLED=false (unless already set in the environment). LLM_STUB_LATENCY_MS / LLM_STUB_TOKENS_PER_SEC shape
+the fake provider. The process exits 1 if any --max-*/--min-* threshold
+is violated.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "data", "uploads", "transcriptreliance.pdf")
+
+QUERIES = [
+    "What was the revenue growth this year?",
+    "Summarise the performance of the retail segment",
+    "How did Jio's subscriber base change?",
+    "What are the capital expenditure plans?",
+    "What did management say about margins?",
+    "Which segments contributed most to EBITDA?",
+    "What is the outlook for the next fiscal year?",
+    "How much debt does the company have?",
+]
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarise(values: List[float], scale: float = 1000) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max, seconds scaled to ms by default"""
+    return {
+        name: round(value * scale, 1) if value is not None else None
+        for name, value in (
+            ("p50", percentile(values, 0.50)),
+            ("p95", percentile(values, 0.95)),
+            ("p99", percentile(values, 0.99)),
+            ("max", max(values) if values else None),
+        )
+    }
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.queries = QUERIES
+        if args.queries_file:
+            with open(args.queries_file, "r", encoding="utf-8") as f:
+                self.queries = [line.strip() for line in f if line.strip()]
+
+        self.ttft: List[float] = []
+        self.ttft_cached: List[float] = []
+        self.durations: List[float] = []
+        self.stream_rates: List[float] = []
+        self.tokens = 0
+        self.asks = 0
+        self.ask_errors: Counter = Counter()
+        self.cache_hits = 0
+
+        self.upload_accept: List[float] = []
+        self.ingest: List[float] = []
+        self.uploads = 0
+        self.upload_errors: Counter = Counter()
+        self.uploaded_names: List[str] = []
+
+    async def ask(self, n: int):
+        query = self.queries[n % len(self.queries)]
+        start = time.perf_counter()
+        self.asks += 1
+
+        try:
+            response = await self.client.post("/ask", json={"query": query})
+            if response.status_code != 200:
+                self.ask_errors[f"ask_{response.status_code}"] += 1
+                return
+            job_id = response.json()["job_id"]
+
+            first_token = None
+            text: List[str] = []
+            event = None
+            ended = False
+
+            async with self.client.stream("GET", f"/stream/{job_id}") as stream:
+                if stream.status_code != 200:
+                    self.ask_errors[f"stream_{stream.status_code}"] += 1
+                    return
+                cache_hit = stream.headers.get("x-cache") == "HIT"
+                self.cache_hits += cache_hit
+
+                async for line in stream.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: "):
+                        data = line[6:]
+                        if event == "text":
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                            text.append(json.loads(data) if data.startswith('"') else data)
+                        elif event == "error":
+                            self.ask_errors["error_event"] += 1
+                            return
+                        elif event == "end":
+                            ended = True
+                            break
+
+            finished = time.perf_counter()
+            if not ended:
+                self.ask_errors["incomplete_stream"] += 1
+                return
+
+            tokens = len("".join(text).split())
+            self.tokens += tokens
+            self.durations.append(finished - start)
+            if first_token is not None:
+                (self.ttft_cached if cache_hit else self.ttft).append(first_token - start)
+                if not cache_hit and finished > first_token and tokens > 1:
+                    self.stream_rates.append(tokens / (finished - first_token))
+
+        except httpx.TimeoutException:
+            self.ask_errors["timeout"] += 1
+        except httpx.HTTPError as e:
+            self.ask_errors[type(e).__name__] += 1
+
+    async def upload(self, n: int, pdf: bytes):
+        name = f"loadtest-{os.getpid()}-{n}.pdf"
+        # A trailing comment after %%EOF changes the hash but not the document
+        content = pdf + f"\n% loadtest {time.time_ns()} {n}\n".encode()
+        start = time.perf_counter()
+        self.uploads += 1
+
+        try:
+            response = await self.client.post("/upload/", files={"file": (name, content, "application/pdf")})
+            self.upload_accept.append(time.perf_counter() - start)
+            if response.status_code not in (200, 202):
+                self.upload_errors[f"upload_{response.status_code}"] += 1
+                return
+            self.uploaded_names.append(name)
+
+            ingestion_id = response.json().get("ingestion_id")
+            # Bounded by --timeout so an evicted or stuck ingestion can't hang the run
+            deadline = start + self.args.timeout
+            while ingestion_id:
+                if time.perf_counter() > deadline:
+                    self.upload_errors["ingestion_timeout"] += 1
+                    return
+                await asyncio.sleep(self.args.poll_interval)
+                poll = await self.client.get(f"/upload/ingestions/{ingestion_id}")
+                if poll.status_code != 200:
+                    self.upload_errors[f"ingestion_{poll.status_code}"] += 1
+                    return
+                status = poll.json().get("status")
+                if status == "failed":
+                    self.upload_errors["ingestion_failed"] += 1
+                    return
+                if status == "completed":
+                    break
+            self.ingest.append(time.perf_counter() - start)
+
+        except httpx.TimeoutException:
+            self.upload_errors["timeout"] += 1
+        except httpx.HTTPError as e:
+            self.upload_errors[type(e).__name__] += 1
+
+    async def run_pool(self, total: int, concurrency: int, task):
+        counter = iter(range(total))
+
+        async def worker():
+            for n in counter:
+                await task(n)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, total)))))
+
+    async def run(self) -> Dict:
+        pdf = None
+        if self.args.uploads:
+            with open(self.args.upload_pdf, "rb") as f:
+                pdf = f.read()
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            self.run_pool(self.args.requests, self.args.concurrency, self.ask),
+            self.run_pool(self.args.uploads, self.args.upload_concurrency, lambda n: self.upload(n, pdf)),
+        )
+        wall = time.perf_counter() - start
+
+        if not self.args.keep_uploads:
+            for name in self.uploaded_names:
+                try:
+                    await self.client.delete(f"/upload/{name}")
+                except httpx.HTTPError:
+                    pass
+
+        ask_failures = sum(self.ask_errors.values())
+        upload_failures = sum(self.upload_errors.values())
+        return {
+            "wall_seconds": round(wall, 2),
+            "asks": {
+                "requests": self.asks,
+                "completed": len(self.durations),
+                "cache_hits": self.cache_hits,
+                "error_rate": round(ask_failures / self.asks, 4) if self.asks else 0.0,
+                "errors": dict(self.ask_errors),
+                "ttft_ms": summarise(self.ttft),
+                "ttft_cached_ms": summarise(self.ttft_cached),
+                "total_ms": summarise(self.durations),
+                "tokens": self.tokens,
+                "tokens_per_sec": round(self.tokens / wall, 1) if wall else 0.0,
+                "stream_tokens_per_sec_p50": round(percentile(self.stream_rates, 0.5) or 0.0, 1),
+            },
+            "uploads": {
+                "requests": self.uploads,
+                "completed": len(self.ingest),
+                "error_rate": round(upload_failures / self.uploads, 4) if self.uploads else 0.0,
+                "errors": dict(self.upload_errors),
+                "accept_ms": summarise(self.upload_accept),
+                "ingest_ms": summarise(self.ingest),
+            },
+        }
+
+
+def check_thresholds(results: Dict, args: argparse.Namespace) -> List[str]:
+    """Human-readable threshold violations (empty when all pass)"""
+    asks = results["asks"]
+    failures = []
+
+    def over(name: str, value: Optional[float], limit: Optional[float]):
+        if limit is not None and (value is None or value > limit):
+            failures.append(f"{name} = {value} exceeds {limit}")
+
+    over("ttft p95 ms", asks["ttft_ms"]["p95"], args.max_ttft_p95_ms)
+    over("ttft p99 ms", asks["ttft_ms"]["p99"], args.max_ttft_p99_ms)
+    over("ask error rate", asks["error_rate"], args.max_error_rate)
+    over("upload error rate", results["uploads"]["error_rate"], args.max_error_rate)
+    over("ingest p95 ms", results["uploads"]["ingest_ms"]["p95"], args.max_ingest_p95_ms)
+    if args.min_tokens_per_sec is not None and asks["tokens_per_sec"] < args.min_tokens_per_sec:
+        failures.append(f"tokens/s = {asks['tokens_per_sec']} below {args.min_tokens_per_sec}")
+    return failures
+
+
+def spawn_server(port: int, timeout: float) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "stub")
+    # Every ask should reach the LLM, or TTFT measures cache lookups
+    env.setdefault("ANSWER_CACHE_ENABLED", "false")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError(f"Server not healthy after {timeout:.0f}s")
+
+
+def print_report(results: Dict):
+    asks = results["asks"]
+    uploads = results["uploads"]
+    ttft = asks["ttft_ms"]
+    print(f"\nasks: {asks['completed']}/{asks['requests']} completed in {results['wall_seconds']}s, "
+          f"{asks['cache_hits']} cache hits, error rate {asks['error_rate']:.2%} {asks['errors'] or ''}")
+    print(f"  TTFT ms    p50 {ttft['p50']}  p95 {ttft['p95']}  p99 {ttft['p99']}  max {ttft['max']}")
+    if asks["cache_hits"]:
+        print(f"  TTFT ms (cache hits)  p50 {asks['ttft_cached_ms']['p50']}  p95 {asks['ttft_cached_ms']['p95']}")
+    total = asks["total_ms"]
+    print(f"  total ms   p50 {total['p50']}  p95 {total['p95']}  p99 {total['p99']}  max {total['max']}")
+    print(f"  tokens/s   {asks['tokens_per_sec']} aggregate, {asks['stream_tokens_per_sec_p50']} per stream (p50)")
+    if uploads["requests"]:
+        print(f"uploads: {uploads['completed']}/{uploads['requests']} ingested, "
+              f"error rate {uploads['error_rate']:.2%} {uploads['errors'] or ''}")
+        print(f"  accept ms  p50 {uploads['accept_ms']['p50']}  p95 {uploads['accept_ms']['p95']}")
+        print(f"  ingest ms  p50 {uploads['ingest_ms']['p50']}  p95 {uploads['ingest_ms']['p95']}")
+
+
+async def main_async(args: argparse.Namespace) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency + args.upload_concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await LoadTest(client, args).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start a uvicorn server (stub LLM) for the run")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--queries-file", help="one query per line (default: built-in list)")
+    parser.add_argument("--uploads", type=int, default=0)
+    parser.add_argument("--upload-concurrency", type=int, default=2)
+    parser.add_argument("--upload-pdf", default=SAMPLE_PDF)
+    parser.add_argument("--keep-uploads", action="store_true")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout, also caps each ingestion poll")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-ttft-p95-ms", type=float)
+    parser.add_argument("--max-ttft-p99-ms", type=float)
+    parser.add_argument("--max-ingest-p95-ms", type=float)
+    parser.add_argument("--max-error-rate", type=float)
+    parser.add_argument("--min-tokens-per-sec", type=float)
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        args.url = f"http://127.0.0.1:{args.port}"
+        server = spawn_server(args.port, args.startup_timeout)
+
+    try:
+        results = asyncio.run(main_async(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    failures = check_thresholds(results, args)
+    results["threshold_failures"] = failures
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
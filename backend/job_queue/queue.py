@@ -1,47 +1,80 @@
 import asyncio
-import uuid
-from typing import Dict, Any, Optional
-from datetime import datetime
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its depth limit"""
+
 
 class JobQueue:
-    def __init__ (self):
-        self.jobs: Dict[str, Dict[str, Any]]= {}
-        self.queue: asyncio.Queue = asyncio.Queue()
-
-    def create_job(self, query:str) -> str:
-        job_id = str(uuid.uuid4())
-
-        self.jobs[job_id] = {
-            "job_id": job_id,
-            "query": query,
-            "status": "pending",
-            "created_at": datetime.now().isoformat(),
-            "results": [],
-            "error": None
-        }
+    """Bounded queue of job ids waiting for a worker
 
-        #Add to queue for processing
-        asyncio.create_task(self.queue.put(job_id))
+    Each entry carries its enqueue time so workers can report how long
+    jobs waited before being picked up.
+    """
+
+    def __init__(self, maxsize: int = 100, wait_window: int = 1000):
+        self.maxsize = maxsize
+        self.queue: "asyncio.Queue[Tuple[str, float]]" = asyncio.Queue(maxsize=maxsize)
+        # Recent wait times (seconds) for percentile reporting
+        self._waits: deque = deque(maxlen=wait_window)
+        self.enqueued = 0
+        self.rejected = 0
+        self.dequeued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def enqueue(self, job_id: str):
+        """Queue an existing job; raises QueueFullError at the depth limit"""
+        try:
+            self.queue.put_nowait((job_id, time.monotonic()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"Job queue is full ({self.maxsize} waiting)")
+        self.enqueued += 1
 
-        print("Created job:", job_id[8]," for query:", query[:50])
-        return job_id
-    
-    def get_job(self, job_id:str)-> Optional[Dict[str, Any]]:
-        return self.jobs.get(job_id)
-
-    def update_job(self, job_id: str, updates: Dict[str, Any]):
-        if job_id in self.jobs:
-            self.jobs[job_id].update(updates)
-    
-    def set_status(self, job_id: str , status: str):
-
-        if job_id in self.jobs:
-            self.jobs[job_id]["status"] = status
-            print(f"Job {job_id[8]}... status is now {status}")
-        
     async def get_next_job(self) -> Optional[str]:
         """ Get next job from queue- async blocks until available"""
-        return await self.queue.get()
-    
+        job_id, enqueued_at = await self.queue.get()
+
+        wait = time.monotonic() - enqueued_at
+        self._waits.append(wait)
+        self.dequeued += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return job_id
+
+    def task_done(self):
+        self.queue.task_done()
+
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4)
+
+        return {
+            "depth": self.depth(),
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "dequeued": self.dequeued,
+            "rejected": self.rejected,
+            "wait_seconds": {
+                "avg": round(self.total_wait / self.dequeued, 4) if self.dequeued else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(self.max_wait, 4)
+            }
+        }
+
+
 #Global queue instance
-job_queue = JobQueue()
+job_queue = JobQueue(maxsize=int(os.getenv("JOB_QUEUE_MAXSIZE", "100")))
@@ -0,0 +1,389 @@
+import asyncio
+import json
+import os
+import time
+import traceback
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncContextManager, AsyncGenerator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from backend.job_queue.queue import job_queue
+from backend.services.answer_cache import answer_cache
+from backend.services.job_store import job_store
+from backend.services.llm import llm_service
+from backend.services.metrics import JOBS_TOTAL, QUERY_STAGE_SECONDS, TOKENS_TOTAL
+from backend.services.rag import rag_system
+from backend.services.reranker import reranker
+
+
+def _tool_call(message: str) -> Tuple[str, str]:
+    return "tool_call", json.dumps({"message": message})
+
+
+async def generate_job_events(
+    job_id: str,
+    llm_slot: Optional[Callable[[], AsyncContextManager]] = None
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """Run retrieval + generation for a job, yielding (event, data) pairs
+
+    data is the already-serialised SSE data line. llm_slot, if given, is
+    held for the duration of the LLM calls to cap concurrency.
+    """
+    job = await job_store.get_job(job_id)
+    if not job:
+        yield "error", "Job not found"
+        yield "end", "failed"
+        return
+
+    query = job["query"]
+
+    # Step 1: Search
+    yield _tool_call('🔍 Searching documents...')
+    await asyncio.sleep(0.1)
+
+    await job_store.update_status(job_id, "processing")
+
+    # Step 2: Retrieve chunks (version captured first so a concurrent
+    # ingestion can't get a stale answer cached under the new version)
+    version = rag_system.version
+    chunks = await retrieve_chunks(query)
+
+    yield _tool_call(f'📄 Found {len(chunks)} relevant pages')
+
+    if not chunks:
+        yield "text", "No relevant content found."
+        await job_store.update_status(job_id, "completed")
+        yield "end", "complete"
+        return
+
+    async for event, data in answer_events(query, chunks, version, llm_slot, f"job {job_id[:8]}..."):
+        yield event, data
+
+    await job_store.update_status(job_id, "completed")
+    yield "end", "complete"
+
+
+async def answer_events(
+    query: str,
+    chunks: List[Dict],
+    version: int,
+    llm_slot: Optional[Callable[[], AsyncContextManager]] = None,
+    label: str = "query"
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """Generation steps for already-retrieved chunks, yielding (event, data) pairs
+
+    Stops short of the final "end" event; a complete answer is stored in
+    the answer cache under the collection version it was retrieved at.
+    """
+    # Step 3: Analyze
+    yield _tool_call('🔎 Analyzing content...')
+    await asyncio.sleep(0.1)
+
+    # Step 4: Generate response with streaming
+    yield _tool_call('🤖 Generating response...')
+
+    token_count = 0
+    citation_count = 0
+    component_sent = False
+    answer_parts: List[str] = []
+    citations: List[Dict] = []
+    component = None
+    had_error = False
+
+    # Bound the number of concurrent LLM calls across all workers
+    async with (llm_slot() if llm_slot is not None else nullcontext()):
+        print(f"🔄 Starting combined stream for {label}")
+        started = time.perf_counter()
+        first_token_at = None
+
+        async for item in llm_service.stream_with_visualization(query, chunks):
+            item_type = item.get("type")
+            content = item.get("content")
+
+            if item_type == "text":
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                token_count += 1
+                answer_parts.append(content)
+                yield "text", json.dumps(content)
+                if token_count % 20 == 0:
+                    print(f"   Streamed {token_count} tokens...")
+
+            elif item_type == "citation":
+                citation_count += 1
+                citations.append(content)
+                yield "citation", json.dumps(content)
+
+            elif item_type == "component" and not component_sent:
+                component_sent = True
+                component = content
+                yield _tool_call('📊 Creating visualization...')
+                yield "component", json.dumps(content)
+                print(f"📊 Sent visualization: {content.get('component', 'Unknown')}")
+
+            elif item_type == "error":
+                had_error = True
+                yield "error", str(content)
+
+    # Observed once per answer so the token loop stays free of metrics work
+    QUERY_STAGE_SECONDS.observe(time.perf_counter() - started, stage="generation")
+    if first_token_at is not None:
+        QUERY_STAGE_SECONDS.observe(first_token_at - started, stage="ttft")
+    TOKENS_TOTAL.inc(token_count)
+    print(f"✓ Stream complete: {token_count} tokens, {citation_count} citations")
+
+    if answer_parts and not had_error:
+        def store():
+            answer_cache.store(
+                query,
+                rag_system.embedder.embed_query(query),
+                version,
+                "".join(answer_parts),
+                citations,
+                component
+            )
+        
+        # Embedding and the SQLite write stay off the event loop; the answer
+        # has already streamed, so a failed cache write must not fail the job
+        try:
+            await asyncio.to_thread(store)
+        except Exception as e:
+            print(f"⚠️ Could not cache answer: {str(e)}")
+
+
+async def retrieve_chunks(query: str) -> List[Dict]:
+    """Prompt chunks for a query: retrieval, then the optional rerank stage"""
+    start = time.perf_counter()
+    candidates = await asyncio.to_thread(rag_system.search, query, reranker.fetch_count())
+    retrieve_ms = (time.perf_counter() - start) * 1000
+    reranker.record_stage("retrieve", retrieve_ms)
+    QUERY_STAGE_SECONDS.observe(retrieve_ms / 1000, stage="retrieval")
+
+    chunks, report = await asyncio.to_thread(reranker.rerank, query, candidates)
+    if "rerank_ms" in report:
+        QUERY_STAGE_SECONDS.observe(report["rerank_ms"] / 1000, stage="rerank")
+
+    timing = f"retrieve {retrieve_ms:.0f}ms"
+    if "rerank_ms" in report:
+        timing += f", rerank {report['rerank_ms']:.0f}ms ({report['scored']}/{report['candidates']} scored)"
+    if report.get("fallback"):
+        timing += f", fell back to retrieval order ({report['fallback']})"
+    print(f"✓ Retrieved {len(chunks)} chunks for query: '{query[:50]}...' [{timing}]")
+    return chunks
+
+
+async def retrieve_chunks_many(queries: List[str]) -> List[List[Dict]]:
+    """retrieve_chunks for a batch: one batched embedding + Chroma call, then rerank each"""
+    start = time.perf_counter()
+    candidates = await asyncio.to_thread(rag_system.retrieve_many, queries, reranker.fetch_count())
+    retrieve_ms = (time.perf_counter() - start) * 1000
+    reranker.record_stage("retrieve", retrieve_ms)
+    QUERY_STAGE_SECONDS.observe(retrieve_ms / 1000, stage="batch_retrieval")
+
+    def rerank_all() -> List[List[Dict]]:
+        return [reranker.rerank(query, chunks)[0] for query, chunks in zip(queries, candidates)]
+
+    results = await asyncio.to_thread(rerank_all)
+    print(f"✓ Retrieved chunks for {len(queries)} queries in {retrieve_ms:.0f}ms")
+    return results
+
+
+def replay_cached_answer(cached: Dict) -> Iterator[Tuple[str, str]]:
+    """Events for a cached answer, in the same sequence as a live stream"""
+    yield _tool_call('⚡ Answer served from cache')
+    yield "text", json.dumps(cached["text"])
+
+    for citation in cached["citations"]:
+        yield "citation", json.dumps(citation)
+
+    if cached["component"]:
+        yield _tool_call('📊 Creating visualization...')
+        yield "component", json.dumps(cached["component"])
+
+    yield "end", "complete"
+
+
+async def generate_batch_events(
+    queries: List[str],
+    max_concurrency: int = 8,
+    llm_slot: Optional[Callable[[], AsyncContextManager]] = None
+) -> AsyncGenerator[List[Tuple[Optional[int], str, str]], None]:
+    """Answer a list of queries, yielding batches of (index, event, data)
+
+    Cached answers are replayed first. The remaining queries share one
+    retrieval pass (retrieve_chunks_many); generation then fans out with
+    at most max_concurrency answers in progress, each also holding
+    llm_slot so batches and queued jobs share the global LLM limit.
+    Events of different queries interleave; each query ends with its own
+    "end" event, and the batch with a "batch_end" event (index None).
+    """
+    started = time.perf_counter()
+    yield [(None, "batch_start", json.dumps({"queries": len(queries)}))]
+
+    def lookup_cached() -> Dict[int, Dict]:
+        # One batched embedding call; retrieval reuses the cached embeddings
+        embeddings = rag_system.embedder.embed_queries(queries)
+        hits = {i: answer_cache.lookup(embedding, rag_system.version) for i, embedding in enumerate(embeddings)}
+        return {i: hit for i, hit in hits.items() if hit}
+
+    cached: Dict[int, Dict] = {}
+    if answer_cache.enabled:
+        try:
+            cached = await asyncio.to_thread(lookup_cached)
+        except Exception as e:
+            print(f"⚠️ Answer cache lookup failed: {str(e)}")
+
+    for i, hit in cached.items():
+        yield [(i, event, data) for event, data in replay_cached_answer(hit)]
+
+    pending = [i for i in range(len(queries)) if i not in cached]
+    failed = 0
+    retrieved: List[List[Dict]] = []
+
+    if pending:
+        version = rag_system.version
+        try:
+            retrieved = await retrieve_chunks_many([queries[i] for i in pending])
+        except Exception as e:
+            # Every pending query still gets its own terminal events
+            print(f"❌ Batch retrieval failed: {str(e)}")
+            traceback.print_exc()
+            failed += len(pending)
+            yield [
+                (i, event, data)
+                for i in pending
+                for event, data in (("error", f"Retrieval failed: {str(e)}"), ("end", "failed"))
+            ]
+
+    if retrieved:
+        events: "asyncio.Queue[Tuple[Optional[int], str, str]]" = asyncio.Queue()
+        slots = asyncio.Semaphore(max_concurrency)
+
+        async def answer(i: int, chunks: List[Dict]):
+            nonlocal failed
+            async with slots:
+                try:
+                    await events.put((i, *_tool_call(f'📄 Found {len(chunks)} relevant pages')))
+                    had_error = False
+                    if not chunks:
+                        await events.put((i, "text", "No relevant content found."))
+                    else:
+                        async for event, data in answer_events(queries[i], chunks, version, llm_slot, f"batch query {i}"):
+                            had_error = had_error or event == "error"
+                            await events.put((i, event, data))
+                    if had_error:
+                        failed += 1
+                    await events.put((i, "end", "failed" if had_error else "complete"))
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Batch query {i} failed: {str(e)}")
+                    await events.put((i, "error", str(e)))
+                    await events.put((i, "end", "failed"))
+
+        tasks = [asyncio.create_task(answer(i, chunks)) for i, chunks in zip(pending, retrieved)]
+        remaining = len(tasks)
+
+        try:
+            while remaining:
+                # Everything queued since the last write goes out together
+                batch = [await events.get()]
+                while not events.empty():
+                    batch.append(events.get_nowait())
+                remaining -= sum(1 for _, event, _ in batch if event == "end")
+                yield batch
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    summary = {
+        "queries": len(queries),
+        "cached": len(cached),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    print(f"✓ Batch complete: {summary}")
+    yield [(None, "batch_end", json.dumps(summary))]
+
+
+class JobWorkerPool:
+    """N async workers that pull jobs off job_queue and publish their events"""
+
+    def __init__(self, workers: int = 8, max_llm_calls: int = 8):
+        self.workers = workers
+        self.max_llm_calls = max_llm_calls
+        self.llm_slots: Optional[asyncio.Semaphore] = None
+        self.llm_in_flight = 0
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start workers on the running loop"""
+        if self._tasks:
+            return
+        self.llm_slots = asyncio.Semaphore(self.max_llm_calls)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"✓ Started {self.workers} job workers (max {self.max_llm_calls} LLM calls in flight)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @asynccontextmanager
+    async def llm_slot(self):
+        async with self.llm_slots:
+            self.llm_in_flight += 1
+            try:
+                yield
+            finally:
+                self.llm_in_flight -= 1
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await job_queue.get_next_job()
+            self.busy += 1
+            try:
+                await self.run_job(job_id)
+            finally:
+                self.busy -= 1
+                job_queue.task_done()
+
+    async def run_job(self, job_id: str):
+        """Process one job, publishing every event to the job store"""
+        try:
+            async for event, data in generate_job_events(job_id, self.llm_slot):
+                await job_store.publish(job_id, event, data)
+            self.processed += 1
+            JOBS_TOTAL.inc(outcome="completed")
+
+        except Exception as e:
+            self.failed += 1
+            JOBS_TOTAL.inc(outcome="failed")
+            print(f"❌ Stream error: {str(e)}")
+            traceback.print_exc()
+            await job_store.update_status(job_id, "failed")
+            await job_store.publish(job_id, "error", str(e))
+            # Clients reconnect after any drop that isn't preceded by "end"
+            await job_store.publish(job_id, "end", "failed")
+
+        finally:
+            await job_store.close_stream(job_id)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "max_llm_calls": self.max_llm_calls,
+            "llm_calls_in_flight": self.llm_in_flight
+        }
+
+
+job_worker_pool = JobWorkerPool(
+    workers=int(os.getenv("JOB_WORKERS", "8")),
+    max_llm_calls=int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter
+from backend.services.embeddings import embedding_engine
+from backend.services.rag import rag_system
+from backend.services.answer_cache import answer_cache
+from backend.services.page_renderer import page_renderer
+from backend.services.reranker import reranker
+from backend.services.context_packer import context_packer
+from backend.job_queue.queue import job_queue
+from backend.job_queue.worker import job_worker_pool
+from backend.services.job_store import job_store
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["Stats"]
+)
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit/miss counters for the query embedding, retrieval, answer and page-render caches"""
+    return {
+        "query_embeddings": embedding_engine.cache_stats(),
+        "retrieval": {
+            **rag_system.retrieval_cache.stats(),
+            "collection_version": rag_system.version,
+            "mode": rag_system.retrieval_mode,
+            "bm25": rag_system.bm25.stats(),
+            "rerank": reranker.stats(),
+            "packing": context_packer.stats()
+        },
+        "answers": answer_cache.stats(),
+        "pages": page_renderer.stats()
+    }
+
+
+@router.get("/queue")
+async def queue_stats():
+    """Job queue depth, wait times and worker/LLM concurrency"""
+    return {
+        "queue": job_queue.stats(),
+        "workers": job_worker_pool.stats(),
+        "store": job_store.stats()
+    }
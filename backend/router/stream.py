@@ -1,120 +1,161 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from backend.services.rag import rag_system
-from backend.services.llm import llm_service
-from backend.services.job_manager import job_manager
-from typing import AsyncGenerator
-import json
+from backend.services.job_store import job_store
+from backend.services.sse import encode_multiplexed, sse_coalescer
+from backend.services.metrics import ACTIVE_STREAMS, QUERY_STAGE_SECONDS, SSE_BYTES_TOTAL
+from backend.services.answer_cache import answer_cache
+from backend.job_queue.queue import job_queue, QueueFullError
+from backend.job_queue.worker import generate_batch_events, job_worker_pool, replay_cached_answer
+from typing import AsyncGenerator, Dict, List, Literal, Optional
 import asyncio
+import os
+import time
 
 router = APIRouter()
 
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
 class QueryRequest(BaseModel):
     query: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    format: Literal["sse", "ndjson"] = "sse"
+
+async def lookup_cached_answer(query: str) -> Optional[Dict]:
+    """Semantic answer cache lookup, off the event loop"""
+    def lookup():
+        embedding = rag_system.embedder.embed_query(query)
+        return answer_cache.lookup(embedding, rag_system.version)
+    
+    try:
+        return await asyncio.to_thread(lookup)
+    except Exception as e:
+        print(f"⚠️ Answer cache lookup failed: {str(e)}")
+        return None
+
 @router.post("/ask")
 async def create_job(request: QueryRequest):
-    """Create a new streaming job"""
-    job_id = job_manager.create_job(request.query)
+    """Create a new streaming job and queue it for a worker"""
+    job_id = await job_store.create_job(request.query)
+    
+    cached = await lookup_cached_answer(request.query) if answer_cache.enabled else None
+    if cached:
+        # Answered already: fill the buffer now, no worker needed
+        await job_store.set_cache_hit(job_id)
+        for event, data in replay_cached_answer(cached):
+            await job_store.publish(job_id, event, data)
+        await job_store.close_stream(job_id)
+        await job_store.update_status(job_id, "completed")
+        print(f"⚡ Served job {job_id[:8]}... from answer cache (similarity {cached['similarity']:.3f})")
+        return {"job_id": job_id, "status": "created"}
+    
+    try:
+        job_queue.enqueue(job_id)
+    except QueueFullError as e:
+        await job_store.delete_job(job_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    
     return {"job_id": job_id, "status": "created"}
 
-async def process_job_stream(job_id: str) -> AsyncGenerator[str, None]:
-    """Process job and stream results with text + visualization"""
+@router.post("/ask/batch")
+async def ask_batch(request: BatchQueryRequest):
+    """Answer a checklist of questions in one request
     
-    try:
-        job = job_manager.get_job(job_id)
-        if not job:
-            yield f"event: error\ndata: Job not found\n\n"
-            return
-        
-        query = job.get("query", "")
-        
-        # Step 1: Search
-        yield f"event: tool_call\ndata: {json.dumps({'message': '🔍 Searching documents...'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        job_manager.update_status(job_id, "processing")
-        
-        # Step 2: Retrieve chunks
-        chunks = rag_system.search(query, k=5)
-        print(f"✓ Retrieved {len(chunks)} chunks for query: '{query[:50]}...'")
-        
-        yield f"event: tool_call\ndata: {json.dumps({'message': f'📄 Found {len(chunks)} relevant pages'})}\n\n"
-        
-        if not chunks:
-            yield f"event: text\ndata: No relevant content found.\n\n"
-            yield f"event: end\ndata: complete\n\n"
-            return
-        
-        # Step 3: Analyze
-        yield f"event: tool_call\ndata: {json.dumps({'message': '🔎 Analyzing content...'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        # Step 4: Generate response with streaming
-        yield f"event: tool_call\ndata: {json.dumps({'message': '🤖 Generating response...'})}\n\n"
-        
-        token_count = 0
-        citation_count = 0
-        component_sent = False
-        
-        print(f"🔄 Starting combined stream for job {job_id[:8]}...")
-        
-        # Use the new combined streaming method
-        async for item in llm_service.stream_with_visualization(query, chunks):
-            item_type = item.get("type")
-            content = item.get("content")
-            
-            if item_type == "text":
-                token_count += 1
-                yield f"event: text\ndata: {json.dumps(content)}\n\n"
-                if token_count % 20 == 0:
-                    print(f"   Streamed {token_count} tokens...")
-            
-            elif item_type == "citation":
-                citation_count += 1
-                yield f"event: citation\ndata: {json.dumps(content)}\n\n"
-            
-            elif item_type == "component" and not component_sent:
-                component_sent = True
-                yield f"event: tool_call\ndata: {json.dumps({'message': '📊 Creating visualization...'})}\n\n"
-                yield f"event: component\ndata: {json.dumps(content)}\n\n"
-                print(f"📊 Sent visualization: {content.get('component', 'Unknown')}")
-            
-            elif item_type == "error":
-                yield f"event: error\ndata: {content}\n\n"
-        
-        print(f"✓ Stream complete: {token_count} tokens, {citation_count} citations")
-        
-        job_manager.update_status(job_id, "completed")
-        yield f"event: end\ndata: complete\n\n"
-        
-    except Exception as e:
-        print(f"❌ Stream error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        yield f"event: error\ndata: {str(e)}\n\n"
+    All queries share one batched embedding call and one multi-query
+    Chroma request; answers are generated concurrently (at most
+    BATCH_MAX_CONCURRENCY at a time, within the global LLM limit) and
+    streamed back interleaved, every event tagged with its query's index.
+    format=sse gives "event:" frames with {"index", "data"} payloads;
+    format=ndjson gives one {"index", "event", "data"} object per line.
+    """
+    queries = [query.strip() for query in request.queries]
+    if not queries or not all(queries):
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list of non-empty strings")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    
+    llm_slot = job_worker_pool.llm_slot if job_worker_pool.llm_slots is not None else None
+    
+    async def body() -> AsyncGenerator[bytes, None]:
+        with ACTIVE_STREAMS.track(endpoint="batch"):
+            async for batch in generate_batch_events(queries, BATCH_MAX_CONCURRENCY, llm_slot):
+                yield encode_multiplexed(batch, request.format)
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson" if request.format == "ndjson" else "text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+async def process_job_stream(job_id: str, last_event_id: Optional[str] = None) -> AsyncGenerator[bytes, None]:
+    """Tail the job's event stream as SSE; workers do the actual processing
+    
+    Every event carries an id, so a reconnecting client only gets the
+    events after its Last-Event-ID and then keeps tailing the live job.
+    Token deltas are coalesced into fewer, larger writes (see SSECoalescer).
+    """
+    
+    if not await job_store.exists(job_id):
+        yield b"event: error\ndata: Job not found\n\nevent: end\ndata: failed\n\n"
+        return
+    
+    if last_event_id:
+        print(f"🔁 Resuming job {job_id[:8]}... after event {last_event_id}")
+    
+    with ACTIVE_STREAMS.track(endpoint="stream"):
+        async for chunk in sse_coalescer.frames(job_store.subscribe(job_id, last_event_id)):
+            # The generator resumes once the server has sent the chunk,
+            # so the time spent suspended in yield is the flush time
+            start = time.perf_counter()
+            yield chunk
+            QUERY_STAGE_SECONDS.observe(time.perf_counter() - start, stage="sse_flush")
+            SSE_BYTES_TOTAL.inc(len(chunk))
 
 @router.get("/stream/{job_id}")
-async def stream_job(job_id: str):
-    """SSE endpoint for streaming job results"""
+async def stream_job(
+    job_id: str,
+    last_event_id: Optional[str] = Header(None),
+    resume_from: Optional[str] = Query(None, alias="last_event_id")
+):
+    """SSE endpoint for streaming job results
+    
+    Browsers send Last-Event-ID automatically when EventSource reconnects;
+    the last_event_id query parameter does the same for clients that can't
+    set headers.
+    """
+    job = await job_store.get_job(job_id)
+    
     return StreamingResponse(
-        process_job_stream(job_id),
+        process_job_stream(job_id, last_event_id or resume_from),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            "X-Cache": "HIT" if job and job["cache_hit"] else "MISS",
         }
     )
 
 @router.get("/jobs")
-async def list_jobs():
-    """List all active jobs"""
-    return {"jobs": job_manager.get_all_jobs()}
+async def list_jobs(offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    """List active jobs, most recently active first"""
+    return {
+        "jobs": await job_store.list_jobs(offset, limit),
+        "total": await job_store.count(),
+        "offset": offset,
+        "limit": limit
+    }
 
 @router.delete("/jobs/{job_id}")
 async def delete_job(job_id: str):
     """Delete a job"""
-    job_manager.delete_job(job_id)
+    await job_store.delete_job(job_id)
     return {"message": f"Deleted job {job_id}"}
\ No newline at end of file
@@ -1,51 +1,135 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from backend.services.pdf_loader import pdf_loader
 from backend.services.rag import rag_system
+from backend.services.ingestion import ingestion_manager
+from backend.services.page_renderer import page_renderer, MEDIA_TYPES
+from typing import AsyncGenerator, Optional
+import asyncio
+import json
 import os
-import shutil
+import hashlib
 import base64
+import uuid
 
 router = APIRouter(
     prefix="/upload",
     tags=["Upload"]
 )
 
+def _save_upload(file: UploadFile, file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Write the upload to disk, hashing it on the way; returns the sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        for block in iter(lambda: file.file.read(chunk_size), b""):
+            digest.update(block)
+            buffer.write(block)
+    return digest.hexdigest()
+
 @router.post("/")
 async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process PDF file"""
+    """Save PDF and queue it for background ingestion
+    
+    Uploads are content-hashed: an identical re-upload is a no-op, the same
+    bytes under a new name reuse the existing chunks, and a changed file is
+    re-indexed incrementally. A changed file replaces the old PDF only once
+    it is indexed.
+    """
     
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files allowed")
     
     file_path = os.path.join(pdf_loader.calquity_dir, file.filename)
+    # Hash into a temp file first so an unchanged re-upload never touches the original
+    tmp_path = f"{file_path}.{uuid.uuid4().hex[:8]}.part"
+    staged_path = None
+    created = False
     
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        print(f"✓ Saved: {file.filename}")
-        
-        chunks = pdf_loader.extract_text(file_path)
-        
-        if not chunks:
-            raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
-        
-        rag_system.add_documents(chunks, file.filename)
-        
-        return JSONResponse(content={
-            "message": "PDF uploaded successfully",
+        content_hash = await asyncio.to_thread(_save_upload, file, tmp_path)
+        
+        if rag_system.find_duplicate(content_hash) == file.filename and os.path.exists(file_path):
+            os.remove(tmp_path)
+            print(f"✓ {file.filename} unchanged, skipping ingestion")
+            return {
+                "message": "PDF already indexed",
+                "filename": file.filename,
+                "content_hash": content_hash,
+                "status": "unchanged"
+            }
+        
+        pending_id = ingestion_manager.find_pending(content_hash, file.filename)
+        if pending_id:
+            os.remove(tmp_path)
+            print(f"✓ {file.filename} already queued, skipping ingestion")
+            return JSONResponse(status_code=202, content={
+                "message": "PDF already queued for ingestion",
+                "filename": file.filename,
+                "content_hash": content_hash,
+                "ingestion_id": pending_id,
+                "status": "queued"
+            })
+        
+        try:
+            # Claim the name atomically; a new PDF can be viewed right away
+            os.close(os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            created = True
+            os.replace(tmp_path, file_path)
+            print(f"✓ Saved: {file.filename}")
+        except FileExistsError:
+            # Keep serving the current PDF until the new one is indexed
+            staged_path = tmp_path
+            print(f"✓ Staged: {file.filename}")
+        
+        ingestion_id = ingestion_manager.submit(file_path, file.filename, content_hash, staged_path=staged_path)
+        
+        return JSONResponse(status_code=202, content={
+            "message": "PDF uploaded, ingestion started",
             "filename": file.filename,
-            "pages": len(set(chunk['page'] for chunk in chunks)),
-            "chunks": len(chunks),
-            "status": "success"
+            "content_hash": content_hash,
+            "ingestion_id": ingestion_id,
+            "status": "queued"
         })
         
     except Exception as e:
-        if os.path.exists(file_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if created and os.path.exists(file_path):
             os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.get("/ingestions/{ingestion_id}")
+async def get_ingestion(ingestion_id: str):
+    """Get progress of a background ingestion"""
+    record = ingestion_manager.get(ingestion_id)
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="Ingestion not found")
+    
+    return record
+
+async def ingestion_event_stream(ingestion_id: str) -> AsyncGenerator[str, None]:
+    """Stream ingestion progress as SSE events"""
+    async for item in ingestion_manager.subscribe(ingestion_id):
+        yield f"event: {item['event']}\ndata: {json.dumps(item['data'])}\n\n"
+    yield f"event: end\ndata: complete\n\n"
+
+@router.get("/ingestions/{ingestion_id}/events")
+async def stream_ingestion(ingestion_id: str):
+    """SSE endpoint for ingestion progress (pages parsed, chunks embedded/upserted)"""
+    if not ingestion_manager.get(ingestion_id):
+        raise HTTPException(status_code=404, detail="Ingestion not found")
+    
+    return StreamingResponse(
+        ingestion_event_stream(ingestion_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
 @router.post("/clear")
 async def clear_all_documents():
     """Clear all uploaded PDFs and reset RAG system"""
@@ -112,39 +196,49 @@ async def delete_document(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/pdf/{filename}/screenshot")
-async def get_pdf_screenshot(filename: str, page: int = Query(1, ge=1)):
-    """Get a screenshot of a specific PDF page as base64"""
+async def get_pdf_screenshot(
+    filename: str,
+    request: Request,
+    page: int = Query(1, ge=1),
+    zoom: Optional[float] = Query(None, gt=0, le=4),
+    width: Optional[int] = Query(None, ge=16, le=4096),
+    fmt: str = Query("png", alias="format", pattern="^(png|jpeg|webp)$"),
+    mode: str = Query("json", pattern="^(json|image)$")
+):
+    """Get a screenshot of a specific PDF page
+    
+    mode=json returns base64 in JSON (default); mode=image returns the image
+    bytes directly with an ETag, answering 304 when the client already has it.
+    width renders a thumbnail of that many pixels and overrides zoom.
+    """
     file_path = os.path.join(pdf_loader.calquity_dir, filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="PDF not found")
     
+    if fmt == "webp" and not page_renderer.webp_supported:
+        raise HTTPException(status_code=400, detail="WebP output needs Pillow. Run: pip install pillow")
+    
     try:
-        import fitz  # PyMuPDF
-        
-        doc = fitz.open(file_path)
-        
-        if page > len(doc):
-            page = len(doc)
+        if mode == "image":
+            key, _ = await asyncio.to_thread(page_renderer.resolve, file_path, page, zoom, width, fmt)
+            etag = page_renderer.etag(key)
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers=headers)
         
-        pdf_page = doc[page - 1]  # 0-indexed
+        img_data, meta, key = await asyncio.to_thread(page_renderer.get, file_path, page, zoom, width, fmt)
         
-        # Render page to image
-        mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-        pix = pdf_page.get_pixmap(matrix=mat)
-        
-        # Convert to base64
-        img_data = pix.tobytes("png")
-        base64_img = base64.b64encode(img_data).decode('utf-8')
-        
-        doc.close()
+        if mode == "image":
+            return Response(content=img_data, media_type=MEDIA_TYPES[fmt], headers=headers)
         
         return JSONResponse({
-            "image": base64_img,
-            "page": page,
-            "total_pages": len(doc),
-            "width": pix.width,
-            "height": pix.height
+            "image": base64.b64encode(img_data).decode('utf-8'),
+            "page": meta["page"],
+            "total_pages": meta["total_pages"],
+            "width": meta["width"],
+            "height": meta["height"],
+            "format": fmt
         })
         
     except ImportError:
@@ -153,4 +247,4 @@ async def get_pdf_screenshot(filename: str, page: int = Query(1, ge=1)):
             detail="PyMuPDF not installed. Run: pip install pymupdf"
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """Semantic cache of full answers for /stream/{job_id}
+
+    An entry matches when its query embedding is within the cosine
+    similarity threshold of the new query and it was produced against the
+    current collection version. Entries are LRU-evicted past max_entries
+    and persisted to SQLite so they survive restarts. The database can be
+    shared by several workers: SQLite assigns row ids, and rows are evicted
+    by their last use across all of them, not by this process's view.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        max_entries: int = 500,
+        threshold: float = 0.97,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked embeddings per collection version, rebuilt lazily
+        self._matrix_version: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = None
+        if enabled and path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "id INTEGER PRIMARY KEY, query TEXT NOT NULL, version INTEGER NOT NULL, "
+                "embedding BLOB NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(answers)")]
+            if "used_at" not in columns:
+                self._conn.execute("ALTER TABLE answers ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE answers SET used_at = created_at")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_used ON answers (used_at)")
+            self._conn.commit()
+            self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT id, query, version, embedding, payload, created_at FROM answers ORDER BY used_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+
+        for row_id, query, version, embedding, payload, created_at in reversed(rows):
+            self._entries[row_id] = {
+                "query": query,
+                "version": version,
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "created_at": created_at,
+                **json.loads(payload)
+            }
+
+        if rows:
+            print(f"✓ Loaded {len(rows)} cached answers")
+
+    def lookup(self, embedding: np.ndarray, version: int) -> Optional[Dict[str, Any]]:
+        """Return the closest cached answer for this version above the threshold"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            if self._matrix_version != version:
+                self._matrix_ids = [i for i, e in self._entries.items() if e["version"] == version]
+                self._matrix = (
+                    np.stack([self._entries[i]["embedding"] for i in self._matrix_ids])
+                    if self._matrix_ids else None
+                )
+                self._matrix_version = version
+
+            if self._matrix is None:
+                self.misses += 1
+                return None
+
+            # Embeddings are normalised, so the dot product is cosine similarity
+            scores = self._matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = self._matrix_ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = dict(self._entries[entry_id], similarity=float(scores[best]))
+
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.execute("UPDATE answers SET used_at = ? WHERE id = ?", (time.time(), entry_id))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                # Only the eviction order suffers; the hit is still good
+                print(f"⚠️ Could not record answer cache use: {str(e)}")
+        return entry
+
+    def store(
+        self,
+        query: str,
+        embedding: np.ndarray,
+        version: int,
+        text: str,
+        citations: List[Dict],
+        component: Optional[Dict]
+    ):
+        """Cache a completed answer"""
+        if not self.enabled:
+            return
+
+        payload = {"text": text, "citations": citations, "component": component}
+        embedding = np.asarray(embedding, dtype=np.float32)
+
+        now = time.time()
+
+        with self._lock:
+            if self._conn is not None:
+                cursor = self._conn.execute(
+                    "INSERT INTO answers (query, version, embedding, payload, created_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (query, version, embedding.tobytes(), json.dumps(payload), now, now)
+                )
+                entry_id = cursor.lastrowid
+                # Keep the max_entries most recently used rows of every worker
+                # sharing the file, not just the ones this process knows about
+                removed = self._conn.execute(
+                    "DELETE FROM answers WHERE id NOT IN "
+                    "(SELECT id FROM answers ORDER BY used_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                ).rowcount
+                self._conn.commit()
+                self.evictions += removed
+            else:
+                entry_id = max(self._entries, default=0) + 1
+
+            self._entries[entry_id] = {
+                "query": query,
+                "version": version,
+                "embedding": embedding,
+                "created_at": now,
+                **payload
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                if self._conn is None:
+                    self.evictions += 1
+
+            self._matrix_version = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix_version = None
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+answer_cache = AnswerCache(
+    enabled=os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true",
+    path=os.getenv("ANSWER_CACHE_PATH", "data/answer_cache.sqlite3") or None,
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "500")),
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))
+)
@@ -0,0 +1,316 @@
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were "
+    "will with we our you your they their i he she".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word/number tokens; keeps 'fy24', 'q3' and '1,234.5' intact"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-process BM25 inverted index over chunk ids
+
+    Postings are per-term array('I') doc numbers with parallel array('H')
+    term frequencies, so a posting costs 6 bytes. Documents get dense
+    numbers in insertion order; removal only tombstones them, and the
+    postings are compacted once tombstones pass compact_ratio. Document
+    frequencies still count tombstoned documents until then, which only
+    nudges idf slightly.
+
+    save() only marks the index dirty; a full snapshot is written at most
+    every flush_interval seconds (and by flush() on shutdown), pickled
+    outside the index lock so searches never wait on the disk. Each
+    snapshot records version_fn() (the collection version) so a file
+    older than the collection can be detected and rebuilt after a crash.
+    """
+
+    FORMAT = 1
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        compact_ratio: float = 0.25,
+        flush_interval: float = 30.0,
+        version_fn: Optional[Callable[[], int]] = None
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self.flush_interval = flush_interval
+        self.version_fn = version_fn
+        self.version: Optional[int] = None
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self.flushes = 0
+        self._reset()
+        self.exists = bool(path) and os.path.exists(path)
+
+        if self.exists:
+            try:
+                self._load()
+            except Exception as e:
+                print(f"⚠️ Could not read BM25 index, rebuilding: {str(e)}")
+                self._reset()
+                self.exists = False
+
+    def _reset(self):
+        self.doc_ids: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self.doc_lengths = array('I')
+        self.doc_sources = array('I')
+        self.alive = bytearray()
+        self.source_names: List[str] = []
+        self._source_numbers: Dict[str, int] = {}
+        self.vocab: Dict[str, int] = {}
+        self.postings_docs: List[array] = []
+        self.postings_tf: List[array] = []
+        self.df = array('I')
+        self.live_docs = 0
+        self.live_length = 0
+
+    def __len__(self) -> int:
+        return self.live_docs
+
+    def _source_number(self, source: str) -> int:
+        number = self._source_numbers.get(source)
+        if number is None:
+            number = self._source_numbers[source] = len(self.source_names)
+            self.source_names.append(source)
+        return number
+
+    def add(self, chunk_ids: Iterable[str], texts: Iterable[str], source: str):
+        """Index chunks (re-adding an id replaces it)"""
+        with self._lock:
+            source_number = self._source_number(source)
+
+            for chunk_id, text in zip(chunk_ids, texts):
+                self._remove_one(chunk_id)
+
+                terms = Counter(tokenize(text))
+                doc = len(self.doc_ids)
+                length = sum(terms.values())
+
+                self.doc_ids.append(chunk_id)
+                self._doc_numbers[chunk_id] = doc
+                self.doc_lengths.append(length)
+                self.doc_sources.append(source_number)
+                self.alive.append(1)
+                self.live_docs += 1
+                self.live_length += length
+
+                for term, tf in terms.items():
+                    term_id = self.vocab.get(term)
+                    if term_id is None:
+                        term_id = self.vocab[term] = len(self.postings_docs)
+                        self.postings_docs.append(array('I'))
+                        self.postings_tf.append(array('H'))
+                        self.df.append(0)
+                    self.postings_docs[term_id].append(doc)
+                    self.postings_tf[term_id].append(min(tf, 65535))
+                    self.df[term_id] += 1
+
+    def _remove_one(self, chunk_id: str):
+        doc = self._doc_numbers.pop(chunk_id, None)
+        if doc is not None and self.alive[doc]:
+            self.alive[doc] = 0
+            self.live_docs -= 1
+            self.live_length -= self.doc_lengths[doc]
+
+    def remove(self, chunk_ids: Iterable[str]):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._remove_one(chunk_id)
+
+    def remove_source(self, source: str):
+        with self._lock:
+            number = self._source_numbers.get(source)
+            if number is None:
+                return
+            for doc, doc_source in enumerate(self.doc_sources):
+                if doc_source == number and self.alive[doc]:
+                    self._remove_one(self.doc_ids[doc])
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def compact(self):
+        """Drop tombstoned documents from the postings and renumber"""
+        with self._lock:
+            keep = [doc for doc in range(len(self.doc_ids)) if self.alive[doc]]
+            renumber = array('i', [-1]) * len(self.doc_ids)
+            for new, old in enumerate(keep):
+                renumber[old] = new
+
+            vocab: Dict[str, int] = {}
+            postings_docs: List[array] = []
+            postings_tf: List[array] = []
+            df = array('I')
+            for term, term_id in self.vocab.items():
+                docs = array('I')
+                tfs = array('H')
+                for doc, tf in zip(self.postings_docs[term_id], self.postings_tf[term_id]):
+                    if renumber[doc] >= 0:
+                        docs.append(renumber[doc])
+                        tfs.append(tf)
+                if docs:
+                    vocab[term] = len(postings_docs)
+                    postings_docs.append(docs)
+                    postings_tf.append(tfs)
+                    df.append(len(docs))
+
+            self.doc_ids = [self.doc_ids[doc] for doc in keep]
+            self._doc_numbers = {chunk_id: doc for doc, chunk_id in enumerate(self.doc_ids)}
+            self.doc_lengths = array('I', (self.doc_lengths[doc] for doc in keep))
+            self.doc_sources = array('I', (self.doc_sources[doc] for doc in keep))
+            self.alive = bytearray(b"\x01" * len(keep))
+            self.vocab, self.postings_docs, self.postings_tf, self.df = vocab, postings_docs, postings_tf, df
+
+    def search(self, query: str, k: int = 10, sources: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score), optionally limited to some sources"""
+        with self._lock:
+            total_docs = len(self.doc_ids)
+            if not self.live_docs or k <= 0:
+                return []
+
+            avg_length = self.live_length / self.live_docs
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            scores = np.zeros(total_docs, dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    continue
+                df = self.df[term_id]
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                docs = np.frombuffer(self.postings_docs[term_id], dtype=np.uint32)
+                tf = np.frombuffer(self.postings_tf[term_id], dtype=np.uint16).astype(np.float32)
+                # A term lists each document once, so fancy-index += is safe
+                scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+
+            mask = np.frombuffer(self.alive, dtype=np.uint8) == 0
+            if sources is not None:
+                allowed = [self._source_numbers[s] for s in sources if s in self._source_numbers]
+                mask |= ~np.isin(np.frombuffer(self.doc_sources, dtype=np.uint32), allowed)
+            scores[mask] = 0
+
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self.doc_ids[doc], float(scores[doc])) for doc in ranked]
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("format") != self.FORMAT:
+            raise ValueError(f"unsupported format {state.get('format')}")
+
+        self.doc_ids = state["doc_ids"]
+        self._doc_numbers = {chunk_id: doc for doc, chunk_id in enumerate(self.doc_ids) if state["alive"][doc]}
+        self.doc_lengths = state["doc_lengths"]
+        self.doc_sources = state["doc_sources"]
+        self.alive = state["alive"]
+        self.source_names = state["source_names"]
+        self._source_numbers = {source: number for number, source in enumerate(self.source_names)}
+        self.vocab = state["vocab"]
+        self.postings_docs = state["postings_docs"]
+        self.postings_tf = state["postings_tf"]
+        self.df = state["df"]
+        self.live_docs = sum(self.alive)
+        self.live_length = sum(length for length, alive in zip(self.doc_lengths, self.alive) if alive)
+        self.version = state.get("version")
+
+    def save(self):
+        """Mark the index changed; it is written within flush_interval seconds"""
+        if not self.path:
+            return
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+
+        with self._lock:
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Write pending changes now, compacting first if needed"""
+        if not self.path:
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._dirty and self.exists:
+                    return
+
+                # Read before the snapshot: every change is indexed before
+                # its version bump, so the file holds at least this version
+                version = self.version_fn() if self.version_fn else None
+                dead = len(self.doc_ids) - self.live_docs
+                if dead and dead > self.compact_ratio * len(self.doc_ids):
+                    self.compact()
+
+                # Copies are cheap next to pickling, which happens unlocked
+                state = {
+                    "format": self.FORMAT,
+                    "version": version,
+                    "doc_ids": list(self.doc_ids),
+                    "doc_lengths": array('I', self.doc_lengths),
+                    "doc_sources": array('I', self.doc_sources),
+                    "alive": bytearray(self.alive),
+                    "source_names": list(self.source_names),
+                    "vocab": dict(self.vocab),
+                    "postings_docs": [array('I', docs) for docs in self.postings_docs],
+                    "postings_tf": [array('H', tfs) for tfs in self.postings_tf],
+                    "df": array('I', self.df)
+                }
+                self._dirty = False
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.version = version
+            self.exists = True
+            self.flushes += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            postings = sum(len(docs) for docs in self.postings_docs)
+            return {
+                "documents": self.live_docs,
+                "tombstones": len(self.doc_ids) - self.live_docs,
+                "terms": len(self.vocab),
+                "postings": postings,
+                "postings_bytes": postings * 6,
+                "unsaved_changes": self._dirty,
+                "flushes": self.flushes
+            }
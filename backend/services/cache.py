@@ -0,0 +1,269 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional per-entry TTL and hit/miss counters
+
+    With maxbytes set, entries are also evicted once the total of
+    sizeof(value) goes over it (e.g. for caches of rendered images).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        maxbytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _size(self, value: Any) -> int:
+        return self.sizeof(value) if self.maxbytes is not None else 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.bytes -= self._size(value)
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None:
+                self.bytes -= self._size(previous[0])
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            self.bytes += self._size(value)
+
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self.bytes > self.maxbytes and len(self._data) > 1
+            ):
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.maxbytes is not None:
+            stats.update(bytes=self.bytes, maxbytes=self.maxbytes)
+        return stats
+
+
+class DiskVectorCache:
+    """SQLite-backed key -> float32 vector store that survives restarts
+
+    Rows older than max_age seconds are ignored and pruned, and the oldest
+    rows are dropped once there are more than max_rows. Pruning runs on
+    open and then every prune_every writes, not on each one.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_rows: int = 100000,
+        max_age: Optional[float] = None,
+        prune_every: int = 256
+    ):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.prune_every = prune_every
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_created ON vectors (created_at)")
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._lock:
+            self._prune()
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector, created_at FROM vectors WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age and row[1] < time.time() - self.max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def set(self, key: str, vector: np.ndarray):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vectors (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, blob, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        """Drop expired rows, then the oldest rows past max_rows (caller holds the lock)"""
+        removed = 0
+        if self.max_age:
+            removed += self._conn.execute(
+                "DELETE FROM vectors WHERE created_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+        excess = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0] - self.max_rows
+        if excess > 0:
+            removed += self._conn.execute(
+                "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY created_at LIMIT ?)", (excess,)
+            ).rowcount
+        self.evictions += removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        return {
+            "path": self.path,
+            "size": size,
+            "max_rows": self.max_rows,
+            "max_age": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class DiskBlobCache:
+    """SQLite-backed key -> (bytes, metadata) store with a total size cap
+
+    Least recently read entries are evicted once the stored bytes exceed
+    max_bytes. Safe to share between processes (WAL mode, busy timeout).
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "key TEXT PRIMARY KEY, data BLOB NOT NULL, meta TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data, meta FROM blobs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE blobs SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return bytes(row[0]), json.loads(row[1])
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM blobs WHERE key = ?", (key,)).fetchone() is not None
+
+    def set(self, key: str, data: bytes, meta: Dict[str, Any], cold: bool = False):
+        """Store an entry; cold entries count as never read, so they are
+        evicted before anything that has been, until a get() warms them"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (key, data, meta, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, json.dumps(meta), len(data), 0.0 if cold else time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM blobs ORDER BY accessed_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM blobs WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM blobs")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {
+            "path": self.path,
+            "size": size,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,218 @@
+import os
+import re
+from itertools import groupby
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+STRATEGIES = ("words", "tokens", "sentence", "paragraph")
+
+# (text, page, token count)
+Segment = Tuple[str, int, int]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [" ".join(block.split()) for block in _PARAGRAPH_BREAK.split(text) if block.strip()]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_END.split(" ".join(text.split())) if sentence]
+
+
+def split_words(text: str) -> List[str]:
+    return text.split()
+
+
+_SPLITTERS = {"paragraph": split_paragraphs, "sentence": split_sentences, "word": split_words}
+
+# Finer splits used when a unit alone is over the token budget
+_LEVELS = {
+    "tokens": ("word",),
+    "sentence": ("sentence", "word"),
+    "paragraph": ("paragraph", "sentence", "word")
+}
+
+
+class Chunker:
+    """Split a document's pages into chunks sized for the embedding model
+
+    Strategies:
+        words     - chunk_words whitespace words per page, no overlap
+                    (the original behaviour; chunks never cross pages)
+        tokens    - windows of chunk_tokens model tokens, cut between words
+        sentence  - whole sentences packed up to chunk_tokens
+        paragraph - whole paragraphs packed up to chunk_tokens
+
+    Token counts come from the embedding model's tokenizer and the budget
+    is capped at what the model embeds without truncation. Except for
+    "words", chunks overlap the previous chunk by up to overlap tokens of
+    whole units, and a page's first chunk opens with the end of the page
+    before, so metadata records the page span (page_start, page_end).
+
+    Packing restarts at every page: where a page is cut never depends on
+    the pages before it, so editing one page changes only its own chunks
+    and the first chunk of the next page, and re-indexing stays incremental.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "sentence",
+        chunk_tokens: int = 200,
+        overlap: int = 40,
+        chunk_words: int = 500,
+        count_tokens: Optional[Callable[[List[str]], List[int]]] = None,
+        max_tokens: Optional[int] = None
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy '{strategy}' (expected one of {', '.join(STRATEGIES)})")
+        self.strategy = strategy
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+        self.chunk_words = chunk_words
+        self._count_tokens = count_tokens
+        self._max_tokens = max_tokens
+
+    def _budget(self) -> int:
+        if self._count_tokens is None:
+            # Imported lazily: extraction worker processes import this module
+            # too and must not load the model
+            from backend.services.embeddings import embedding_engine
+            self._count_tokens = embedding_engine.count_tokens
+            # Leave room for the special tokens the model adds
+            self._max_tokens = embedding_engine.max_tokens - 2
+
+        if self._max_tokens:
+            return min(self.chunk_tokens, self._max_tokens)
+        return self.chunk_tokens
+
+    def chunk(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Dict]:
+        """Lazily chunk (page_number, text) pairs in page order"""
+        if self.strategy == "words":
+            yield from self._word_chunks(pages)
+            return
+
+        budget = self._budget()
+        joiner = "\n\n" if self.strategy == "paragraph" else " "
+        segments = (
+            segment
+            for page, text in pages
+            for segment in self._segments(text, page, _LEVELS[self.strategy], budget)
+        )
+        yield from self._pack(segments, joiner, budget, min(self.overlap, budget // 2))
+
+    def _segments(self, text: str, page: int, levels: Tuple[str, ...], budget: int) -> Iterator[Segment]:
+        units = _SPLITTERS[levels[0]](text)
+        if not units:
+            return
+
+        for unit, tokens in zip(units, self._count_tokens(units)):
+            if tokens > budget and len(levels) > 1:
+                yield from self._segments(unit, page, levels[1:], budget)
+            else:
+                yield unit, page, tokens
+
+    def _pack(self, segments: Iterable[Segment], joiner: str, budget: int, overlap: int) -> Iterator[Dict]:
+        lead: Optional[List[Segment]] = None
+        for _, group in groupby(segments, key=lambda segment: segment[1]):
+            page_segments = list(group)
+            yield from self._pack_page(page_segments, lead, joiner, budget, overlap)
+            lead = self._tail(page_segments, overlap)
+
+    def _pack_page(
+        self,
+        segments: List[Segment],
+        lead: Optional[List[Segment]],
+        joiner: str,
+        budget: int,
+        overlap: int
+    ) -> Iterator[Dict]:
+        """Pack one page; lead is the end of the previous page (None on the first)"""
+        window = list(lead or [])
+        carried = len(window)  # leading segments of window repeated from before
+        tokens = sum(s[2] for s in window)
+        # After the first page the lead's full share is kept free even when
+        # the lead is shorter, so the cuts depend on this page alone
+        room = budget - (overlap if lead is not None else 0)
+        index = 0
+
+        for segment in segments:
+            if window and segment[2] > room:
+                if len(window) > carried:
+                    yield self._make_chunk(window, joiner, tokens, index)
+                    index += 1
+                    window = self._tail(window[1:], overlap)
+                    # The overlap must still leave room for the new segment
+                    while window and sum(s[2] for s in window) + segment[2] > budget:
+                        window.pop(0)
+                else:
+                    window = []
+                carried = len(window)
+                tokens = sum(s[2] for s in window)
+                room = budget - tokens
+
+            window.append(segment)
+            tokens += segment[2]
+            room -= segment[2]
+
+        if len(window) > carried:
+            yield self._make_chunk(window, joiner, tokens, index)
+
+    @staticmethod
+    def _tail(segments: List[Segment], overlap: int) -> List[Segment]:
+        """Whole segments from the end of segments totalling at most overlap tokens"""
+        tail: List[Segment] = []
+        total = 0
+        for segment in reversed(segments):
+            if total + segment[2] > overlap:
+                break
+            tail.append(segment)
+            total += segment[2]
+        tail.reverse()
+        return tail
+
+    @staticmethod
+    def _make_chunk(window: List[Segment], joiner: str, tokens: int, index: int) -> Dict:
+        page_start = window[0][1]
+        page_end = window[-1][1]
+        return {
+            'content': joiner.join(segment[0] for segment in window),
+            'page': page_start,
+            'metadata': {
+                'page': page_start,
+                'page_start': page_start,
+                'page_end': page_end,
+                'chunk_index': index,
+                'tokens': tokens
+            }
+        }
+
+    def _word_chunks(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Dict]:
+        for page, text in pages:
+            words = text.split()
+            for i in range(0, len(words), self.chunk_words):
+                yield {
+                    'content': ' '.join(words[i:i + self.chunk_words]),
+                    'page': page,
+                    'metadata': {
+                        'page': page,
+                        'page_start': page,
+                        'page_end': page,
+                        'chunk_index': i // self.chunk_words
+                    }
+                }
+
+
+def create_chunker() -> Chunker:
+    """Chunker configured from CHUNK_STRATEGY, CHUNK_TOKENS, CHUNK_OVERLAP and CHUNK_WORDS"""
+    strategy = os.getenv("CHUNK_STRATEGY", "sentence").lower()
+    if strategy not in STRATEGIES:
+        print(f"⚠️ Unknown CHUNK_STRATEGY '{strategy}', using sentence")
+        strategy = "sentence"
+
+    return Chunker(
+        strategy=strategy,
+        chunk_tokens=int(os.getenv("CHUNK_TOKENS", "200")),
+        overlap=int(os.getenv("CHUNK_OVERLAP", "40")),
+        chunk_words=int(os.getenv("CHUNK_WORDS", "500"))
+    )
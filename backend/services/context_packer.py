@@ -0,0 +1,190 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.services.chunking import split_sentences
+
+
+def _sentence_key(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+class ContextPacker:
+    """Fit retrieved chunks into a prompt token budget
+
+    Chunks are taken in relevance order (rerank_score when every chunk has
+    one, otherwise the order retrieval returned them in). Sentences already
+    included from an earlier chunk are dropped, which removes the overlap
+    between neighbouring chunks, and a chunk that doesn't fit whole is cut
+    after its last sentence that does. A lone sentence longer than the
+    remaining budget is cut between words so no number is split.
+
+    Token counts come from the embedding model's tokenizer, a close enough
+    proxy for the LLM's that budgets should keep some headroom.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 1800,
+        min_chunk_tokens: int = 40,
+        count_tokens: Optional[Callable[[List[str]], List[int]]] = None
+    ):
+        self.budget_tokens = budget_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self._count_tokens = count_tokens
+        self._lock = threading.Lock()
+        self.packed = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.sentences_deduped = 0
+        self.chunks_truncated = 0
+        self.chunks_dropped = 0
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if self._count_tokens is None:
+            # Imported lazily so importing the LLM service doesn't load the model
+            from backend.services.embeddings import embedding_engine
+            self._count_tokens = embedding_engine.count_tokens
+        return self._count_tokens(texts)
+
+    @staticmethod
+    def header(index: int, chunk: Dict) -> str:
+        """Source line that precedes chunk number index in the prompt"""
+        return f"[{index}] Source: {chunk['metadata']['source']}, Page {chunk['metadata']['page']}\n"
+
+    def pack(
+        self,
+        chunks: List[Dict],
+        budget_tokens: Optional[int] = None,
+        header: Optional[Callable[[int, Dict], str]] = None,
+        track: bool = True
+    ) -> List[Dict]:
+        """Chunks (copies, content possibly shortened) that fit in the budget, most relevant first
+
+        header(index, chunk) is the per-chunk text the caller will put in
+        front of each chunk; its tokens are charged to the budget too.
+        track=False leaves the answer-prompt counters in stats() alone.
+        """
+        budget = budget_tokens or self.budget_tokens
+        header = header or self.header
+        if not chunks:
+            return []
+
+        if all('rerank_score' in chunk for chunk in chunks):
+            chunks = sorted(chunks, key=lambda chunk: chunk['rerank_score'], reverse=True)
+
+        split = [split_sentences(chunk['content']) for chunk in chunks]
+        flat = [sentence for sentences in split for sentence in sentences]
+        counts = iter(self.count_tokens(flat))
+        sentence_tokens = [[next(counts) for _ in sentences] for sentences in split]
+
+        packed: List[Dict] = []
+        seen = set()
+        remaining = budget
+        deduped = truncated = 0
+
+        for chunk, sentences, tokens in zip(chunks, split, sentence_tokens):
+            overhead = self.count_tokens([header(len(packed) + 1, chunk)])[0] + 2
+            room = remaining - overhead
+            if room < min(self.min_chunk_tokens, sum(tokens)):
+                continue
+
+            kept: List[str] = []
+            used = 0
+            cut = False
+            for sentence, n in zip(sentences, tokens):
+                key = _sentence_key(sentence)
+                if key in seen:
+                    deduped += 1
+                    continue
+                if used + n > room:
+                    if not kept:
+                        # A single sentence bigger than the room left
+                        sentence, n = self._cut_words(sentence, room)
+                        if sentence:
+                            kept.append(sentence)
+                            used += n
+                    cut = True
+                    break
+                seen.add(key)
+                kept.append(sentence)
+                used += n
+
+            if not kept:
+                continue
+
+            truncated += cut
+            remaining -= used + overhead
+            # Untouched chunks keep their original layout
+            content = chunk['content'] if not cut and len(kept) == len(sentences) else " ".join(kept)
+            packed.append(dict(chunk, content=content, truncated=cut))
+
+        tokens_in = sum(sum(tokens) for tokens in sentence_tokens)
+        if not track:
+            return packed
+
+        with self._lock:
+            self.packed += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += budget - remaining
+            self.sentences_deduped += deduped
+            self.chunks_truncated += truncated
+            self.chunks_dropped += len(chunks) - len(packed)
+
+        print(
+            f"📦 Packed {len(packed)}/{len(chunks)} chunks into {budget - remaining}/{budget} tokens "
+            f"({tokens_in} retrieved, {deduped} duplicate sentences, {truncated} truncated)"
+        )
+        return packed
+
+    def truncate(self, text: str, budget_tokens: int) -> str:
+        """text unchanged if it fits, else its longest run of leading whole sentences that does"""
+        sentences = split_sentences(text)
+        if not sentences:
+            return ""
+
+        counts = self.count_tokens(sentences)
+        if sum(counts) <= budget_tokens:
+            return text
+
+        kept: List[str] = []
+        used = 0
+        for sentence, n in zip(sentences, counts):
+            if used + n > budget_tokens:
+                if not kept:
+                    kept.append(self._cut_words(sentence, budget_tokens)[0])
+                break
+            kept.append(sentence)
+            used += n
+        return " ".join(kept)
+
+    def _cut_words(self, sentence: str, budget_tokens: int) -> Tuple[str, int]:
+        """Longest word prefix of sentence within the budget, and its token count"""
+        words = sentence.split()
+        low, high = 0, len(words)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count_tokens([" ".join(words[:mid])])[0] <= budget_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        prefix = " ".join(words[:low])
+        return prefix, self.count_tokens([prefix])[0] if prefix else 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_tokens": self.budget_tokens,
+                "prompts_packed": self.packed,
+                "tokens_retrieved": self.tokens_in,
+                "tokens_packed": self.tokens_out,
+                "sentences_deduped": self.sentences_deduped,
+                "chunks_truncated": self.chunks_truncated,
+                "chunks_dropped": self.chunks_dropped
+            }
+
+
+context_packer = ContextPacker(
+    budget_tokens=int(os.getenv("PROMPT_CONTEXT_TOKENS", "1800")),
+    min_chunk_tokens=int(os.getenv("PROMPT_MIN_CHUNK_TOKENS", "40"))
+)
@@ -0,0 +1,144 @@
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from backend.services.cache import DiskVectorCache, LRUCache
+from backend.services.metrics import QUERY_STAGE_SECONDS
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used both as cache key and as the text embedded"""
+    return " ".join(query.lower().split())
+
+
+class EmbeddingEngine:
+    """Single shared SentenceTransformer for ingestion and query embeddings"""
+
+    _instance: Optional['EmbeddingEngine'] = None
+    _initialized: bool = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        self.batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.device = os.getenv("EMBEDDING_DEVICE") or None
+        self.model = SentenceTransformer(self.model_name, device=self.device)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+        # Query embeddings: in-memory LRU/TTL, optionally backed by SQLite
+        self.query_cache = LRUCache(
+            maxsize=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")) or None
+        )
+        cache_path = os.getenv("QUERY_CACHE_PATH")
+        self.query_disk_cache = DiskVectorCache(
+            cache_path,
+            max_rows=int(os.getenv("QUERY_CACHE_DISK_ROWS", "100000")),
+            max_age=float(os.getenv("QUERY_CACHE_DISK_TTL", "604800")) or None
+        ) if cache_path else None
+
+        self._initialized = True
+        print(f"✓ Embedding engine ready ({self.model_name}, dim={self.dimension}, batch={self.batch_size})")
+
+    def embed(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Embed texts as L2-normalised float32 rows"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size or self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a single query string, served from cache when possible"""
+        text = normalize_query(query)
+
+        embedding = self.query_cache.get(text)
+        if embedding is not None:
+            return embedding
+
+        disk_key = f"{self.model_name}:{text}"
+        if self.query_disk_cache is not None:
+            embedding = self.query_disk_cache.get(disk_key)
+
+        if embedding is None:
+            # Only model calls count as the embedding stage, not cache hits
+            start = time.perf_counter()
+            embedding = self.embed([text])[0]
+            QUERY_STAGE_SECONDS.observe(time.perf_counter() - start, stage="embedding")
+            if self.query_disk_cache is not None:
+                self.query_disk_cache.set(disk_key, embedding)
+
+        # Cached arrays are shared between callers
+        embedding.setflags(write=False)
+        self.query_cache.set(text, embedding)
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Embed several queries, with one batched model call for all cache misses"""
+        texts = [normalize_query(query) for query in queries]
+        found = {}
+        missing = []
+
+        for text in dict.fromkeys(texts):
+            embedding = self.query_cache.get(text)
+            if embedding is None and self.query_disk_cache is not None:
+                embedding = self.query_disk_cache.get(f"{self.model_name}:{text}")
+                if embedding is not None:
+                    embedding.setflags(write=False)
+                    self.query_cache.set(text, embedding)
+
+            if embedding is None:
+                missing.append(text)
+            else:
+                found[text] = embedding
+
+        start = time.perf_counter()
+        embeddings = self.embed(missing)
+        if missing:
+            QUERY_STAGE_SECONDS.observe(time.perf_counter() - start, stage="embedding")
+        for text, embedding in zip(missing, embeddings):
+            if self.query_disk_cache is not None:
+                self.query_disk_cache.set(f"{self.model_name}:{text}", embedding)
+            # Cached arrays are shared between callers
+            embedding.setflags(write=False)
+            self.query_cache.set(text, embedding)
+            found[text] = embedding
+
+        return [found[text] for text in texts]
+
+    @property
+    def max_tokens(self) -> int:
+        """Longest input (in tokens, special tokens included) the model embeds without truncating"""
+        return self.model.max_seq_length
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token count per text with the model's own tokenizer (no special tokens)"""
+        if not texts:
+            return []
+        encoded = self.model.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for the query embedding caches"""
+        return {
+            "memory": self.query_cache.stats(),
+            "disk": self.query_disk_cache.stats() if self.query_disk_cache else None
+        }
+
+embedding_engine = EmbeddingEngine()
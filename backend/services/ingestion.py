@@ -0,0 +1,265 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from backend.services.metrics import INGEST_STAGE_SECONDS
+from backend.services.page_renderer import page_renderer
+from backend.services.pdf_loader import pdf_loader
+from backend.services.rag import rag_system
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class IngestionManager:
+    """Run PDF ingestion (parse, chunk, embed, upsert) in a worker pool
+
+    Progress is tracked per ingestion id and can be polled or subscribed to
+    as a stream of events. Workers never touch ingestion state directly; they
+    hand updates back to the event loop with call_soon_threadsafe.
+    
+    Ingestions of the same filename run one at a time in submit order, and so
+    do ingestions of the same content, so a second copy of a file that is
+    still being indexed becomes an alias instead of being embedded twice.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_history: int = 100):
+        self.max_workers = max_workers or int(os.getenv("INGESTION_WORKERS", "2"))
+        self.max_history = max_history
+        # Optional stage: render page images for the viewer while text is indexed
+        self.prerender = os.getenv("PRERENDER_THUMBNAILS", "false").lower() == "true"
+        self.prerender_max_pages = int(os.getenv("PRERENDER_MAX_PAGES", "0"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="ingestion"
+        )
+        self._ingestions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        # (sha256, filename) -> ingestion id, from submit until the run ends
+        self._pending: Dict[Tuple[str, str], str] = {}
+        # Per name and per hash: ids in submit order; only the head may run
+        self._turns: Dict[str, deque] = {}
+        self._turns_changed = threading.Condition()
+        print(f"Ingestion pool ready ({self.max_workers} workers)")
+
+    def submit(
+        self,
+        file_path: str,
+        filename: str,
+        content_hash: Optional[str] = None,
+        staged_path: Optional[str] = None
+    ) -> str:
+        """Queue a saved PDF for ingestion and return its ingestion id
+
+        staged_path holds an upload that replaces an existing PDF; it is moved
+        over file_path only once indexing succeeds, so a failed re-index leaves
+        the old PDF and its index in place. Without it the upload was saved
+        straight to file_path, which is removed if ingestion fails.
+        """
+        loop = asyncio.get_running_loop()
+        ingestion_id = str(uuid.uuid4())
+
+        self._ingestions[ingestion_id] = {
+            "ingestion_id": ingestion_id,
+            "filename": filename,
+            "content_hash": content_hash,
+            "status": "queued",
+            "pages_total": 0,
+            "pages_parsed": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_upserted": 0,
+            "pages_prerendering": 0,
+            "pages_prerendered": 0,
+            "alias_of": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat()
+        }
+        self._evict_finished()
+        keys = self._turn_keys(filename, content_hash)
+        with self._turns_changed:
+            for key in keys:
+                self._turns.setdefault(key, deque()).append(ingestion_id)
+            if content_hash:
+                self._pending[(content_hash, filename)] = ingestion_id
+
+        loop.run_in_executor(
+            self._executor, self._run, loop, ingestion_id, file_path, filename, content_hash, staged_path
+        )
+        print(f"✓ Queued ingestion {ingestion_id[:8]}... for {filename}")
+        return ingestion_id
+
+    def get(self, ingestion_id: str) -> Optional[Dict[str, Any]]:
+        """Get ingestion progress by ID"""
+        return self._ingestions.get(ingestion_id)
+
+    def find_pending(self, content_hash: str, filename: str) -> Optional[str]:
+        """Id of a queued or running ingestion of these bytes under this name"""
+        with self._turns_changed:
+            return self._pending.get((content_hash, filename))
+
+    @staticmethod
+    def _turn_keys(filename: str, content_hash: Optional[str]) -> List[str]:
+        return [f"name:{filename}"] + ([f"sha256:{content_hash}"] if content_hash else [])
+
+    @contextmanager
+    def _turn(self, ingestion_id: str, keys: List[str]):
+        """Wait until every earlier ingestion of the same name or content is done
+
+        Turns are handed out in submit order, which is also the order the pool
+        starts jobs in, so a waiting worker only ever waits on running jobs.
+        """
+        with self._turns_changed:
+            self._turns_changed.wait_for(lambda: all(self._turns[key][0] == ingestion_id for key in keys))
+        try:
+            yield
+        finally:
+            with self._turns_changed:
+                for key in keys:
+                    self._turns[key].popleft()
+                    if not self._turns[key]:
+                        del self._turns[key]
+                self._turns_changed.notify_all()
+
+    async def subscribe(self, ingestion_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """Yield progress events until the ingestion finishes
+
+        The first event is always a snapshot of the current state, so late
+        subscribers see everything that already happened.
+        """
+        record = self._ingestions.get(ingestion_id)
+        if record is None:
+            return
+
+        yield {"event": "status", "data": dict(record)}
+        if record["status"] in TERMINAL_STATUSES:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(ingestion_id, []).append(queue)
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["data"]["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            subscribers = self._subscribers.get(ingestion_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                self._subscribers.pop(ingestion_id, None)
+
+    def _run(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        ingestion_id: str,
+        file_path: str,
+        filename: str,
+        content_hash: Optional[str] = None,
+        staged_path: Optional[str] = None
+    ):
+        """Worker-side pipeline; runs in the thread pool"""
+
+        def emit(event: str, **updates):
+            loop.call_soon_threadsafe(self._apply, ingestion_id, event, updates)
+
+        def on_page(pages_done: int, total_pages: int):
+            emit("pages_parsed", pages_parsed=pages_done, pages_total=total_pages)
+
+        def on_chunks(embedded: int, upserted: int):
+            event = "chunks_embedded" if embedded > upserted else "chunks_upserted"
+            emit(event, chunks_embedded=embedded, chunks_upserted=upserted)
+
+        def on_prerender(prerendered: int, pending: int):
+            # Can keep arriving after indexing finishes; pollers still see it
+            emit("pages_prerendered", pages_prerendered=prerendered, pages_prerendering=pending)
+
+        start = time.perf_counter()
+        outcome = "failed"
+        try:
+            with self._turn(ingestion_id, self._turn_keys(filename, content_hash)):
+                emit("status", status="indexing")
+                try:
+                    total, alias_of = self._index(
+                        staged_path or file_path, filename, content_hash, on_page, on_chunks
+                    )
+                    if staged_path:
+                        os.replace(staged_path, file_path)
+                except Exception:
+                    # The index is already rolled back; drop the upload before
+                    # the next ingestion of this name starts
+                    doomed = staged_path or file_path
+                    if os.path.exists(doomed):
+                        os.remove(doomed)
+                    raise
+
+            outcome = "completed"
+            emit("status", status="completed", chunks_total=total, alias_of=alias_of)
+            print(f"✓ Ingestion {ingestion_id[:8]}... complete: {total} chunks from {filename}")
+
+        except Exception as e:
+            print(f"✗ Ingestion {ingestion_id[:8]}... failed: {str(e)}")
+            emit("status", status="failed", error=str(e))
+
+        finally:
+            if content_hash:
+                with self._turns_changed:
+                    if self._pending.get((content_hash, filename)) == ingestion_id:
+                        del self._pending[(content_hash, filename)]
+            # Failed uploads count too, or the histogram only shows successes
+            INGEST_STAGE_SECONDS.observe(time.perf_counter() - start, stage="total", outcome=outcome)
+
+        # The PDF is only in place now; page images are extra and never fail the upload
+        if outcome == "completed" and self.prerender and not alias_of:
+            try:
+                page_renderer.prerender(file_path, self.prerender_max_pages, on_progress=on_prerender)
+            except Exception as e:
+                print(f"⚠️ Pre-render skipped for {filename}: {str(e)}")
+
+    def _index(self, pdf_path, filename, content_hash, on_page, on_chunks) -> Tuple[int, Optional[str]]:
+        """Index one upload during its turn; returns (chunks, alias_of)"""
+        # Checked here rather than at upload time: an identical file may have
+        # finished indexing while this one waited
+        duplicate_of = rag_system.find_duplicate(content_hash) if content_hash else None
+        if duplicate_of and duplicate_of != filename:
+            rag_system.alias_document(filename, duplicate_of)
+            return len(rag_system.sources.get(duplicate_of)), duplicate_of
+
+        # Pages are parsed, chunked and upserted as a stream of batches
+        chunks = pdf_loader.iter_chunks(pdf_path, on_page=on_page)
+        total = rag_system.add_documents(chunks, filename, on_progress=on_chunks, content_hash=content_hash)
+        return total, None
+
+    def _apply(self, ingestion_id: str, event: str, updates: Dict[str, Any]):
+        """Apply a worker update on the event loop and fan it out"""
+        record = self._ingestions.get(ingestion_id)
+        if record is None:
+            return
+
+        record.update(updates)
+        record["updated_at"] = datetime.now().isoformat()
+
+        for queue in self._subscribers.get(ingestion_id, []):
+            queue.put_nowait({"event": event, "data": dict(record)})
+
+    def _evict_finished(self):
+        """Drop the oldest finished ingestions once history is full"""
+        if len(self._ingestions) <= self.max_history:
+            return
+
+        for ingestion_id in list(self._ingestions):
+            if len(self._ingestions) <= self.max_history:
+                break
+            if self._ingestions[ingestion_id]["status"] in TERMINAL_STATUSES:
+                del self._ingestions[ingestion_id]
+
+
+ingestion_manager = IngestionManager()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, Optional, Tuple
+
+
+class JobEventBuffer:
+    """Ring buffer of one job's events, plus a wake-up signal for tailing readers
+
+    Each event gets a sequence number (its SSE id). Only the newest maxlen
+    events are kept; a reader that falls further behind resumes from the
+    oldest event still buffered.
+    """
+
+    __slots__ = ("events", "next_seq", "closed", "_changed")
+
+    def __init__(self, maxlen: int = 4096):
+        self.events: Deque[Tuple[int, str, str]] = deque(maxlen=maxlen)
+        self.next_seq = 1
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def append(self, event: str, data: str):
+        self.events.append((self.next_seq, event, data))
+        self.next_seq += 1
+        self._notify()
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        # Wake every current reader, then arm a fresh event for the next write
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+    def since(self, last_seq: int) -> Tuple[Tuple[int, str, str], ...]:
+        """Buffered events with a sequence number above last_seq"""
+        if not self.events:
+            return ()
+        start = max(0, last_seq + 1 - self.events[0][0])
+        return tuple(self.events[i] for i in range(start, len(self.events)))
+
+
+class JobEventBus:
+    """Per-job buffers that workers publish to and /stream/{job_id} tails
+
+    Data is stored already serialised (the SSE data line), so fanning out
+    to several readers never re-encodes. Buffers hold at most buffer_size
+    events and are dropped retention seconds after the job closes; keep
+    retention at least as long as the job TTL so a job that still exists
+    always has its events.
+    """
+
+    def __init__(self, retention: float = 3600.0, buffer_size: int = 4096):
+        self.retention = retention
+        self.buffer_size = buffer_size
+        self._buffers: Dict[str, JobEventBuffer] = {}
+
+    def open(self, job_id: str) -> JobEventBuffer:
+        buffer = self._buffers.get(job_id)
+        if buffer is None:
+            buffer = self._buffers[job_id] = JobEventBuffer(self.buffer_size)
+        return buffer
+
+    def publish(self, job_id: str, event: str, data: str):
+        self.open(job_id).append(event, data)
+
+    def close(self, job_id: str):
+        buffer = self._buffers.get(job_id)
+        if buffer is None or buffer.closed:
+            return
+        buffer.close()
+        asyncio.get_running_loop().call_later(self.retention, self._expire, job_id, buffer)
+
+    def discard(self, job_id: str):
+        buffer = self._buffers.pop(job_id, None)
+        if buffer is not None and not buffer.closed:
+            buffer.close()
+
+    def _expire(self, job_id: str, buffer: JobEventBuffer):
+        if self._buffers.get(job_id) is buffer:
+            del self._buffers[job_id]
+
+    def get(self, job_id: str) -> Optional[JobEventBuffer]:
+        return self._buffers.get(job_id)
+
+    async def subscribe(
+        self,
+        job_id: str,
+        last_seq: int = 0
+    ) -> AsyncGenerator[Tuple[Tuple[int, str, str], ...], None]:
+        """Yield batches of (seq, event, data) after last_seq, then tail until closed
+
+        Each batch is everything buffered since the previous one, so a
+        reader that wakes up late gets all pending events in one go.
+        Yields nothing if the job has no buffer (expired or discarded);
+        readers never create one, so nothing is left open behind them.
+        """
+        buffer = self.get(job_id)
+        if buffer is None:
+            return
+
+        while True:
+            batch = buffer.since(last_seq)
+            if batch:
+                last_seq = batch[-1][0]
+                yield batch
+
+            if buffer.closed and last_seq >= buffer.next_seq - 1:
+                return
+            if not buffer.closed:
+                await buffer.wait()
+
+
+job_event_bus = JobEventBus(
+    # Never shorter than the job TTL (see JobEventBus)
+    retention=max(float(os.getenv("JOB_EVENT_RETENTION", "3600")), float(os.getenv("JOB_TTL_SECONDS", "3600"))),
+    buffer_size=int(os.getenv("JOB_EVENT_BUFFER", "4096"))
+)
@@ -1,72 +1,157 @@
-from typing import Dict, Optional
-import uuid
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
 from datetime import datetime
+from itertools import islice
+import asyncio
+import heapq
+import os
+import time
+import uuid
+
+class Job:
+    """Streaming job record (slotted to keep per-job memory small)"""
+    
+    __slots__ = ("id", "query", "status", "created_at", "updated_at", "expires_at", "cache_hit")
+    
+    def __init__(self, job_id: str, query: str, expires_at: float):
+        now = time.time()
+        self.id = job_id
+        self.query = query
+        self.status = "pending"
+        self.created_at = now
+        self.updated_at = now
+        self.expires_at = expires_at
+        self.cache_hit = False
+    
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "query": self.query,
+            "status": self.status,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "updated_at": datetime.fromtimestamp(self.updated_at).isoformat(),
+            "cache_hit": self.cache_hit
+        }
 
 class JobManager:
-    """Manage streaming job states"""
+    """Manage streaming job states
+    
+    Jobs live in an LRU-ordered dict capped at max_jobs, and expire ttl
+    seconds after their last update. Expiry is driven by a min-heap of
+    (expires_at, job_id) so a sweep only touches jobs that are actually due.
+    """
     
     _instance: Optional['JobManager'] = None
+    _initialized: bool = False
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._jobs = {}
         return cls._instance
     
     def __init__(self):
-        if not hasattr(self, '_jobs'):
-            self._jobs: Dict[str, Dict] = {}
+        if self._initialized:
+            return
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._expiry: List[Tuple[float, str]] = []
+        self.max_jobs = int(os.getenv("JOB_MAX_COUNT", "10000"))
+        self.ttl = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+        self.sweep_interval = float(os.getenv("JOB_SWEEP_INTERVAL", "60"))
+        self._expiry_task: Optional[asyncio.Task] = None
+        self._initialized = True
+    
+    def _touch(self, job: Job):
+        """Mark job as recently used and push back its expiry"""
+        job.updated_at = time.time()
+        job.expires_at = time.monotonic() + self.ttl
+        heapq.heappush(self._expiry, (job.expires_at, job.id))
+        self._jobs.move_to_end(job.id)
     
     def create_job(self, query: str) -> str:
         """Create a new job and return its ID"""
         job_id = str(uuid.uuid4())
-        self._jobs[job_id] = {
-            "id": job_id,
-            "query": query,
-            "status": "pending",
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat()
-        }
+        
+        # Evict least recently used jobs once at capacity
+        while len(self._jobs) >= self.max_jobs:
+            evicted_id, _ = self._jobs.popitem(last=False)
+            print(f"⚠️ Evicted job {evicted_id[:8]}... (job limit {self.max_jobs})")
+        
+        job = Job(job_id, query, time.monotonic() + self.ttl)
+        self._jobs[job_id] = job
+        heapq.heappush(self._expiry, (job.expires_at, job_id))
         print(f"✓ Created job {job_id[:8]}... for query: '{query[:50]}...'")
         return job_id
     
-    def get_job(self, job_id: str) -> Optional[Dict]:
-        """Get job by ID"""
-        return self._jobs.get(job_id)
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Get job by ID (counts as a use for LRU eviction)"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._jobs.move_to_end(job_id)
+        return job
     
     def update_status(self, job_id: str, status: str):
         """Update job status"""
-        if job_id in self._jobs:
-            self._jobs[job_id]["status"] = status
-            self._jobs[job_id]["updated_at"] = datetime.now().isoformat()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.status = status
+            self._touch(job)
             print(f"✓ Job {job_id[:8]}... status: {status}")
     
     def delete_job(self, job_id: str):
         """Delete a job"""
-        if job_id in self._jobs:
-            del self._jobs[job_id]
+        if self._jobs.pop(job_id, None) is not None:
             print(f"✓ Deleted job {job_id[:8]}...")
     
-    def get_all_jobs(self) -> Dict[str, Dict]:
-        """Get all jobs"""
-        return self._jobs
+    def count(self) -> int:
+        return len(self._jobs)
     
-    def cleanup_old_jobs(self, max_age_seconds: int = 3600):
-        """Remove jobs older than max_age_seconds"""
-        from datetime import datetime, timedelta
-        
-        now = datetime.now()
-        to_delete = []
+    def list_jobs(self, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Page through jobs, most recently active first"""
+        page = islice(reversed(self._jobs.values()), offset, offset + limit)
+        return [job.to_dict() for job in page]
+    
+    def cleanup_expired(self) -> int:
+        """Remove jobs whose TTL has passed; returns how many were removed"""
+        now = time.monotonic()
+        removed = 0
         
-        for job_id, job in self._jobs.items():
-            created = datetime.fromisoformat(job["created_at"])
-            if (now - created).total_seconds() > max_age_seconds:
-                to_delete.append(job_id)
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, job_id = heapq.heappop(self._expiry)
+            job = self._jobs.get(job_id)
+            # Skip stale heap entries for jobs touched (or removed) since
+            if job is not None and job.expires_at == expires_at:
+                del self._jobs[job_id]
+                removed += 1
         
-        for job_id in to_delete:
-            self.delete_job(job_id)
+        # Heap entries for evicted/deleted jobs would otherwise pile up
+        if len(self._expiry) > 4 * max(len(self._jobs), 1024):
+            self._expiry = [(job.expires_at, job.id) for job in self._jobs.values()]
+            heapq.heapify(self._expiry)
         
-        if to_delete:
-            print(f"🧹 Cleaned up {len(to_delete)} old jobs")
+        if removed:
+            print(f"🧹 Cleaned up {removed} expired jobs")
+        return removed
+    
+    async def _expiry_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                print(f"⚠️ Job expiry sweep failed: {str(e)}")
+    
+    def start_expiry_task(self):
+        """Start the background expiry sweep (call from the running loop)"""
+        if self._expiry_task is None or self._expiry_task.done():
+            self._expiry_task = asyncio.create_task(self._expiry_loop())
+    
+    async def stop_expiry_task(self):
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+            try:
+                await self._expiry_task
+            except asyncio.CancelledError:
+                pass
+            self._expiry_task = None
 
-job_manager = JobManager()
\ No newline at end of file
+job_manager = JobManager()
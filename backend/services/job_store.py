@@ -0,0 +1,407 @@
+import os
+import re
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from backend.services.job_events import job_event_bus
+from backend.services.job_manager import job_manager
+
+
+class JobStore(ABC):
+    """Where job state and job events live
+
+    Routers and workers only talk to this interface, so the backend can be
+    swapped without touching them. Events are published as (event, data)
+    pairs, where data is the already-serialised SSE data line, and read back
+    with an id that a reconnecting client can resume from (Last-Event-ID).
+    """
+
+    backend = "base"
+
+    async def start(self):
+        """Start any background work (call from the running loop)"""
+
+    async def stop(self):
+        """Stop background work and release connections"""
+
+    @abstractmethod
+    async def create_job(self, query: str) -> str:
+        """Create a pending job and return its id"""
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Job as a dict, or None if it doesn't exist (or expired)"""
+
+    @abstractmethod
+    async def update_status(self, job_id: str, status: str):
+        """Set the job's status and refresh its TTL"""
+
+    @abstractmethod
+    async def set_cache_hit(self, job_id: str):
+        """Mark the job as answered from the answer cache"""
+
+    @abstractmethod
+    async def delete_job(self, job_id: str):
+        """Delete the job and its events"""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of live jobs"""
+
+    @abstractmethod
+    async def list_jobs(self, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Page through jobs, most recently active first"""
+
+    @abstractmethod
+    async def publish(self, job_id: str, event: str, data: str):
+        """Append an event to the job's stream"""
+
+    @abstractmethod
+    async def close_stream(self, job_id: str):
+        """Mark the job's event stream finished so readers stop tailing"""
+
+    @abstractmethod
+    async def discard_stream(self, job_id: str):
+        """Drop the job's events immediately"""
+
+    @abstractmethod
+    async def exists(self, job_id: str) -> bool:
+        """True while the job or its event stream is still around"""
+
+    @abstractmethod
+    def subscribe(
+        self,
+        job_id: str,
+        last_event_id: Optional[str] = None
+    ) -> AsyncGenerator[List[Tuple[str, str, str]], None]:
+        """Yield batches of (id, event, data) after last_event_id (or from the start), then tail until closed"""
+
+    async def expired_events(self, job_id: str) -> List[Tuple[str, str, str]]:
+        """Terminal (id, event, data) batch for a job whose events are gone
+
+        A reader arriving after the event stream expired gets the job's
+        stored status and a final "end" instead of tailing a stream that
+        will never be closed.
+        """
+        job = await self.get_job(job_id)
+        status = job["status"] if job else "unknown"
+        return [
+            ("0", "error", f"Job events are no longer available (status: {status})"),
+            ("0", "end", "failed")
+        ]
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend}
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store backed by job_manager and job_event_bus
+
+    Fine for a single uvicorn worker; jobs are invisible to other processes.
+    """
+
+    backend = "memory"
+
+    async def start(self):
+        job_manager.start_expiry_task()
+
+    async def stop(self):
+        await job_manager.stop_expiry_task()
+
+    async def create_job(self, query: str) -> str:
+        job_id = job_manager.create_job(query)
+        job_event_bus.open(job_id)
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        job = job_manager.get_job(job_id)
+        return job.to_dict() if job else None
+
+    async def update_status(self, job_id: str, status: str):
+        job_manager.update_status(job_id, status)
+
+    async def set_cache_hit(self, job_id: str):
+        job = job_manager.get_job(job_id)
+        if job is not None:
+            job.cache_hit = True
+
+    async def delete_job(self, job_id: str):
+        job_manager.delete_job(job_id)
+        job_event_bus.discard(job_id)
+
+    async def count(self) -> int:
+        return job_manager.count()
+
+    async def list_jobs(self, offset: int = 0, limit: int = 50) -> List[Dict]:
+        return job_manager.list_jobs(offset, limit)
+
+    async def publish(self, job_id: str, event: str, data: str):
+        job_event_bus.publish(job_id, event, data)
+
+    async def close_stream(self, job_id: str):
+        job_event_bus.close(job_id)
+
+    async def discard_stream(self, job_id: str):
+        job_event_bus.discard(job_id)
+
+    async def exists(self, job_id: str) -> bool:
+        return job_manager.get_job(job_id) is not None or job_event_bus.get(job_id) is not None
+
+    async def subscribe(
+        self,
+        job_id: str,
+        last_event_id: Optional[str] = None
+    ) -> AsyncGenerator[List[Tuple[str, str, str]], None]:
+        if job_event_bus.get(job_id) is None:
+            # Buffers are opened by create_job, so a missing one has expired
+            yield await self.expired_events(job_id)
+            return
+
+        last_seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        async for batch in job_event_bus.subscribe(job_id, last_seq):
+            yield [(str(seq), event, data) for seq, event, data in batch]
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend, "jobs": job_manager.count()}
+
+
+class RedisJobStore(JobStore):
+    """Shared store so any uvicorn worker can serve any job
+
+    Job state is a hash per job plus a sorted set (by last update) for
+    listing; events go to a Redis Stream per job (capped at stream_maxlen
+    entries) that readers tail with XREAD BLOCK, using stream entry ids as
+    SSE ids. Everything carries a TTL so abandoned jobs clean themselves
+    up. A fakeredis:// URL uses fakeredis for offline testing.
+    """
+
+    backend = "redis"
+
+    # Stream entry that marks the end of a job's events
+    CLOSE_EVENT = "__close__"
+    STREAM_ID = re.compile(r"^\d+-\d+$")
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "calquity:",
+        ttl: float = 3600.0,
+        retention: float = 3600.0,
+        stream_maxlen: int = 4096,
+        block_ms: int = 5000
+    ):
+        self.url = url
+        self.prefix = prefix
+        self.ttl = int(ttl)
+        # Closed streams must not expire before their job hash does
+        self.retention = int(max(retention, ttl))
+        self.stream_maxlen = stream_maxlen
+        self.block_ms = block_ms
+
+        if url.startswith("fakeredis://"):
+            try:
+                from fakeredis import aioredis as fake_aioredis
+            except ImportError:
+                raise RuntimeError("REDIS_URL=fakeredis:// requires the fakeredis package")
+            self.redis = fake_aioredis.FakeRedis(decode_responses=True)
+        else:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                raise RuntimeError("JOB_STORE=redis requires the redis package (pip install redis)")
+            self.redis = redis_asyncio.from_url(url, decode_responses=True)
+
+        print(f"✓ Using Redis job store at {url}")
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    def _stream_key(self, job_id: str) -> str:
+        return f"{self.prefix}events:{job_id}"
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.prefix}jobs"
+
+    async def stop(self):
+        await self.redis.aclose()
+
+    @staticmethod
+    def _to_dict(fields: Dict[str, str]) -> Dict:
+        return {
+            "id": fields["id"],
+            "query": fields["query"],
+            "status": fields["status"],
+            "created_at": datetime.fromtimestamp(float(fields["created_at"])).isoformat(),
+            "updated_at": datetime.fromtimestamp(float(fields["updated_at"])).isoformat(),
+            "cache_hit": fields.get("cache_hit") == "1"
+        }
+
+    async def create_job(self, query: str) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        key = self._job_key(job_id)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                "id": job_id,
+                "query": query,
+                "status": "pending",
+                "created_at": now,
+                "updated_at": now,
+                "cache_hit": "0"
+            })
+            pipe.expire(key, self.ttl)
+            pipe.zadd(self._index_key, {job_id: now})
+            # Index entries outlive their hashes; trim the expired ones
+            pipe.zremrangebyscore(self._index_key, 0, now - self.ttl)
+            await pipe.execute()
+
+        print(f"✓ Created job {job_id[:8]}... for query: '{query[:50]}...'")
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        fields = await self.redis.hgetall(self._job_key(job_id))
+        return self._to_dict(fields) if fields else None
+
+    async def _update(self, job_id: str, mapping: Dict) -> bool:
+        key = self._job_key(job_id)
+        if not await self.redis.exists(key):
+            return False
+
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={**mapping, "updated_at": now})
+            pipe.expire(key, self.ttl)
+            pipe.zadd(self._index_key, {job_id: now})
+            await pipe.execute()
+        return True
+
+    async def update_status(self, job_id: str, status: str):
+        if await self._update(job_id, {"status": status}):
+            print(f"✓ Job {job_id[:8]}... status: {status}")
+
+    async def set_cache_hit(self, job_id: str):
+        await self._update(job_id, {"cache_hit": "1"})
+
+    async def delete_job(self, job_id: str):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._job_key(job_id), self._stream_key(job_id))
+            pipe.zrem(self._index_key, job_id)
+            removed, _ = await pipe.execute()
+        if removed:
+            print(f"✓ Deleted job {job_id[:8]}...")
+
+    async def count(self) -> int:
+        await self.redis.zremrangebyscore(self._index_key, 0, time.time() - self.ttl)
+        return await self.redis.zcard(self._index_key)
+
+    async def list_jobs(self, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Page through jobs, most recently active first"""
+        job_ids = await self.redis.zrevrange(self._index_key, offset, offset + limit - 1)
+        if not job_ids:
+            return []
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hgetall(self._job_key(job_id))
+            rows = await pipe.execute()
+        return [self._to_dict(fields) for fields in rows if fields]
+
+    async def publish(self, job_id: str, event: str, data: str):
+        key = self._stream_key(job_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(key, {"event": event, "data": data}, maxlen=self.stream_maxlen, approximate=True)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def close_stream(self, job_id: str):
+        key = self._stream_key(job_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(key, {"event": self.CLOSE_EVENT, "data": ""})
+            pipe.expire(key, self.retention)
+            await pipe.execute()
+
+    async def discard_stream(self, job_id: str):
+        await self.redis.delete(self._stream_key(job_id))
+
+    async def _stream_expired(self, job_id: str) -> bool:
+        """True if the job finished but its stream is gone
+
+        The stream key only appears with the first event, so a missing
+        stream for a pending or processing job just means nothing has been
+        published yet.
+        """
+        if await self.redis.exists(self._stream_key(job_id)):
+            return False
+        job = await self.get_job(job_id)
+        return job is not None and job["status"] in ("completed", "failed")
+
+    async def exists(self, job_id: str) -> bool:
+        return bool(await self.redis.exists(self._job_key(job_id), self._stream_key(job_id)))
+
+    async def subscribe(
+        self,
+        job_id: str,
+        last_event_id: Optional[str] = None
+    ) -> AsyncGenerator[List[Tuple[str, str, str]], None]:
+        key = self._stream_key(job_id)
+        last_id = last_event_id if last_event_id and self.STREAM_ID.match(last_event_id) else "0-0"
+
+        if await self._stream_expired(job_id):
+            yield await self.expired_events(job_id)
+            return
+
+        while True:
+            response = await self.redis.xread({key: last_id}, count=256, block=self.block_ms)
+
+            if not response:
+                # Nothing new within the block window; give up if the job is gone
+                if not await self.exists(job_id):
+                    return
+                if await self._stream_expired(job_id):
+                    yield await self.expired_events(job_id)
+                    return
+                continue
+
+            batch = []
+            closed = False
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    if fields.get("event") == self.CLOSE_EVENT:
+                        closed = True
+                        break
+                    batch.append((entry_id, fields["event"], fields["data"]))
+
+            if batch:
+                yield batch
+            if closed:
+                return
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend, "url": self.url}
+
+
+def create_job_store() -> JobStore:
+    """Build the store selected by JOB_STORE (memory or redis)"""
+    backend = os.getenv("JOB_STORE", "memory").lower()
+
+    if backend == "redis":
+        return RedisJobStore(
+            url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("REDIS_PREFIX", "calquity:"),
+            ttl=float(os.getenv("JOB_TTL_SECONDS", "3600")),
+            retention=float(os.getenv("JOB_EVENT_RETENTION", "3600")),
+            stream_maxlen=int(os.getenv("JOB_EVENT_BUFFER", "4096"))
+        )
+
+    if backend != "memory":
+        print(f"⚠️ Unknown JOB_STORE '{backend}', using in-memory store")
+    return InMemoryJobStore()
+
+
+job_store = create_job_store()
@@ -1,8 +1,12 @@
 import os
 from typing import AsyncGenerator, List, Dict, Optional
+import asyncio
 import re
 import json
 
+from backend.services.context_packer import context_packer
+from backend.services.metrics import QUERY_STAGE_SECONDS
+
 class LLMService:
     """Groq LLM Service with Llama 4 multimodal support"""
     
@@ -19,30 +23,118 @@ class LLMService:
             return
             
         self.api_key = os.getenv("GROQ_API_KEY")
+        # "groq" calls the API; "stub" uses a local deterministic fake (no
+        # key or network) with LLM_STUB_* latency and token-rate settings
+        self.backend = os.getenv("LLM_BACKEND", "groq").lower()
+        self.stub_model = None
         self.client = None
+        self.async_client = None
+        # "async" shares one pooled AsyncGroq client across all streams;
+        # "sync" keeps the blocking Groq client
+        self.client_mode = os.getenv("GROQ_CLIENT_MODE", "async")
+        self.request_timeout = float(os.getenv("GROQ_TIMEOUT", "60"))
+        self.max_connections = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("GROQ_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+        # "concurrent" runs the visualization call alongside the text stream
+        self.visualization_mode = os.getenv("VISUALIZATION_MODE", "concurrent")
+        # Token budget for the document context sent to the visualization call
+        self.visualization_context_tokens = int(os.getenv("VISUALIZATION_CONTEXT_TOKENS", "750"))
         self.model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
         # Llama 4 multimodal model for vision tasks
         self.vision_model = os.getenv("GROQ_VISION_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
         self._initialized = True
         print(" LLM Service ready")
     
+    def _ensure_stub_model(self):
+        if self.stub_model is None:
+            from backend.services.llm_stub import create_stub_model
+            self.stub_model = create_stub_model()
+            print(
+                f"✓ Stub LLM backend ({self.stub_model.latency * 1000:.0f}ms latency, "
+                f"{os.getenv('LLM_STUB_TOKENS_PER_SEC', '150')} tokens/s)"
+            )
+        return self.stub_model
+    
     def _ensure_client(self):
         if self.client is not None:
             return
+        if self.backend == "stub":
+            from backend.services.llm_stub import StubGroq
+            self.client = StubGroq(self._ensure_stub_model())
+            return
         from groq import Groq
-        self.client = Groq(api_key=self.api_key)
+        self.client = Groq(api_key=self.api_key, timeout=self.request_timeout)
         print(f"✓ Groq client initialized ({self.model})")
     
+    def _ensure_async_client(self):
+        if self.async_client is not None:
+            return
+        if self.backend == "stub":
+            from backend.services.llm_stub import StubAsyncGroq
+            self.async_client = StubAsyncGroq(self._ensure_stub_model())
+            return
+        import httpx
+        from groq import AsyncGroq
+        
+        # One keep-alive pool shared by every concurrent stream
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.request_timeout, connect=10.0)
+        )
+        self.async_client = AsyncGroq(api_key=self.api_key, http_client=http_client)
+        print(f"✓ Async Groq client initialized ({self.model}, pool={self.max_connections})")
+    
+    async def aclose(self):
+        """Close the shared connection pool"""
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+    
+    async def _stream_tokens(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Yield content deltas for a streamed chat completion"""
+        kwargs = dict(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            temperature=0.7,
+            max_tokens=1500
+        )
+        
+        if self.client_mode == "async":
+            self._ensure_async_client()
+            stream = await self.async_client.chat.completions.create(
+                **kwargs, timeout=self.request_timeout
+            )
+            async for chunk in stream:
+                if chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        else:
+            self._ensure_client()
+            stream = self.client.chat.completions.create(**kwargs)
+            for chunk in stream:
+                if chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    
+    def pack_context(self, context_chunks: List[Dict]) -> List[Dict]:
+        """Fit chunks into the prompt token budget (PROMPT_CONTEXT_TOKENS)
+        
+        build_prompt numbers chunks in the order returned here, so citations
+        must be resolved against this list, not the retrieved one.
+        """
+        return context_packer.pack(context_chunks)
+    
     def build_prompt(self, query: str, context_chunks: List[Dict]) -> str:
-        """Build prompt with numbered sources"""
+        """Build prompt with numbered sources (pass chunks through pack_context first)"""
         
         # Build context with numbers
         context_parts = []
         for i, chunk in enumerate(context_chunks, 1):
-            context_parts.append(
-                f"[{i}] Source: {chunk['metadata']['source']}, Page {chunk['metadata']['page']}\n"
-                f"{chunk['content']}"
-            )
+            context_parts.append(f"{context_packer.header(i, chunk)}{chunk['content']}")
         
         context = "\n\n".join(context_parts)
         
@@ -65,21 +157,12 @@ Provide a clear answer with inline citations like [1], [2], etc. referring to th
     ) -> AsyncGenerator[str, None]:
         """Stream LLM response"""
         
-        self._ensure_client()
+        context_chunks = await asyncio.to_thread(self.pack_context, context_chunks)
         prompt = self.build_prompt(query, context_chunks)
         
         try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True,
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            async for token in self._stream_tokens(prompt):
+                yield token
         
         except Exception as e:
             yield f"\n\n❌ Error: {str(e)}"
@@ -168,9 +251,12 @@ Provide a clear answer with inline citations like [1], [2], etc. referring to th
             }
         }]
     
-    def generate_visualization(self, query: str, context: str, citations: List[Dict] = None) -> Optional[Dict]:
-        """Generate a visualization component using LLM with real data extraction"""
-        self._ensure_client()
+    def _visualization_messages(self, query: str, context: str, citations: List[Dict] = None) -> List[Dict]:
+        """Build system + user messages for visualization extraction
+        
+        context is used as given; _visualization_context has already fitted
+        it into the visualization token budget.
+        """
         
         component_prompt = """You are a financial data visualization expert. Your job is to extract REAL numerical data from documents and create meaningful visualizations.
 
@@ -206,19 +292,18 @@ PRIORITY ORDER: BarChart > Table > MetricCard > PieChart > LineChart > InfoCard
 
 Respond with ONLY valid JSON. Extract REAL data from the context provided."""
 
-        try:
-            citations_text = ""
-            if citations:
-                citation_parts = []
-                for c in citations:
-                    excerpt = c.get('excerpt', '')[:200]
-                    citation_parts.append(f"[{c['number']}] {c['source']} p.{c['page']}: {excerpt}")
-                citations_text = "\n\nSOURCE EXCERPTS:\n" + '\n'.join(citation_parts)
-            
-            user_prompt = f"""User Query: {query}
+        citations_text = ""
+        if citations:
+            citation_parts = []
+            for c in citations:
+                excerpt = c.get('excerpt', '')[:200]
+                citation_parts.append(f"[{c['number']}] {c['source']} p.{c['page']}: {excerpt}")
+            citations_text = "\n\nSOURCE EXCERPTS:\n" + '\n'.join(citation_parts)
+        
+        user_prompt = f"""User Query: {query}
 
 Document Content:
-{context[:3000]}
+{context}
 {citations_text}
 
 IMPORTANT: Extract REAL numerical data (revenues, percentages, growth rates, comparisons) from the above content.
@@ -226,98 +311,171 @@ Create a visualization that answers the user's query with actual data points.
 DO NOT use placeholder values. If you can't find specific numbers, look for percentages or ratios.
 
 Generate the most appropriate visualization JSON:"""
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": component_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2,  # Lower temperature for more precise data extraction
-                max_tokens=800
-            )
+        
+        return [
+            {"role": "system", "content": component_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _parse_visualization(self, text: str) -> Optional[Dict]:
+        """Parse and validate a visualization component from model output"""
+        json_match = re.search(r'\{[\s\S]*\}', text)
+        if json_match:
+            component = json.loads(json_match.group())
+            comp_type = component.get('component', 'Unknown')
+            print(f"✓ Generated visualization: {comp_type}")
             
-            text = response.choices[0].message.content
-            json_match = re.search(r'\{[\s\S]*\}', text)
-            if json_match:
-                component = json.loads(json_match.group())
-                comp_type = component.get('component', 'Unknown')
-                print(f"✓ Generated visualization: {comp_type}")
-                
-                # Validate component has real data
-                props = component.get('props', {})
-                if comp_type in ['BarChart', 'LineChart', 'PieChart']:
-                    data = props.get('data', [])
-                    if len(data) >= 2:
-                        return component
-                    else:
-                        print("⚠️ Chart has insufficient data points, will retry")
-                elif comp_type == 'Table':
-                    rows = props.get('rows', [])
-                    if len(rows) >= 1:
-                        return component
-                elif comp_type == 'MetricCard':
-                    value = props.get('value', '')
-                    # Check if value contains actual data (numbers or currency)
-                    if any(c.isdigit() for c in value) or '₹' in value or '$' in value or '%' in value:
-                        return component
+            # Validate component has real data
+            props = component.get('props', {})
+            if comp_type in ['BarChart', 'LineChart', 'PieChart']:
+                data = props.get('data', [])
+                if len(data) >= 2:
+                    return component
                 else:
+                    print("⚠️ Chart has insufficient data points, will retry")
+            elif comp_type == 'Table':
+                rows = props.get('rows', [])
+                if len(rows) >= 1:
                     return component
+            elif comp_type == 'MetricCard':
+                value = props.get('value', '')
+                # Check if value contains actual data (numbers or currency)
+                if any(c.isdigit() for c in value) or '₹' in value or '$' in value or '%' in value:
+                    return component
+            else:
+                return component
+        
+        return None
+    
+    def generate_visualization(self, query: str, context: str, citations: List[Dict] = None) -> Optional[Dict]:
+        """Generate a visualization component using LLM with real data extraction"""
+        self._ensure_client()
+        
+        try:
+            with QUERY_STAGE_SECONDS.time(stage="visualization"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._visualization_messages(query, context, citations),
+                    temperature=0.2,  # Lower temperature for more precise data extraction
+                    max_tokens=800
+                )
+            
+            return self._parse_visualization(response.choices[0].message.content)
                     
         except Exception as e:
             print(f"⚠️ Visualization generation error: {e}")
         
         return None
     
+    async def agenerate_visualization(self, query: str, context: str, citations: List[Dict] = None) -> Optional[Dict]:
+        """Non-blocking generate_visualization for use inside the event loop"""
+        if self.client_mode != "async":
+            return await asyncio.to_thread(self.generate_visualization, query, context, citations)
+        
+        self._ensure_async_client()
+        
+        try:
+            with QUERY_STAGE_SECONDS.time(stage="visualization"):
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=self._visualization_messages(query, context, citations),
+                    temperature=0.2,
+                    max_tokens=800,
+                    timeout=self.request_timeout
+                )
+            
+            return self._parse_visualization(response.choices[0].message.content)
+        
+        except Exception as e:
+            print(f"⚠️ Visualization generation error: {e}")
+        
+        return None
+    
+    def _visualization_context(self, context_chunks: List[Dict], full_response: str = "") -> str:
+        """Build rich context from the most relevant chunks within the visualization token budget"""
+        budget = self.visualization_context_tokens
+        analysis = ""
+        if full_response:
+            # The answer gets at most half the budget; chunks fill the rest
+            analysis = context_packer.truncate(full_response, budget // 2)
+            budget -= context_packer.count_tokens([analysis])[0] + 4
+        
+        def header(index: int, chunk: Dict) -> str:
+            return f"[{chunk['metadata'].get('source', 'Unknown')} p.{chunk['metadata'].get('page', 0)}]: "
+        
+        context_parts = [
+            f"{header(i, chunk)}{chunk['content']}"
+            for i, chunk in enumerate(context_packer.pack(context_chunks, budget, header, track=False), 1)
+        ]
+        
+        full_context = "\n\n".join(context_parts)
+        
+        # Add the AI's response as additional context
+        if analysis:
+            full_context += f"\n\nAI ANALYSIS:\n{analysis}"
+        
+        return full_context
+    
     async def stream_with_visualization(
         self,
         query: str,
-        context_chunks: List[Dict]
+        context_chunks: List[Dict],
+        concurrent_visualization: Optional[bool] = None
     ) -> AsyncGenerator[Dict, None]:
-        """Stream text response and generate visualization with real data"""
+        """Stream text response and generate visualization with real data
         
-        self._ensure_client()
+        In concurrent mode (VISUALIZATION_MODE=concurrent, the default) the
+        visualization is extracted from the retrieved chunks while the text
+        streams, and the component is interleaved as soon as it is ready.
+        Sequential mode waits for the full answer and feeds it to the
+        visualization call as extra context.
+        """
+        if concurrent_visualization is None:
+            concurrent_visualization = self.visualization_mode == "concurrent"
+        
+        # Citations below index into the packed list, matching the prompt
+        context_chunks = await asyncio.to_thread(self.pack_context, context_chunks)
         prompt = self.build_prompt(query, context_chunks)
         
         full_response = ""
+        viz_task = None
+        component_handled = False
+        
+        if concurrent_visualization:
+            viz_context = await asyncio.to_thread(self._visualization_context, context_chunks)
+            viz_task = asyncio.create_task(self.agenerate_visualization(query, viz_context))
         
         try:
             # Stream the text response
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True,
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    token = chunk.choices[0].delta.content
-                    full_response += token
-                    yield {"type": "text", "content": token}
+            async for token in self._stream_tokens(prompt):
+                full_response += token
+                yield {"type": "text", "content": token}
+                
+                if viz_task is not None and not component_handled and viz_task.done():
+                    component_handled = True
+                    component = viz_task.result()
+                    if component:
+                        yield {"type": "component", "content": component}
             
             # Extract citations
             citations = self.extract_citations(full_response, context_chunks)
             for citation in citations:
                 yield {"type": "citation", "content": citation}
             
+            if viz_task is not None:
+                if not component_handled:
+                    component_handled = True
+                    component = await viz_task
+                    if component:
+                        yield {"type": "component", "content": component}
+                    else:
+                        print("⚠️ No valid visualization generated from backend")
+            
             # Generate visualization with full context from chunks
-            if len(full_response) > 50:
-                # Build rich context from all chunks for better data extraction
-                context_parts = []
-                for chunk in context_chunks:
-                    source = chunk['metadata'].get('source', 'Unknown')
-                    page = chunk['metadata'].get('page', 0)
-                    content = chunk['content']
-                    context_parts.append(f"[{source} p.{page}]: {content}")
-                
-                full_context = "\n\n".join(context_parts)
+            elif len(full_response) > 50:
+                full_context = await asyncio.to_thread(self._visualization_context, context_chunks, full_response)
                 
-                # Add the AI's response as additional context
-                full_context += f"\n\nAI ANALYSIS:\n{full_response}"
-                
-                component = self.generate_visualization(query, full_context, citations)
+                component = await self.agenerate_visualization(query, full_context, citations)
                 if component:
                     yield {"type": "component", "content": component}
                 else:
@@ -325,5 +483,9 @@ Generate the most appropriate visualization JSON:"""
         
         except Exception as e:
             yield {"type": "error", "content": str(e)}
+        
+        finally:
+            if viz_task is not None and not viz_task.done():
+                viz_task.cancel()
 
 llm_service = LLMService()
\ No newline at end of file
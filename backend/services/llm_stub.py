@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import AsyncIterator, Dict, Iterator, List
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9&'-]*|\d[\d,.]*%?")
+
+_FILLER = "the company reported results for the year with growth across segments".split()
+
+
+class StubAPIError(Exception):
+    """Injected failure (LLM_STUB_ERROR_RATE)"""
+
+
+class _Delta:
+    def __init__(self, content):
+        self.content = content
+        self.role = "assistant"
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+        self.role = "assistant"
+
+
+class _Choice:
+    def __init__(self, delta=None, message=None, finish_reason=None):
+        self.index = 0
+        self.delta = delta
+        self.message = message
+        self.finish_reason = finish_reason
+
+
+class _Response:
+    """ChatCompletion / ChatCompletionChunk lookalike"""
+
+    def __init__(self, choice: _Choice, model: str, chunk: bool):
+        self.id = "stub"
+        self.object = "chat.completion.chunk" if chunk else "chat.completion"
+        self.created = int(time.time())
+        self.model = model
+        self.choices = [choice]
+
+
+class StubModel:
+    """Deterministic stand-in for the Groq API (LLM_BACKEND=stub)
+
+    Streamed answers are built from words of the prompt's CONTEXT section,
+    seeded by the prompt, so the same question against the same documents
+    always streams the same tokens; sentences end in citations of the
+    numbered sources. Non-streamed calls (visualization) return a BarChart
+    of numbers found in the prompt. latency_ms is the delay before the
+    first token or the full response, tokens_per_sec paces the stream
+    (0 = unthrottled) and error_rate makes that fraction of calls raise.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        tokens_per_sec: float = 150,
+        tokens: int = 120,
+        error_rate: float = 0.0
+    ):
+        self.latency = latency_ms / 1000
+        self.interval = 1 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self.tokens = tokens
+        self.error_rate = error_rate
+        # Failures use their own stream so a prompt doesn't always fail
+        self._errors = random.Random(0)
+        self.calls = 0
+
+    def _rng(self, messages: List[Dict]) -> random.Random:
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        return random.Random(hashlib.sha256(prompt.encode()).digest())
+
+    def check_failure(self):
+        self.calls += 1
+        if self.error_rate and self._errors.random() < self.error_rate:
+            raise StubAPIError("Stub LLM injected failure")
+
+    def answer_tokens(self, messages: List[Dict], rng: random.Random) -> List[str]:
+        """Deterministic answer: context words in sentences, each ending with a citation"""
+        prompt = str(messages[-1].get("content", ""))
+        context = prompt.split("CONTEXT:", 1)[-1].split("QUESTION:", 1)[0]
+        words = _WORD.findall(context) or _FILLER
+        sources = sorted({int(n) for n in re.findall(r"^\[(\d+)\] Source:", context, re.MULTILINE)}) or [1]
+
+        tokens: List[str] = []
+        while len(tokens) < self.tokens:
+            length = rng.randint(8, 16)
+            start = rng.randrange(len(words))
+            sentence = [words[(start + i) % len(words)] for i in range(length)]
+            tokens.extend(" " + word for word in sentence)
+            tokens.append(f" [{rng.choice(sources)}].")
+        tokens[0] = tokens[0].lstrip()
+        return tokens[:self.tokens]
+
+    def visualization(self, messages: List[Dict], rng: random.Random) -> str:
+        prompt = str(messages[-1].get("content", ""))
+        # Grouped numbers whole, Western (1,234,567) or Indian (12,34,567) style
+        numbers = [
+            float(n.replace(",", ""))
+            for n in re.findall(r"\b(?:\d{1,3}(?:,\d{2,3})*,\d{3}|\d{2,})(?:\.\d+)?\b", prompt)[:5]
+        ]
+        while len(numbers) < 3:
+            numbers.append(float(rng.randint(10, 500)))
+        data = [{"label": f"Item {i + 1}", "value": value} for i, value in enumerate(numbers)]
+        return json.dumps({"component": "BarChart", "props": {"title": "Key Figures", "data": data}})
+
+    def chunk(self, content, model: str, finish_reason=None) -> _Response:
+        return _Response(_Choice(delta=_Delta(content), finish_reason=finish_reason), model, chunk=True)
+
+    def completion(self, content: str, model: str) -> _Response:
+        return _Response(_Choice(message=_Message(content), finish_reason="stop"), model, chunk=False)
+
+
+class _AsyncStream:
+    def __init__(self, model: StubModel, tokens: List[str], name: str):
+        self._model = model
+        self._tokens = tokens
+        self._name = name
+
+    async def _iterate(self) -> AsyncIterator[_Response]:
+        start = time.perf_counter()
+        for i, token in enumerate(self._tokens):
+            # Paced against the start time so sleep overshoot doesn't accumulate
+            delay = start + i * self._model.interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield self._model.chunk(token, self._name)
+        yield self._model.chunk(None, self._name, finish_reason="stop")
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+class _AsyncCompletions:
+    def __init__(self, model: StubModel):
+        self._model = model
+
+    async def create(self, model: str = "stub", messages: List[Dict] = (), stream: bool = False, **kwargs):
+        rng = self._model._rng(messages)
+        await asyncio.sleep(self._model.latency)
+        self._model.check_failure()
+        if stream:
+            return _AsyncStream(self._model, self._model.answer_tokens(messages, rng), model)
+        return self._model.completion(self._model.visualization(messages, rng), model)
+
+
+class _SyncCompletions:
+    def __init__(self, model: StubModel):
+        self._model = model
+
+    def _stream(self, tokens: List[str], name: str) -> Iterator[_Response]:
+        start = time.perf_counter()
+        for i, token in enumerate(tokens):
+            delay = start + i * self._model.interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield self._model.chunk(token, name)
+        yield self._model.chunk(None, name, finish_reason="stop")
+
+    def create(self, model: str = "stub", messages: List[Dict] = (), stream: bool = False, **kwargs):
+        rng = self._model._rng(messages)
+        time.sleep(self._model.latency)
+        self._model.check_failure()
+        if stream:
+            return self._stream(self._model.answer_tokens(messages, rng), model)
+        return self._model.completion(self._model.visualization(messages, rng), model)
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class StubAsyncGroq:
+    """The part of AsyncGroq that LLMService uses, backed by StubModel"""
+
+    def __init__(self, model: StubModel):
+        self.chat = _Chat(_AsyncCompletions(model))
+
+    async def close(self):
+        pass
+
+
+class StubGroq:
+    """The part of the blocking Groq client that LLMService uses, backed by StubModel"""
+
+    def __init__(self, model: StubModel):
+        self.chat = _Chat(_SyncCompletions(model))
+
+    def close(self):
+        pass
+
+
+def create_stub_model() -> StubModel:
+    """StubModel from LLM_STUB_LATENCY_MS, LLM_STUB_TOKENS_PER_SEC, LLM_STUB_TOKENS and LLM_STUB_ERROR_RATE"""
+    return StubModel(
+        latency_ms=float(os.getenv("LLM_STUB_LATENCY_MS", "200")),
+        tokens_per_sec=float(os.getenv("LLM_STUB_TOKENS_PER_SEC", "150")),
+        tokens=int(os.getenv("LLM_STUB_TOKENS", "120")),
+        error_rate=float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+    )
@@ -0,0 +1,220 @@
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) from sub-millisecond cache hits to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        # An empty label value means the same as no label, so leave it out
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key) if value]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """HELP/TYPE header plus one line per sample"""
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values) or ({(): 0} if not self.labelnames else {})
+        return self.header() + [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; set directly or sampled at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels) -> Iterator[None]:
+        """+1 for the duration of the block"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values) or ({(): 0} if not self.labelnames else {})
+        return self.header() + [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format
+
+    observe() is a bisect plus three additions under a lock, cheap enough
+    to call per request stage; per-token work should be aggregated by the
+    caller and observed once.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+        lines = self.header()
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for GET /metrics"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help_text, labelnames, buckets or LATENCY_BUCKETS))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(prefix="calquity_")
+
+# Per-query stages: retrieval, rerank, embedding, ttft, generation, visualization, sse_flush
+QUERY_STAGE_SECONDS = metrics.histogram(
+    "query_stage_seconds", "Latency of each stage of answering a query", ["stage"]
+)
+# Per-upload stages: extract, embed, upsert, and total (with outcome completed/failed)
+INGEST_STAGE_SECONDS = metrics.histogram(
+    "ingest_stage_seconds", "Time per uploaded document spent in each ingestion stage", ["stage", "outcome"]
+)
+JOBS_TOTAL = metrics.counter("jobs_total", "Jobs finished by workers, by outcome", ["outcome"])
+TOKENS_TOTAL = metrics.counter("llm_tokens_total", "Answer text deltas streamed from the LLM")
+SSE_BYTES_TOTAL = metrics.counter("sse_bytes_total", "Bytes written to /stream clients")
+ACTIVE_STREAMS = metrics.gauge("active_streams", "Open SSE/NDJSON answer streams", ["endpoint"])
+JOBS = metrics.gauge("jobs", "Jobs held by the job store")
+QUEUE_DEPTH = metrics.gauge("queue_depth", "Jobs waiting for a worker")
+LLM_IN_FLIGHT = metrics.gauge("llm_calls_in_flight", "LLM calls holding a concurrency slot")
+COLLECTION_CHUNKS = metrics.gauge("collection_chunks", "Chunks in the Chroma collection")
@@ -0,0 +1,341 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.services.cache import DiskBlobCache, LRUCache
+
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _encode_pixmap(pix, fmt: str, quality: int) -> bytes:
+    if fmt == "png":
+        return pix.tobytes("png")
+    if fmt == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=quality)
+
+    # PyMuPDF can't write WebP; go through Pillow
+    from PIL import Image
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=quality)
+    return buffer.getvalue()
+
+
+def render_page(
+    pdf_path: str,
+    page: int,
+    zoom: float = 2.0,
+    width: Optional[int] = None,
+    fmt: str = "png",
+    quality: int = 85
+) -> Tuple[bytes, Dict[str, Any]]:
+    """Render one page (1-indexed) to image bytes plus its dimensions
+
+    width, if given, overrides zoom so the image comes out that many
+    pixels wide (thumbnails). Top-level so a process pool can run it.
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        total_pages = len(doc)
+        pdf_page = doc[page - 1]
+        if width:
+            zoom = width / pdf_page.rect.width
+        pix = pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        data = _encode_pixmap(pix, fmt, quality)
+    finally:
+        doc.close()
+
+    return data, {"page": page, "total_pages": total_pages, "width": pix.width, "height": pix.height}
+
+
+def render_pages(
+    pdf_path: str,
+    pages: List[int],
+    zoom: float = 2.0,
+    fmt: str = "png",
+    quality: int = 85
+) -> List[Tuple[int, bytes, Dict[str, Any]]]:
+    """Render several pages with one open of the document (process pool task)"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        total_pages = len(doc)
+        matrix = fitz.Matrix(zoom, zoom)
+        rendered = []
+        for page in pages:
+            pix = doc[page - 1].get_pixmap(matrix=matrix, alpha=False)
+            meta = {"page": page, "total_pages": total_pages, "width": pix.width, "height": pix.height}
+            rendered.append((page, _encode_pixmap(pix, fmt, quality), meta))
+        return rendered
+    finally:
+        doc.close()
+
+
+class PageRenderer:
+    """Rendered PDF pages, cached in memory and on disk
+
+    Entries are keyed by (file sha256, page, zoom or width, format), so a
+    re-uploaded file with new content never serves stale images. The file
+    hash and page count are memoised per path on (mtime, size).
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = "data/page_cache.sqlite3",
+        memory_bytes: int = 64 * 1024 * 1024,
+        disk_bytes: int = 512 * 1024 * 1024,
+        default_zoom: float = 2.0,
+        quality: int = 85,
+        prerender_workers: int = 2,
+        prerender_batch: int = 8,
+        prerender_share: float = 0.25
+    ):
+        self.default_zoom = default_zoom
+        self.quality = quality
+        self.prerender_workers = prerender_workers
+        self.prerender_batch = prerender_batch
+        self.prerender_share = prerender_share
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.pages_prerendered = 0
+        self.memory = LRUCache(maxsize=100000, maxbytes=memory_bytes, sizeof=lambda entry: len(entry[0]))
+        self.disk = DiskBlobCache(cache_path, disk_bytes) if cache_path else None
+        self._documents: Dict[str, Tuple[int, int, str, int]] = {}
+        self._lock = threading.Lock()
+
+        try:
+            import PIL  # noqa: F401
+            self.webp_supported = True
+        except ImportError:
+            self.webp_supported = False
+
+    def document_info(self, pdf_path: str) -> Tuple[str, int]:
+        """(sha256, page count) for a PDF, recomputed only when the file changes"""
+        stat = os.stat(pdf_path)
+        with self._lock:
+            known = self._documents.get(pdf_path)
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2], known[3]
+
+        import fitz  # PyMuPDF
+
+        file_hash = file_sha256(pdf_path)
+        doc = fitz.open(pdf_path)
+        total_pages = len(doc)
+        doc.close()
+
+        with self._lock:
+            self._documents[pdf_path] = (stat.st_mtime_ns, stat.st_size, file_hash, total_pages)
+        return file_hash, total_pages
+
+    @staticmethod
+    def cache_key(file_hash: str, page: int, zoom: float, fmt: str, width: Optional[int] = None) -> str:
+        size = f"w{width}" if width else f"z{zoom:g}"
+        return f"{file_hash}:{page}:{size}:{fmt}"
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    def resolve(
+        self,
+        pdf_path: str,
+        page: int,
+        zoom: Optional[float] = None,
+        width: Optional[int] = None,
+        fmt: str = "png"
+    ) -> Tuple[str, int]:
+        """Cache key and clamped page number for a request, without rendering"""
+        file_hash, total_pages = self.document_info(pdf_path)
+        page = min(max(page, 1), total_pages)
+        return self.cache_key(file_hash, page, zoom or self.default_zoom, fmt, width), page
+
+    def get(
+        self,
+        pdf_path: str,
+        page: int,
+        zoom: Optional[float] = None,
+        width: Optional[int] = None,
+        fmt: str = "png"
+    ) -> Tuple[bytes, Dict[str, Any], str]:
+        """Image bytes, metadata and cache key for a page, rendering on a miss"""
+        key, page = self.resolve(pdf_path, page, zoom, width, fmt)
+
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+
+        if entry is None:
+            entry = render_page(pdf_path, page, zoom or self.default_zoom, width, fmt, self.quality)
+            self.store(key, *entry)
+
+        return entry[0], entry[1], key
+
+    def store(self, key: str, data: bytes, meta: Dict[str, Any], memory: bool = True):
+        if memory:
+            self.memory.set(key, (data, meta))
+        if self.disk is not None:
+            self.disk.set(key, data, meta)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """One lazily started process pool; spawn avoids forking a threaded server"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.prerender_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def prerender(
+        self,
+        pdf_path: str,
+        max_pages: int = 0,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """Render a document's pages in the background, straight to the disk cache
+
+        Pages use the default screenshot settings (default zoom, PNG), so the
+        viewer's first request for a cited page is a cache read; thumbnails
+        would never be hit, as the viewer only asks for the full-size image.
+        Pages already on disk are skipped. Returns immediately with the
+        number of pages queued.
+
+        Pre-rendered pages are stored cold, so they only displace other
+        pages nobody has opened yet, and one document may fill at most
+        prerender_share of the disk cache; the rest of its pages are dropped.
+        on_progress(pages stored, pages still pending) runs as batches finish.
+        """
+        if self.disk is None:
+            return 0
+
+        file_hash, total_pages = self.document_info(pdf_path)
+        last_page = min(total_pages, max_pages) if max_pages > 0 else total_pages
+
+        pending = [
+            page for page in range(1, last_page + 1)
+            if not self.disk.contains(self.cache_key(file_hash, page, self.default_zoom, "png"))
+        ]
+        if not pending:
+            return 0
+
+        run = {
+            "name": os.path.basename(pdf_path),
+            "pending": len(pending),
+            "stored": 0,
+            "bytes": 0,
+            "budget": int(self.disk.max_bytes * self.prerender_share),
+            "futures": [],
+            "stopped": False,
+            "on_progress": on_progress
+        }
+        self._report_prerender(run)
+
+        pool = self._get_pool()
+        for i in range(0, len(pending), self.prerender_batch):
+            batch = pending[i:i + self.prerender_batch]
+            future = pool.submit(render_pages, pdf_path, batch, self.default_zoom, "png", self.quality)
+            run["futures"].append(future)
+            future.add_done_callback(
+                lambda f, size=len(batch): self._store_prerendered(f, file_hash, size, run)
+            )
+
+        print(f"🖼️ Pre-rendering {len(pending)} pages of {run['name']}")
+        return len(pending)
+
+    def _store_prerendered(self, future: Future, file_hash: str, size: int, run: Dict[str, Any]):
+        # Runs on the pool's result thread; only the disk cache is filled so
+        # a large document doesn't flush the hot in-memory entries
+        rendered = []
+        if not future.cancelled():
+            try:
+                rendered = future.result()
+            except Exception as e:
+                print(f"⚠️ Page pre-render failed: {str(e)}")
+
+        stored = 0
+        for page, data, meta in rendered:
+            with self._lock:
+                over_budget = run["bytes"] + len(data) > run["budget"]
+                if not over_budget:
+                    run["bytes"] += len(data)
+            if over_budget:
+                self._stop_prerender(run)
+                break
+            key = self.cache_key(file_hash, page, self.default_zoom, "png")
+            self.disk.set(key, data, meta, cold=True)
+            stored += 1
+
+        with self._lock:
+            run["pending"] -= size
+            run["stored"] += stored
+            self.pages_prerendered += stored
+        self._report_prerender(run)
+
+    def _stop_prerender(self, run: Dict[str, Any]):
+        """Cancel a document's queued batches once it has used its cache share"""
+        with self._lock:
+            if run["stopped"]:
+                return
+            run["stopped"] = True
+        for future in run["futures"]:
+            future.cancel()
+        print(
+            f"⚠️ Pre-render of {run['name']} stopped: it used its share of the page cache "
+            f"({run['bytes'] // 1024} KB); later pages render on request"
+        )
+
+    def _report_prerender(self, run: Dict[str, Any]):
+        if run["on_progress"] is None:
+            return
+        with self._lock:
+            stored, pending = run["stored"], run["pending"]
+        try:
+            run["on_progress"](stored, pending)
+        except Exception as e:
+            print(f"⚠️ Pre-render progress update failed: {str(e)}")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+            "pages_prerendered": self.pages_prerendered,
+            "prerender_share": self.prerender_share
+        }
+
+
+page_renderer = PageRenderer(
+    cache_path=os.getenv("PAGE_CACHE_PATH", "data/page_cache.sqlite3") or None,
+    memory_bytes=int(float(os.getenv("PAGE_CACHE_MEMORY_MB", "64")) * 1024 * 1024),
+    disk_bytes=int(float(os.getenv("PAGE_CACHE_DISK_MB", "512")) * 1024 * 1024),
+    default_zoom=float(os.getenv("SCREENSHOT_ZOOM", "2.0")),
+    quality=int(os.getenv("SCREENSHOT_QUALITY", "85")),
+    prerender_workers=int(os.getenv("PRERENDER_WORKERS", "2")),
+    prerender_share=float(os.getenv("PRERENDER_CACHE_SHARE", "0.25"))
+)
@@ -1,7 +1,18 @@
 import os
 import tempfile
-from typing import List, Dict
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 from pypdf import PdfReader
+from backend.services.chunking import Chunker, create_chunker
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """Extract text for pages [start, end) - runs inside a worker process"""
+    reader = PdfReader(pdf_path)
+    return [reader.pages[n].extract_text() or "" for n in range(start, end)]
+
 
 class PDFLoader:
     """Extract text from PDFs and chunk them"""
@@ -11,39 +22,112 @@ class PDFLoader:
         self.upload_dir = tempfile.gettempdir()
         self.calquity_dir = os.path.join(self.upload_dir, 'calquity_uploads')
         os.makedirs(self.calquity_dir, exist_ok=True)
+        
+        # Worker processes for parallel extraction (1 = serial)
+        self.extract_workers = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+        # Smallest page range handed to a single worker
+        self.min_pages_per_task = int(os.getenv("PDF_EXTRACT_MIN_PAGES", "8"))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_workers = 0
+        
+        # How pages are split into chunks (CHUNK_STRATEGY etc.)
+        self.chunker = create_chunker()
         print(f"PDF Loader initialized (temp dir: {self.calquity_dir})")
     
-    def extract_text(self, pdf_path: str, chunk_size: int = 500) -> List[Dict]:
-        """Extract text from PDF and split into chunks"""
-        try:
-            reader = PdfReader(pdf_path)
-            chunks = []
-            
+    def _get_pool(self, workers: int) -> ProcessPoolExecutor:
+        """Reuse one process pool; spawn avoids forking a threaded server"""
+        if self._pool is None or self._pool_workers != workers:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            self._pool_workers = workers
+        return self._pool
+    
+    def iter_pages(
+        self,
+        pdf_path: str,
+        workers: Optional[int] = None
+    ) -> Iterator[Tuple[int, int, str]]:
+        """Yield (page_num, total_pages, text) in page order
+        
+        With workers > 1 the page ranges are split across a process pool,
+        each worker opening its own reader; results still come back in order.
+        """
+        workers = workers or self.extract_workers
+        reader = PdfReader(pdf_path)
+        total_pages = len(reader.pages)
+        
+        if workers <= 1 or total_pages < 2 * self.min_pages_per_task:
             for page_num, page in enumerate(reader.pages, start=1):
-                text = page.extract_text()
-                
-                if not text.strip():
-                    continue
-                
-                # Split page into chunks
-                words = text.split()
-                for i in range(0, len(words), chunk_size):
-                    chunk_text = ' '.join(words[i:i + chunk_size])
-                    
-                    chunks.append({
-                        'content': chunk_text,
-                        'page': page_num,
-                        'metadata': {
-                            'page': page_num,
-                            'chunk_index': i // chunk_size
-                        }
-                    })
-            
-            print(f" Extracted {len(chunks)} chunks from {len(reader.pages)} pages")
+                yield page_num, total_pages, page.extract_text() or ""
+            return
+        
+        # Several ranges per worker so one slow range doesn't idle the rest;
+        # only a bounded window of ranges is in flight to keep memory flat
+        step = max(self.min_pages_per_task, -(-total_pages // (workers * 4)))
+        pool = self._get_pool(workers)
+        starts = iter(range(0, total_pages, step))
+        in_flight = deque()
+        
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                in_flight.append(
+                    pool.submit(_extract_page_range, pdf_path, start, min(start + step, total_pages))
+                )
+        
+        for _ in range(workers * 2):
+            submit_next()
+        
+        page_num = 0
+        while in_flight:
+            texts = in_flight.popleft().result()
+            submit_next()
+            for text in texts:
+                page_num += 1
+                yield page_num, total_pages, text
+    
+    def iter_chunks(
+        self,
+        pdf_path: str,
+        chunker: Optional[Chunker] = None,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        workers: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """Lazily yield chunks as pages are extracted
+        
+        chunker defaults to the one configured from CHUNK_* settings.
+        on_page is called as on_page(pages_done, total_pages) after each page.
+        workers overrides PDF_EXTRACT_WORKERS for this call.
+        """
+        def pages() -> Iterator[Tuple[int, str]]:
+            for page_num, total_pages, text in self.iter_pages(pdf_path, workers):
+                if on_page:
+                    on_page(page_num, total_pages)
+                if text.strip():
+                    yield page_num, text
+        
+        yield from (chunker or self.chunker).chunk(pages())
+    
+    def extract_text(
+        self,
+        pdf_path: str,
+        chunker: Optional[Chunker] = None,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        workers: Optional[int] = None
+    ) -> List[Dict]:
+        """Extract text from PDF and split into chunks (materialized)"""
+        try:
+            chunks = list(self.iter_chunks(pdf_path, chunker, on_page, workers))
+            pages = len(set(chunk['page'] for chunk in chunks))
+            print(f" Extracted {len(chunks)} chunks from {pages} pages")
             return chunks
         
         except Exception as e:
             print(f"Error extracting PDF: {str(e)}")
             return []
 
-pdf_loader = PDFLoader()
\ No newline at end of file
+pdf_loader = PDFLoader()
@@ -1,13 +1,61 @@
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict   
+from backend.services.embeddings import embedding_engine, normalize_query
+from backend.services.cache import LRUCache
+from backend.services.source_registry import SourceRegistry
+from backend.services.bm25 import BM25Index
+from backend.services.metrics import INGEST_STAGE_SECONDS
+from typing import Any, Callable, Iterable, List, Dict, Optional, Set, Tuple
+from collections import Counter
+from itertools import islice
+import hashlib
 import os
+import sqlite3
+import threading
+import time
+
+class CollectionVersion:
+    """Write counter for the collection, shared by every worker using persist_dir
+    
+    Kept in its own small SQLite file: the source registry's connection
+    holds its write lock for a whole ingestion, which would stall bumps
+    and reads from other workers.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS version (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO version (id, value) VALUES (0, 0)")
+        self._lock = threading.Lock()
+    
+    def get(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM version WHERE id = 0").fetchone()[0]
+    
+    def bump(self) -> int:
+        """Increment atomically across processes and return the new version"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("UPDATE version SET value = value + 1 WHERE id = 0")
+                value = self._conn.execute("SELECT value FROM version WHERE id = 0").fetchone()[0]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return value
 
 class RAGSystem:
     
     def __init__(self, persist_dir: str = "data/chromadb"):
         self.collection_name = "documents"
+        self.persist_dir = persist_dir
+        # Chunks embedded and upserted per Chroma call during ingestion
+        self.batch_size = int(os.getenv("INGEST_BATCH_SIZE", "256"))
         
         # Initialize ChromaDB
         self.client = chromadb.PersistentClient(
@@ -15,104 +63,516 @@ class RAGSystem:
             settings=Settings(anonymized_telemetry=False)
         )
         
-        # Create or get collection
+        # Create or get collection; embeddings are always precomputed by
+        # the shared engine, so Chroma must not load its own default model
         self.collection = self.client.get_or_create_collection(
             name=self.collection_name,
-            metadata={"description": "PDF document chunks"}
+            metadata={"description": "PDF document chunks"},
+            embedding_function=None
         )
         
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Shared embedding model (also used for queries)
+        self.embedder = embedding_engine
+        
+        # Bumped on every write by any worker; cached retrievals are keyed
+        # by it so any change to the collection invalidates them exactly.
+        # Persisted so caches that survive restarts (answers) stay valid.
+        self._version = CollectionVersion(os.path.join(persist_dir, "collection_version.sqlite3"))
+        self._seen_version = self._version.get()
+        self._count = self.collection.count()
+        self.retrieval_cache = LRUCache(maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "512")))
+        
+        # source -> chunk ids, kept next to the Chroma files
+        self.sources = SourceRegistry(os.path.join(persist_dir, "sources.sqlite3"))
+        if not self.sources.exists and self._count > 0:
+            self._rebuild_source_registry()
+        
+        # Lexical index for exact-token queries ("EBITDA Q3 FY24"), fused
+        # with vector results in hybrid mode
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        self.bm25 = BM25Index(
+            os.path.join(persist_dir, "bm25.pkl"),
+            flush_interval=float(os.getenv("BM25_FLUSH_SECONDS", "30")),
+            version_fn=lambda: self.version
+        )
+        # Saves are deferred, so a crash can leave the file behind the collection
+        if self._count > 0 and (not self.bm25.exists or self.bm25.version != self.version):
+            self._rebuild_bm25()
         
         print("RAG System initialized")
         print(f"  - Collection: {self.collection.name}")
-        print(f"  - Documents: {self.collection.count()}")
+        print(f"  - Documents: {self._count}")
+    
+    @property
+    def version(self) -> int:
+        """Current collection version, including other workers' writes"""
+        return self._version.get()
+    
+    def _bump_version(self):
+        """Record a write to the collection"""
+        self._seen_version = self._version.bump()
+        self._count = self.collection.count()
+    
+    def _sync(self) -> int:
+        """Pick up writes made by other workers; returns the current version"""
+        version = self._version.get()
+        if version != self._seen_version:
+            self._count = self.collection.count()
+            self.sources.reload()
+            self._seen_version = version
+        return version
+    
+    def _rebuild_source_registry(self):
+        """One-off scan to index a collection created before the registry existed"""
+        all_docs = self.collection.get(include=["metadatas"])
+        
+        for doc_id, metadata in zip(all_docs['ids'], all_docs['metadatas']):
+            self.sources.add(metadata.get('source', 'unknown'), [doc_id])
+        
+        self.sources.save()
+        print(f"  - Indexed {len(all_docs['ids'])} chunks into source registry")
+    
+    def _rebuild_bm25(self):
+        """Build the BM25 index from the collection (missing or out of date on disk)"""
+        self.bm25.clear()
+        for source in self.sources.sources():
+            ids = self.sources.get(source)
+            for start in range(0, len(ids), self.batch_size):
+                batch = self.collection.get(ids=ids[start:start + self.batch_size], include=["documents"])
+                self.bm25.add(batch['ids'], batch['documents'], source)
+        
+        self.bm25.save()
+        self.bm25.flush()
+        print(f"  - Indexed {len(self.bm25)} chunks into BM25 index")
     
-    def add_documents(self, chunks: List[Dict], pdf_name: str):
-        """Add PDF chunks to vector database"""
-        documents = []
-        metadatas = []
-        ids = []
+    def count(self) -> int:
+        """Number of chunks in the collection (re-counted only after a write)"""
+        self._sync()
+        return self._count
+    
+    def add_documents(
+        self,
+        chunks: Iterable[Dict],
+        pdf_name: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        batch_size: Optional[int] = None,
+        content_hash: Optional[str] = None
+    ) -> int:
+        """Add PDF chunks to vector database in bounded batches
+        
+        chunks may be any iterable (e.g. PDFLoader.iter_chunks), so only one
+        batch is held in memory at a time. on_progress is called as
+        on_progress(chunks_embedded, chunks_upserted) after every batch.
+        
+        Chunk ids are content-addressed, so re-ingesting a changed file only
+        embeds chunks whose text is new and deletes the ones that are gone;
+        unchanged pages cost nothing. Returns the number of chunks the
+        document now has. If anything fails, the chunks added so far are
+        removed again, so the document keeps its previous index (or none).
+        """
+        # A name that used to alias another upload now gets its own chunks
+        previous_alias = self.sources.resolve(pdf_name)
+        self.sources.remove_alias(pdf_name)
+        
+        # Aliases still have the old content: hand them the old chunks and
+        # index the new content from scratch
+        aliases = self.sources.aliases_of(pdf_name)
+        if aliases and content_hash != self.sources.get_info(pdf_name).get("sha256"):
+            self._transfer_chunks(pdf_name, aliases[0])
+        
+        existing = set(self.sources.get(pdf_name))
+        previous_pages = self.sources.get_info(pdf_name).get("pages", {})
+        seen: Set[str] = set()
+        page_hashes: Dict[str, str] = {}
         
-        for i, chunk in enumerate(chunks):
-            doc_id = f"{pdf_name}_page_{chunk['page']}_chunk_{i}"
+        try:
+            total, embedded = self._add_batches(
+                chunks, pdf_name, batch_size or self.batch_size, on_progress, existing, seen, page_hashes
+            )
+            if not total:
+                raise ValueError("Failed to extract text from PDF")
             
-            documents.append(chunk['content'])
-            metadatas.append({
-                "source": pdf_name,
-                "page": chunk['page'],
-                "chunk_index": i,
-                **chunk.get('metadata', {})
-            })
-            ids.append(doc_id)
-        
-        # Add to ChromaDB
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+            stale = list(existing - seen)
+            if stale:
+                self.collection.delete(ids=stale)
+                self.sources.discard(pdf_name, stale)
+                self.bm25.remove(stale)
+                self._bump_version()
+            
+            if content_hash:
+                self.sources.set_info(pdf_name, sha256=content_hash, pages=page_hashes)
+        except Exception:
+            self._roll_back(pdf_name, existing, previous_alias)
+            raise
+        finally:
+            # Persist whatever landed, even if ingestion failed midway
+            self.sources.save()
+            self.bm25.save()
         
-        print(f"✓ Added {len(documents)} chunks from {pdf_name}")
+        if existing:
+            changed = sum(1 for page, digest in page_hashes.items() if previous_pages.get(page) != digest)
+            print(f"✓ Re-indexed {pdf_name}: {changed} pages changed, {embedded} chunks embedded, "
+                  f"{total - embedded} unchanged, {len(stale)} removed")
+        else:
+            print(f"✓ Added {total} chunks from {pdf_name}")
+        return total
     
-    def search(self, query: str, k: int = 5) -> List[Dict]:
+    def _roll_back(self, pdf_name: str, existing: Set[str], previous_alias: str):
+        """Undo a failed add_documents: drop the chunks it added, restore an alias"""
+        try:
+            added = list(set(self.sources.get(pdf_name)) - existing)
+            if added:
+                self.collection.delete(ids=added)
+                self.bm25.remove(added)
+            if existing:
+                self.sources.discard(pdf_name, added)
+            else:
+                self.sources.remove(pdf_name)
+            if previous_alias != pdf_name:
+                self.sources.add_alias(pdf_name, previous_alias)
+            if added:
+                self._bump_version()
+            print(f"↩️ Rolled back {len(added)} new chunks of {pdf_name}")
+        except Exception as e:
+            print(f"⚠️ Could not roll back {pdf_name}: {str(e)}")
+    
+    @staticmethod
+    def _chunk_id(pdf_name: str, page: int, content: str, occurrences: Counter) -> str:
+        """{source}_p{page}_{content hash}_{n}; n tells identical chunks on a page apart"""
+        base = f"{pdf_name}_p{page}_{hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]}"
+        n = occurrences[base]
+        occurrences[base] += 1
+        return f"{base}_{n}"
+    
+    def _add_batches(
+        self,
+        chunks: Iterable[Dict],
+        pdf_name: str,
+        batch_size: int,
+        on_progress: Optional[Callable[[int, int], None]],
+        existing: Set[str],
+        seen: Set[str],
+        page_hashes: Dict[str, str]
+    ) -> Tuple[int, int]:
+        chunk_iter = iter(chunks)
+        occurrences: Counter = Counter()
+        page_digests: Dict[str, Any] = {}
+        total = 0
+        embedded = 0
+        # Seconds per stage for this document; pulling from chunk_iter is
+        # where PDF parsing and chunking happen
+        timings = {"extract": 0.0, "embed": 0.0, "upsert": 0.0}
+        
+        while True:
+            start = time.perf_counter()
+            batch = list(islice(chunk_iter, batch_size))
+            timings["extract"] += time.perf_counter() - start
+            if not batch:
+                break
+            
+            documents = []
+            metadatas = []
+            ids = []
+            
+            for chunk in batch:
+                page_key = str(chunk['page'])
+                page_digests.setdefault(page_key, hashlib.sha256()).update(chunk['content'].encode('utf-8'))
+                
+                doc_id = self._chunk_id(pdf_name, chunk['page'], chunk['content'], occurrences)
+                seen.add(doc_id)
+                if doc_id in existing:
+                    continue
+                
+                documents.append(chunk['content'])
+                metadatas.append({
+                    "source": pdf_name,
+                    "page": chunk['page'],
+                    **chunk.get('metadata', {})
+                })
+                ids.append(doc_id)
+            
+            if documents:
+                start = time.perf_counter()
+                embeddings = self.embedder.embed(documents)
+                timings["embed"] += time.perf_counter() - start
+                if on_progress:
+                    on_progress(total + len(batch), total)
+                
+                # Upsert keeps a retried batch from failing on duplicate ids
+                start = time.perf_counter()
+                self.collection.upsert(
+                    documents=documents,
+                    embeddings=embeddings,
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                timings["upsert"] += time.perf_counter() - start
+                self.sources.add(pdf_name, ids)
+                self.bm25.add(ids, documents, pdf_name)
+                self._bump_version()
+                embedded += len(documents)
+            
+            total += len(batch)
+            if on_progress:
+                on_progress(total, total)
+        
+        page_hashes.update({page: digest.hexdigest()[:16] for page, digest in page_digests.items()})
+        for stage, seconds in timings.items():
+            INGEST_STAGE_SECONDS.observe(seconds, stage=stage)
+        return total, embedded
+    
+    def find_duplicate(self, content_hash: str) -> Optional[str]:
+        """Already indexed document with identical file content, if any"""
+        return self.sources.find_by_hash(content_hash)
+    
+    def alias_document(self, pdf_name: str, source: str):
+        """Make pdf_name share the chunks of an identical, already indexed source"""
+        if pdf_name in self.sources.sources():
+            self.delete_document(pdf_name)
+        self.sources.add_alias(pdf_name, source)
+        self.sources.save()
+        print(f"✓ {pdf_name} is identical to {source}; reusing its chunks")
+    
+    def search(self, query: str, k: int = 5, sources: Optional[List[str]] = None) -> List[Dict]:
         """Search for document chunks"""
-        return self.retrieve(query, top_k=k)
+        return self.retrieve(query, top_k=k, sources=sources)
     
-    def retrieve(self, query: str, top_k: int = 3) -> List[Dict]:
-        """Retrieve most relevant document chunks"""
-        if self.collection.count() == 0:
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        sources: Optional[List[str]] = None,
+        mode: Optional[str] = None
+    ) -> List[Dict]:
+        """Retrieve most relevant document chunks
+        
+        mode is "vector", "bm25" or "hybrid" (both, fused with reciprocal
+        rank fusion); defaults to RETRIEVAL_MODE. sources optionally
+        restricts results to the given PDFs. Results are cached per
+        (query, top_k, sources, mode) until the collection changes.
+        """
+        return self.retrieve_many([query], top_k, sources, mode)[0]
+    
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        sources: Optional[List[str]] = None,
+        mode: Optional[str] = None
+    ) -> List[List[Dict]]:
+        """retrieve() for several queries at once, results in query order
+        
+        Uncached queries are embedded in one batched model call and sent
+        to Chroma as one multi-query request; chunks that only BM25 found
+        are fetched with a single get for the whole batch.
+        """
+        # Another worker may have written since; the count and cache key follow it
+        version = self._sync()
+        if self._count == 0:
             print("No documents in collection")
-            return []
+            return [[] for _ in queries]
+        
+        mode = mode or self.retrieval_mode
+        source_key = tuple(sorted(sources)) if sources else None
+        keys = [(normalize_query(query), top_k, source_key, mode, version) for query in queries]
+        
+        results: List[Optional[List[Dict]]] = [self.retrieval_cache.get(key) for key in keys]
+        pending = [i for i, cached in enumerate(results) if cached is None]
         
+        if pending:
+            source_filter = list({self.sources.resolve(name) for name in sources}) if sources else None
+            pending_queries = [queries[i] for i in pending]
+            
+            if mode == "vector":
+                retrieved = self._vector_search(pending_queries, top_k, source_filter)
+            elif mode == "bm25":
+                retrieved = self._fetch([self.bm25.search(query, top_k, source_filter) for query in pending_queries])
+            else:
+                retrieved = self._hybrid_search(pending_queries, top_k, source_filter)
+            
+            for i, items in zip(pending, retrieved):
+                self.retrieval_cache.set(keys[i], items)
+                results[i] = items
+        
+        if len(queries) == 1:
+            print(f"Retrieved {len(results[0])} {'cached ' if not pending else ''}chunks ({mode}) for query: '{queries[0][:50]}...'")
+        else:
+            print(f"Retrieved chunks ({mode}) for {len(queries)} queries, {len(queries) - len(pending)} from cache")
+        return [[dict(item, metadata=dict(item["metadata"])) for item in items] for items in results]
+    
+    def _vector_search(self, queries: List[str], top_k: int, sources: Optional[List[str]]) -> List[List[Dict]]:
+        query_embeddings = self.embedder.embed_queries(queries)
         results = self.collection.query(
-            query_texts=[query],
-            n_results=min(top_k, self.collection.count())
+            query_embeddings=query_embeddings,
+            n_results=min(top_k, self._count),
+            where={"source": {"$in": sources}} if sources else None
         )
         
-        # Format results
+        # Format results, one list per query
         retrieved = []
-        for i in range(len(results['documents'][0])):
-            retrieved.append({
-                "content": results['documents'][0][i],
-                "metadata": results['metadatas'][0][i],
-                "score": results['distances'][0][i] if 'distances' in results else 1.0
-            })
-        
-        print(f"Retrieved {len(retrieved)} chunks for query: '{query[:50]}...'")
+        for q in range(len(queries)):
+            hits = []
+            for i in range(len(results['documents'][q])):
+                hits.append({
+                    "id": results['ids'][q][i],
+                    "content": results['documents'][q][i],
+                    "metadata": results['metadatas'][q][i],
+                    # Chroma distance: lower is closer
+                    "distance": results['distances'][q][i] if results.get('distances') else 1.0
+                })
+            retrieved.append(hits)
         return retrieved
     
-    def get_all_documents(self) -> List[str]:
-        """Get list of all PDFs in database"""
-        all_docs = self.collection.get()
-        sources = set()
+    def _fetch(self, scored_lists: List[List[Tuple[str, float]]], score_key: str = "bm25_score") -> List[List[Dict]]:
+        """Load content and metadata for lists of (chunk id, score) pairs with one get, keeping their order
+        
+        Each item carries its score under score_key (higher is better).
+        """
+        ids = list(dict.fromkeys(chunk_id for scored in scored_lists for chunk_id, _ in scored))
+        if not ids:
+            return [[] for _ in scored_lists]
         
-        for metadata in all_docs['metadatas']:
-            sources.add(metadata.get('source', 'unknown'))
+        results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: (document, metadata)
+            for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        }
         
-        return list(sources)
+        return [
+            [
+                {"id": chunk_id, "content": by_id[chunk_id][0], "metadata": by_id[chunk_id][1], score_key: score}
+                for chunk_id, score in scored
+                if chunk_id in by_id
+            ]
+            for scored in scored_lists
+        ]
+    
+    def _hybrid_search(self, queries: List[str], top_k: int, sources: Optional[List[str]]) -> List[List[Dict]]:
+        """Reciprocal rank fusion of vector and BM25 rankings
+        
+        Each list is over-fetched so documents ranked moderately by both
+        can still surface. rrf_score is sum(1 / (rrf_k + rank)), higher is
+        better; hits the vector search found also keep their distance.
+        """
+        candidates = max(top_k * 4, 20)
+        vector_results = self._vector_search(queries, candidates, sources)
+        
+        rankings = []
+        for query, vector_hits in zip(queries, vector_results):
+            fused: Dict[str, float] = {}
+            for rank, item in enumerate(vector_hits):
+                fused[item["id"]] = fused.get(item["id"], 0.0) + 1 / (self.rrf_k + rank + 1)
+            for rank, (chunk_id, _) in enumerate(self.bm25.search(query, candidates, sources)):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1 / (self.rrf_k + rank + 1)
+            rankings.append(sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k])
+        
+        # Vector hits already carry content; only lexical-only hits need a fetch
+        known = [{item["id"]: item for item in vector_hits} for vector_hits in vector_results]
+        missing = self._fetch([
+            [(chunk_id, score) for chunk_id, score in ranked if chunk_id not in hits]
+            for ranked, hits in zip(rankings, known)
+        ], score_key="rrf_score")
+        
+        retrieved = []
+        for ranked, hits, fetched_hits in zip(rankings, known, missing):
+            fetched = {item["id"]: item for item in fetched_hits}
+            items = []
+            for chunk_id, score in ranked:
+                item = hits.get(chunk_id) or fetched.get(chunk_id)
+                if item is not None:
+                    items.append(dict(item, rrf_score=score))
+            retrieved.append(items)
+        return retrieved
+    
+    def get_all_documents(self) -> List[str]:
+        """Get list of all PDFs in database"""
+        return self.sources.names()
     
     def delete_document(self, pdf_name: str):
-        """Delete all chunks from a specific PDF"""
-        all_docs = self.collection.get()
-        ids_to_delete = []
+        """Delete all chunks from a specific PDF
+        
+        Deleting an alias only drops the alias. Deleting a source that still
+        has aliases hands its chunks to the first alias instead.
+        """
+        if self.sources.remove_alias(pdf_name):
+            self.sources.save()
+            print(f"Deleted alias {pdf_name}")
+            return
         
-        for i, metadata in enumerate(all_docs['metadatas']):
-            if metadata.get('source') == pdf_name:
-                ids_to_delete.append(all_docs['ids'][i])
+        aliases = self.sources.aliases_of(pdf_name)
+        if aliases:
+            self._transfer_chunks(pdf_name, aliases[0])
+            print(f"Deleted {pdf_name}; {aliases[0]} keeps its chunks")
+            return
+        
+        ids_to_delete = self.sources.remove(pdf_name)
         
         if ids_to_delete:
             self.collection.delete(ids=ids_to_delete)
-            print(f"Deleted {len(ids_to_delete)} chunks from {pdf_name}")
+            self.bm25.remove(ids_to_delete)
+        else:
+            # Not in the registry; let Chroma filter instead of scanning here
+            self.collection.delete(where={"source": pdf_name})
+            self.bm25.remove_source(pdf_name)
+        
+        self.sources.save()
+        self.bm25.save()
+        self._bump_version()
+        print(f"Deleted {len(ids_to_delete)} chunks from {pdf_name}")
 
+    def _transfer_chunks(self, source: str, new_source: str):
+        """Move a source's chunks to new_source, re-keyed but not re-embedded
+        
+        Chunk ids start with the source name, so they are copied under new
+        ids (stored embeddings included) and the old ones deleted; otherwise
+        a later upload under the old name would overwrite them.
+        """
+        ids = self.sources.get(source)
+        moved = []
+        
+        for start in range(0, len(ids), self.batch_size):
+            current = self.collection.get(
+                ids=ids[start:start + self.batch_size],
+                include=["documents", "metadatas", "embeddings"]
+            )
+            new_ids = [
+                new_source + doc_id[len(source):] if doc_id.startswith(source) else f"{new_source}_{doc_id}"
+                for doc_id in current['ids']
+            ]
+            self.collection.upsert(
+                ids=new_ids,
+                documents=current['documents'],
+                embeddings=current['embeddings'],
+                metadatas=[dict(metadata, source=new_source) for metadata in current['metadatas']]
+            )
+            self.collection.delete(ids=current['ids'])
+            self.bm25.remove(current['ids'])
+            self.bm25.add(new_ids, current['documents'], new_source)
+            moved.extend(new_ids)
+        
+        self.sources.rename(source, new_source)
+        self.sources.discard(new_source, ids)
+        self.sources.add(new_source, moved)
+        self.sources.save()
+        self.bm25.save()
+        self._bump_version()
+        print(f"Moved {len(moved)} chunks from {source} to {new_source}")
+    
     def clear_all(self):
         """Clear all documents from the collection"""
         try:
             self.client.delete_collection(name=self.collection_name)
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=None
             )
+            self.sources.clear()
+            self.sources.save()
+            self.bm25.clear()
+            self.bm25.save()
+            self._bump_version()
             print("  RAG system cleared")
         except Exception as e:
             print(f"Error clearing RAG: {str(e)}")
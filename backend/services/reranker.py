@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class Reranker:
+    """Cross-encoder reranking of retrieved chunks
+
+    Retrieval over-fetches `candidates` chunks; the cross-encoder scores
+    every (query, chunk) pair in batches and the best `top_n` go into the
+    prompt. Scoring stops as soon as budget_ms is exceeded between batches,
+    and the chunks are then kept in retrieval order, so a slow CPU or a
+    burst of queries costs at most one batch over the budget. The model is
+    loaded lazily (or by warmup()) and its load time is never charged to a
+    query. A failed load is retried with exponential backoff (up to
+    retry_max_s apart); queries in between keep retrieval order.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        candidates: int = 40,
+        top_n: int = 5,
+        batch_size: int = 16,
+        max_length: int = 256,
+        budget_ms: float = 300,
+        device: Optional[str] = None,
+        retry_max_s: float = 300
+    ):
+        self.enabled = enabled
+        self.model_name = model_name
+        self.candidates = max(candidates, top_n)
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.budget_ms = budget_ms
+        self.device = device
+        self.retry_max_s = retry_max_s
+        self.model = None
+        self.load_failures = 0
+        self._retry_at = 0.0
+        # Loading can take seconds; counters use _lock so they never wait on it
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.reranked = 0
+        self.fallbacks = 0
+        self.pairs_scored = 0
+        # stage -> [count, total ms, max ms]
+        self._timings: Dict[str, List[float]] = {}
+
+    def _ensure_model(self):
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                raise RuntimeError(f"model load failed, retrying in {wait:.0f}s")
+
+            try:
+                from sentence_transformers import CrossEncoder
+
+                start = time.perf_counter()
+                self.model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+                print(f"✓ Reranker ready ({self.model_name}) in {time.perf_counter() - start:.1f}s")
+            except Exception:
+                self.load_failures += 1
+                self._retry_at = time.monotonic() + min(2 ** self.load_failures, self.retry_max_s)
+                raise
+
+    def warmup(self):
+        """Load the model ahead of the first query"""
+        if self.enabled:
+            self._ensure_model()
+            self.model.predict([("warmup", "warmup")], show_progress_bar=False)
+
+    def fetch_count(self) -> int:
+        """How many chunks retrieval should return for rerank() to choose from"""
+        return self.candidates if self.enabled else self.top_n
+
+    def rerank(self, query: str, chunks: List[Dict]) -> Tuple[List[Dict], Dict[str, Any]]:
+        """Best top_n chunks for query plus a timing/fallback report
+
+        Reranked chunks carry a 'rerank_score'. On fallback (budget
+        exceeded or model error) the first top_n chunks are returned as
+        retrieved.
+        """
+        if not self.enabled or len(chunks) <= 1:
+            return chunks[:self.top_n], {"reranked": False}
+
+        try:
+            self._ensure_model()
+        except Exception as e:
+            print(f"⚠️ Reranker unavailable, keeping retrieval order: {str(e)}")
+            with self._lock:
+                self.fallbacks += 1
+            return chunks[:self.top_n], {"reranked": False, "fallback": "model_unavailable"}
+
+        start = time.perf_counter()
+        pairs = [(query, chunk['content']) for chunk in chunks]
+        scores: List[np.ndarray] = []
+        fallback = None
+
+        try:
+            for i in range(0, len(pairs), self.batch_size):
+                if i and self.budget_ms and (time.perf_counter() - start) * 1000 > self.budget_ms:
+                    fallback = "budget"
+                    break
+                scores.append(np.asarray(
+                    self.model.predict(pairs[i:i + self.batch_size], batch_size=self.batch_size, show_progress_bar=False),
+                    dtype=np.float32
+                ))
+        except Exception as e:
+            print(f"⚠️ Rerank failed, keeping retrieval order: {str(e)}")
+            fallback = "error"
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        scored = sum(len(batch) for batch in scores)
+        self.record_stage("rerank", elapsed_ms)
+        with self._lock:
+            self.pairs_scored += scored
+            if fallback:
+                self.fallbacks += 1
+            else:
+                self.reranked += 1
+
+        report = {"reranked": fallback is None, "candidates": len(chunks), "scored": scored, "rerank_ms": round(elapsed_ms, 1)}
+        if fallback:
+            report["fallback"] = fallback
+            return chunks[:self.top_n], report
+
+        all_scores = np.concatenate(scores)
+        # Stable sort keeps retrieval order between equal scores
+        order = np.argsort(-all_scores, kind="stable")[:self.top_n]
+        return [dict(chunks[i], rerank_score=float(all_scores[i])) for i in order], report
+
+    def record_stage(self, stage: str, ms: float):
+        """Add a timing sample for a retrieval stage ("retrieve", "rerank")"""
+        with self._lock:
+            timing = self._timings.setdefault(stage, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += ms
+            timing[2] = max(timing[2], ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = {
+                stage: {"count": int(count), "avg_ms": round(total / count, 1), "max_ms": round(peak, 1)}
+                for stage, (count, total, peak) in self._timings.items()
+            }
+            reranked, fallbacks, pairs_scored = self.reranked, self.fallbacks, self.pairs_scored
+        return {
+            "enabled": self.enabled,
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "candidates": self.candidates,
+            "top_n": self.top_n,
+            "budget_ms": self.budget_ms,
+            "load_failures": self.load_failures,
+            "reranked": reranked,
+            "fallbacks": fallbacks,
+            "pairs_scored": pairs_scored,
+            "timings": timings
+        }
+
+
+reranker = Reranker(
+    enabled=os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes"),
+    model_name=os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    candidates=int(os.getenv("RERANK_CANDIDATES", "40")),
+    top_n=int(os.getenv("RERANK_TOP_N", "5")),
+    batch_size=int(os.getenv("RERANK_BATCH_SIZE", "16")),
+    max_length=int(os.getenv("RERANK_MAX_LENGTH", "256")),
+    budget_ms=float(os.getenv("RERANK_BUDGET_MS", "300")),
+    device=os.getenv("RERANK_DEVICE") or None,
+    retry_max_s=float(os.getenv("RERANK_RETRY_MAX_SECONDS", "300"))
+)
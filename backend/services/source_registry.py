@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+class SourceRegistry:
+    """Map each source PDF to its chunk ids, persisted in SQLite
+
+    Lets per-document listing and deletion cost O(chunks of that document)
+    instead of pulling the whole collection out of Chroma. Also records
+    per-source content info (file sha256, page text hashes) and aliases:
+    names whose upload was byte-identical to an already indexed source and
+    so share its chunks instead of having their own.
+
+    Reads are served from memory. Every change is written through to its
+    own rows in the same transaction, and save() commits it, so a write
+    costs O(ids changed) rather than re-serialising the corpus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sources: Dict[str, Set[str]] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (source TEXT NOT NULL, id TEXT NOT NULL, "
+            "PRIMARY KEY (source, id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (source TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, source TEXT NOT NULL)")
+        self._conn.commit()
+
+        # user_version is set by the first save(), so a registry whose
+        # initial build never finished is rebuilt rather than trusted
+        self.exists = self._conn.execute("PRAGMA user_version").fetchone()[0] > 0
+        if self.exists:
+            self._load()
+
+    def reload(self):
+        """Re-read every row, picking up changes other processes committed"""
+        with self._lock:
+            self._sources.clear()
+            self._info.clear()
+            self._load()
+
+    def _load(self):
+        for source, doc_id in self._conn.execute("SELECT source, id FROM chunks"):
+            self._sources.setdefault(source, set()).add(doc_id)
+        for source, data in self._conn.execute("SELECT source, data FROM info"):
+            self._info[source] = json.loads(data)
+        self._aliases = dict(self._conn.execute("SELECT alias, source FROM aliases"))
+
+    def add(self, source: str, ids: Iterable[str]):
+        ids = list(ids)
+        with self._lock:
+            self._sources.setdefault(source, set()).update(ids)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (source, id) VALUES (?, ?)", [(source, doc_id) for doc_id in ids]
+            )
+
+    def discard(self, source: str, ids: Iterable[str]):
+        ids = list(ids)
+        with self._lock:
+            self._sources.get(source, set()).difference_update(ids)
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE source = ? AND id = ?", [(source, doc_id) for doc_id in ids]
+            )
+
+    def get(self, source: str) -> List[str]:
+        with self._lock:
+            return list(self._sources.get(source, ()))
+
+    def remove(self, source: str) -> List[str]:
+        """Forget a source and return the chunk ids it had"""
+        with self._lock:
+            self._info.pop(source, None)
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM info WHERE source = ?", (source,))
+            return list(self._sources.pop(source, ()))
+
+    def sources(self) -> List[str]:
+        """Sources that own chunks (aliases excluded)"""
+        with self._lock:
+            return list(self._sources)
+
+    def names(self) -> List[str]:
+        """Every document name, aliases included"""
+        with self._lock:
+            return list(self._sources) + [alias for alias in self._aliases if alias not in self._sources]
+
+    def set_info(self, source: str, **info):
+        with self._lock:
+            merged = self._info.setdefault(source, {})
+            merged.update(info)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO info (source, data) VALUES (?, ?)", (source, json.dumps(merged))
+            )
+
+    def get_info(self, source: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._info.get(source, {}))
+
+    def find_by_hash(self, sha256: str) -> Optional[str]:
+        """Indexed source whose file content has this sha256, if any"""
+        with self._lock:
+            for source, info in self._info.items():
+                if info.get("sha256") == sha256 and source in self._sources:
+                    return source
+        return None
+
+    def add_alias(self, alias: str, source: str):
+        with self._lock:
+            target = self._aliases[alias] = self._aliases.get(source, source)
+            self._conn.execute("INSERT OR REPLACE INTO aliases (alias, source) VALUES (?, ?)", (alias, target))
+
+    def remove_alias(self, alias: str) -> bool:
+        with self._lock:
+            self._conn.execute("DELETE FROM aliases WHERE alias = ?", (alias,))
+            return self._aliases.pop(alias, None) is not None
+
+    def aliases_of(self, source: str) -> List[str]:
+        with self._lock:
+            return [alias for alias, target in self._aliases.items() if target == source]
+
+    def resolve(self, name: str) -> str:
+        """Source that holds the chunks for a document name"""
+        with self._lock:
+            return self._aliases.get(name, name)
+
+    def rename(self, source: str, new_name: str):
+        """Move a source's chunk ids and info to new_name, retargeting its aliases"""
+        with self._lock:
+            self._sources[new_name] = self._sources.pop(source, set())
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (new_name,))
+            self._conn.execute("UPDATE chunks SET source = ? WHERE source = ?", (new_name, source))
+            if source in self._info:
+                self._info[new_name] = self._info.pop(source)
+                self._conn.execute("DELETE FROM info WHERE source = ?", (new_name,))
+                self._conn.execute("UPDATE info SET source = ? WHERE source = ?", (new_name, source))
+            self._aliases.pop(new_name, None)
+            for alias, target in self._aliases.items():
+                if target == source:
+                    self._aliases[alias] = new_name
+            self._conn.execute("DELETE FROM aliases WHERE alias = ?", (new_name,))
+            self._conn.execute("UPDATE aliases SET source = ? WHERE source = ?", (new_name, source))
+
+    def clear(self):
+        with self._lock:
+            self._sources.clear()
+            self._info.clear()
+            self._aliases.clear()
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM info")
+            self._conn.execute("DELETE FROM aliases")
+
+    def save(self):
+        """Commit the changes since the last save in one transaction"""
+        with self._lock:
+            if not self.exists:
+                self._conn.execute("PRAGMA user_version = 1")
+            self._conn.commit()
+            self.exists = True
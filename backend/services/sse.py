@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+from typing import AsyncGenerator, AsyncIterable, List, Optional, Sequence, Tuple
+
+# (id, event, data) with data already serialised for the SSE data line
+Event = Tuple[str, str, str]
+
+
+def encode_frame(event_id: str, event: str, data: str) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+def encode_batch(batch: Sequence[Event]) -> bytes:
+    """Encode a batch as one chunk, merging runs of text events into one frame
+
+    Text data is a JSON string literal, so two deltas merge by joining
+    their escaped bodies; no decode/re-encode per token. The merged frame
+    takes the id of its last delta, which keeps Last-Event-ID resume exact.
+    """
+    frames: List[bytes] = []
+    run: List[str] = []
+    run_id = ""
+
+    for event_id, event, data in batch:
+        if event == "text" and len(data) >= 2 and data[0] == '"' and data[-1] == '"':
+            run.append(data[1:-1])
+            run_id = event_id
+            continue
+
+        if run:
+            frames.append(encode_frame(run_id, "text", '"' + "".join(run) + '"'))
+            run = []
+        frames.append(encode_frame(event_id, event, data))
+
+    if run:
+        frames.append(encode_frame(run_id, "text", '"' + "".join(run) + '"'))
+
+    return b"".join(frames)
+
+
+def _json_data(event: str, data: str) -> str:
+    """data as JSON: most events are serialised already, error/end are plain strings"""
+    if event != "error" and data[:1] in ('"', '{', '['):
+        return data
+    return json.dumps(data)
+
+
+def encode_multiplexed(batch: Sequence[Tuple[Optional[int], str, str]], fmt: str = "sse") -> bytes:
+    """Encode (index, event, data) events of several interleaved answers as one chunk
+
+    sse:    event: <event>, data: {"index": i, "data": ...}
+    ndjson: one {"index": i, "event": ..., "data": ...} object per line
+    Consecutive text deltas of the same answer are merged as in encode_batch.
+    """
+    merged: List[Tuple[Optional[int], str, str]] = []
+    for index, event, data in batch:
+        data = _json_data(event, data)
+        if event == "text" and data[0] == '"' and merged and merged[-1][:2] == (index, "text"):
+            merged[-1] = (index, "text", merged[-1][2][:-1] + data[1:])
+        else:
+            merged.append((index, event, data))
+
+    if fmt == "ndjson":
+        lines = [f'{{"index": {json.dumps(i)}, "event": {json.dumps(e)}, "data": {d}}}\n' for i, e, d in merged]
+    else:
+        lines = [f'event: {e}\ndata: {{"index": {json.dumps(i)}, "data": {d}}}\n\n' for i, e, d in merged]
+    return "".join(lines).encode()
+
+
+class SSECoalescer:
+    """Turn batches of job events into as few SSE writes as possible
+
+    After each write the stream waits window_ms so tokens pile up in the
+    job's buffer, then flushes them as one chunk. A chunk that already
+    reached max_bytes skips the wait. window_ms=0 disables coalescing:
+    one frame per event, as the stream used to behave.
+    """
+
+    def __init__(self, window_ms: float = 30.0, max_bytes: int = 16384):
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+
+    async def frames(self, batches: AsyncIterable[Sequence[Event]]) -> AsyncGenerator[bytes, None]:
+        async for batch in batches:
+            if self.window <= 0:
+                for event_id, event, data in batch:
+                    yield encode_frame(event_id, event, data)
+                continue
+
+            chunk = encode_batch(batch)
+            yield chunk
+
+            if len(chunk) < self.max_bytes and batch[-1][1] != "end":
+                await asyncio.sleep(self.window)
+
+
+sse_coalescer = SSECoalescer(
+    window_ms=float(os.getenv("SSE_COALESCE_MS", "30")),
+    max_bytes=int(os.getenv("SSE_COALESCE_BYTES", "16384"))
+)
@@ -55,5 +55,5 @@ def test_groq():
         print(f" Error: {e}")
         print(f"Error type: {type(e).__name__}")
 
-if __name__ == "__main__"):
+if __name__ == "__main__":
     test_groq()
\ No newline at end of file
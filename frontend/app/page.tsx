@@ -115,6 +115,7 @@ export default function Home() {
 
       let fullResponse = '';
       let componentReceived = false;
+      let errorReceived = false;
 
       eventSourceRef.current = connectSSE(job_id, {
         onToolCall: () => {
@@ -152,9 +153,10 @@ export default function Home() {
         },
 
         onEnd: async () => {
-          // If we already got a component from the stream, no need to generate another
-          if (componentReceived) {
-            console.log('✅ Stream complete with visualization');
+          // If we already got a component from the stream, or the answer
+          // failed, no need to generate another
+          if (componentReceived || errorReceived) {
+            console.log('✅ Stream complete');
             setStreamingPhase('idle');
             setStreaming(false);
             if (eventSourceRef.current) {
@@ -220,8 +222,11 @@ export default function Home() {
           hasStartedStreaming.current = false;
         },
 
-        onError: (error) => {
+        onError: (error, fatal) => {
           setError(error);
+          errorReceived = true;
+          // Keep listening: the rest of the answer and its end event follow
+          if (!fatal) return;
           setStreamingPhase('idle');
           setStreaming(false);
           if (eventSourceRef.current) {
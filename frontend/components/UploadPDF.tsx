@@ -45,7 +45,11 @@ export function UploadPDF() {
       }
 
       const data = await res.json();
-      setMessage(` Uploaded ${data.filename} (${data.pages} pages)`);
+      setMessage(
+        data.status === 'queued'
+          ? ` Uploaded ${data.filename}, indexing in background`
+          : ` ${data.filename}: ${data.message}`
+      );
       
       if (fileInputRef.current) {
         fileInputRef.current.value = '';
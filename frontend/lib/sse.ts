@@ -6,7 +6,9 @@ interface SSECallbacks {
   onCitation: (citation: any) => void;
   onComponent: (componentData: any) => void;
   onEnd: () => void;
-  onError: (error: string) => void;
+  // fatal: the stream is closed; otherwise the server reported an error and
+  // the stream continues until its end event
+  onError: (error: string, fatal: boolean) => void;
 }
 
 export function connectSSE(jobId: string, callbacks: SSECallbacks): EventSource {
@@ -78,19 +80,27 @@ export function connectSSE(jobId: string, callbacks: SSECallbacks): EventSource
 
   // Handle error event from server
   eventSource.addEventListener('error', (event: MessageEvent) => {
-    // This is a server-sent error event (different from connection error)
+    // This is a server-sent error event (different from connection error).
+    // Citations, components and end can still follow; only end closes.
     if (event.data) {
       console.error('❌ Server error:', event.data);
-      callbacks.onError(event.data);
+      callbacks.onError(event.data, false);
     }
   });
 
   // Handle connection errors
   eventSource.onerror = (error) => {
+    // Dropped mid-stream: let the browser reconnect, it sends Last-Event-ID
+    // and the server replays only the events we missed
+    if (!hasEnded && eventSource.readyState === EventSource.CONNECTING) {
+      console.log('🔁 SSE connection lost, reconnecting...');
+      return;
+    }
+
     // Only log error if stream hasn't ended normally
     if (!hasEnded) {
       console.error('❌ EventSource connection error:', error);
-      callbacks.onError('Connection failed');
+      callbacks.onError('Connection failed', true);
     } else {
       // Stream ended normally, connection close is expected
       console.log('🔌 SSE connection closed (normal)');
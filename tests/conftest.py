@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture
+def count_words():
+    """Token counter for chunking and packing tests: one token per word"""
+    def count(texts):
+        return [len(text.split()) for text in texts]
+    return count
@@ -0,0 +1,109 @@
+import pytest
+
+from backend.services.bm25 import BM25Index, tokenize
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add(
+        ["a1", "a2", "b1"],
+        ["Revenue grew in FY24 to 1,234.5 million", "Operating costs fell", "Revenue guidance for Q3"],
+        "a.pdf"
+    )
+    index.remove(["a2"])
+    return index
+
+
+def ids(results):
+    return [chunk_id for chunk_id, _ in results]
+
+
+def test_tokenize_keeps_numbers_and_drops_stopwords():
+    assert tokenize("The revenue in FY24 was 1,234.5") == ["revenue", "fy24", "1,234.5"]
+
+
+def test_search_ranks_matching_chunks():
+    index = BM25Index()
+    index.add(["x", "y"], ["revenue revenue growth", "revenue"], "a.pdf")
+
+    results = index.search("revenue growth", k=5)
+
+    assert ids(results) == ["x", "y"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_removed_chunks_are_tombstoned_not_returned(index):
+    assert len(index) == 2
+    assert index.stats()["tombstones"] == 1
+    assert index.search("operating costs") == []
+
+
+def test_readding_an_id_replaces_it(index):
+    index.add(["a1"], ["Headcount stayed flat"], "a.pdf")
+
+    assert index.search("fy24") == []
+    assert ids(index.search("headcount")) == ["a1"]
+    assert len(index) == 2
+
+
+def test_search_can_be_limited_to_sources():
+    index = BM25Index()
+    index.add(["a1"], ["revenue"], "a.pdf")
+    index.add(["b1"], ["revenue"], "b.pdf")
+
+    assert ids(index.search("revenue", sources=["b.pdf"])) == ["b1"]
+    assert index.search("revenue", sources=["missing.pdf"]) == []
+
+    index.remove_source("a.pdf")
+    assert ids(index.search("revenue")) == ["b1"]
+
+
+def test_compaction_drops_tombstones_and_keeps_scores(index):
+    index.add(["c1"], ["Revenue outlook"], "c.pdf")
+    index.remove(["b1"])
+    before = index.search("revenue", k=5)
+
+    index.compact()
+
+    stats = index.stats()
+    assert stats["tombstones"] == 0
+    assert stats["documents"] == 2
+    assert "operating" not in index.vocab
+    assert index.doc_ids == ["a1", "c1"]
+    after = index.search("revenue", k=5)
+    assert ids(after) == ids(before)
+    # Document frequencies no longer count the dropped chunks
+    assert after[0][1] != pytest.approx(before[0][1])
+
+
+def test_flush_compacts_and_round_trips(tmp_path, index):
+    path = str(tmp_path / "bm25.pkl")
+    index.path = path
+    index.compact_ratio = 0.1
+    index.version_fn = lambda: 7
+    index.flush_interval = 0
+
+    index.save()
+
+    assert index.stats()["tombstones"] == 0
+    assert index.version == 7
+    loaded = BM25Index(path)
+    assert loaded.exists
+    assert loaded.version == 7
+    assert len(loaded) == 2
+    assert loaded.search("revenue", k=5) == index.search("revenue", k=5)
+
+
+def test_save_is_deferred_until_flush(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.pkl"), flush_interval=60)
+    index.add(["a1"], ["revenue"], "a.pdf")
+
+    index.save()
+    assert index.stats()["unsaved_changes"]
+    assert not (tmp_path / "bm25.pkl").exists()
+
+    index.flush()
+    assert not index.stats()["unsaved_changes"]
+    assert index.stats()["flushes"] == 1
+    assert len(BM25Index(str(tmp_path / "bm25.pkl"))) == 1
@@ -0,0 +1,109 @@
+import pytest
+
+from backend.services.chunking import Chunker
+
+
+@pytest.fixture
+def make_chunker(count_words):
+    def make(strategy="sentence", chunk_tokens=10, overlap=0, **kwargs):
+        return Chunker(
+            strategy=strategy, chunk_tokens=chunk_tokens, overlap=overlap, count_tokens=count_words, **kwargs
+        )
+    return make
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        Chunker(strategy="lines")
+
+
+def test_word_chunks_stay_on_their_page(make_chunker):
+    chunker = make_chunker("words", chunk_words=3)
+
+    chunks = list(chunker.chunk([(1, "a b c d"), (2, "e f")]))
+
+    assert [chunk["content"] for chunk in chunks] == ["a b c", "d", "e f"]
+    assert [chunk["page"] for chunk in chunks] == [1, 1, 2]
+    assert [chunk["metadata"]["chunk_index"] for chunk in chunks] == [0, 1, 0]
+
+
+def test_sentences_are_packed_whole_within_the_budget(make_chunker):
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+
+    chunks = list(make_chunker(chunk_tokens=7).chunk([(1, text)]))
+
+    assert [chunk["content"] for chunk in chunks] == [
+        "One two three. Four five six.",
+        "Seven eight nine. Ten eleven twelve."
+    ]
+    assert all(chunk["metadata"]["tokens"] <= 7 for chunk in chunks)
+    assert [chunk["metadata"]["chunk_index"] for chunk in chunks] == [0, 1]
+
+
+def test_pages_open_with_the_end_of_the_page_before_and_record_the_span(make_chunker):
+    chunker = make_chunker(chunk_tokens=10, overlap=3)
+
+    chunks = list(chunker.chunk([(1, "Alpha beta gamma."), (2, "Delta epsilon.")]))
+
+    assert [chunk["content"] for chunk in chunks] == ["Alpha beta gamma.", "Alpha beta gamma. Delta epsilon."]
+    assert chunks[1]["page"] == 1
+    assert chunks[1]["metadata"]["page_start"] == 1
+    assert chunks[1]["metadata"]["page_end"] == 2
+
+
+def test_editing_one_page_only_changes_its_chunks_and_the_next_pages_first(make_chunker):
+    pages = [(n, f"Page {n} opens here. It has a middle part. It closes on page {n}.") for n in range(1, 7)]
+    edited = list(pages)
+    edited[2] = (3, "Page 3 was rewritten. It is now longer than before. Much longer. It now ends on page 3.")
+    chunker = make_chunker(chunk_tokens=12, overlap=5)
+
+    before = {chunk["content"] for chunk in chunker.chunk(pages)}
+    changed = [chunk for chunk in chunker.chunk(edited) if chunk["content"] not in before]
+
+    assert changed
+    assert {chunk["metadata"]["page_end"] for chunk in changed} == {3, 4}
+    assert [chunk["metadata"]["chunk_index"] for chunk in changed if chunk["metadata"]["page_end"] == 4] == [0]
+
+
+def test_overlap_repeats_whole_trailing_sentences(make_chunker):
+    text = "A b c. D e f. G h i. J k l."
+
+    chunks = list(make_chunker(chunk_tokens=6, overlap=3).chunk([(1, text)]))
+
+    assert [chunk["content"] for chunk in chunks] == ["A b c. D e f.", "D e f. G h i.", "G h i. J k l."]
+
+
+def test_overlap_never_pushes_a_chunk_over_the_budget(make_chunker):
+    text = "A b. C d. E f g h."
+
+    chunks = list(make_chunker(chunk_tokens=5, overlap=2).chunk([(1, text)]))
+
+    assert [chunk["content"] for chunk in chunks] == ["A b. C d.", "E f g h."]
+    assert all(chunk["metadata"]["tokens"] <= 5 for chunk in chunks)
+
+
+def test_oversized_sentence_falls_back_to_words(make_chunker):
+    text = "one two three four five six seven."
+
+    chunks = list(make_chunker(chunk_tokens=3).chunk([(1, text)]))
+
+    assert [chunk["content"] for chunk in chunks] == ["one two three", "four five six", "seven."]
+
+
+def test_paragraphs_are_joined_with_blank_lines(make_chunker):
+    text = "First para here.\n\nSecond para.\n\nThird paragraph is long enough."
+
+    chunks = list(make_chunker("paragraph", chunk_tokens=6).chunk([(1, text)]))
+
+    assert [chunk["content"] for chunk in chunks] == [
+        "First para here.\n\nSecond para.",
+        "Third paragraph is long enough."
+    ]
+
+
+def test_model_limit_caps_the_budget(make_chunker):
+    chunker = make_chunker(chunk_tokens=100, max_tokens=4)
+
+    chunks = list(chunker.chunk([(1, "a b c d e f g h")]))
+
+    assert [chunk["content"] for chunk in chunks] == ["a b c d", "e f g h"]
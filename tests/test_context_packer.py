@@ -0,0 +1,114 @@
+import pytest
+
+from backend.services.context_packer import ContextPacker
+
+
+def no_header(index, chunk):
+    return ""
+
+
+def make_chunk(content, source="a.pdf", page=1, **extra):
+    return dict({"content": content, "metadata": {"source": source, "page": page}}, **extra)
+
+
+@pytest.fixture
+def make_packer(count_words):
+    def make(budget_tokens=100, min_chunk_tokens=1):
+        return ContextPacker(budget_tokens=budget_tokens, min_chunk_tokens=min_chunk_tokens, count_tokens=count_words)
+    return make
+
+
+def packed_tokens(packed, overhead=2):
+    return sum(len(chunk["content"].split()) + overhead for chunk in packed)
+
+
+def test_untouched_chunks_keep_their_content(make_packer):
+    chunks = [make_chunk("Revenue grew.\nCosts fell."), make_chunk("Margins widened.")]
+
+    packed = make_packer().pack(chunks, header=no_header)
+
+    assert [chunk["content"] for chunk in packed] == ["Revenue grew.\nCosts fell.", "Margins widened."]
+    assert not any(chunk["truncated"] for chunk in packed)
+
+
+def test_sentences_repeated_by_overlapping_chunks_are_dropped(make_packer):
+    packer = make_packer()
+    chunks = [make_chunk("A b c. D e f."), make_chunk("d  E f. G h i.")]
+
+    packed = packer.pack(chunks, header=no_header)
+
+    assert [chunk["content"] for chunk in packed] == ["A b c. D e f.", "G h i."]
+    assert packer.stats()["sentences_deduped"] == 1
+
+
+def test_rerank_scores_set_the_order(make_packer):
+    chunks = [make_chunk("Low.", rerank_score=0.1), make_chunk("High.", rerank_score=0.9)]
+
+    packed = make_packer().pack(chunks, header=no_header)
+
+    assert [chunk["content"] for chunk in packed] == ["High.", "Low."]
+
+
+def test_partial_rerank_scores_keep_retrieval_order(make_packer):
+    chunks = [make_chunk("First.", rerank_score=0.1), make_chunk("Second.")]
+
+    packed = make_packer().pack(chunks, header=no_header)
+
+    assert [chunk["content"] for chunk in packed] == ["First.", "Second."]
+
+
+def test_chunk_is_cut_after_its_last_whole_sentence_that_fits(make_packer):
+    packer = make_packer(budget_tokens=9)
+    chunks = [make_chunk("A b c. D e f. G h i.")]
+
+    packed = packer.pack(chunks, header=no_header)
+
+    assert packed[0]["content"] == "A b c. D e f."
+    assert packed[0]["truncated"] is True
+    assert packer.stats()["chunks_truncated"] == 1
+
+
+def test_lone_long_sentence_is_cut_between_words(make_packer):
+    packed = make_packer(budget_tokens=6).pack([make_chunk("One two three four five six seven.")], header=no_header)
+
+    assert packed[0]["content"] == "One two three four"
+    assert packed[0]["truncated"] is True
+
+
+def test_headers_count_against_the_budget(make_packer):
+    packer = make_packer(budget_tokens=25)
+    chunks = [make_chunk("A b c d e f."), make_chunk("G h i j k l.")]
+
+    packed = packer.pack(chunks)
+
+    # The default header "[1] Source: a.pdf, Page 1" is 5 words, plus 2 for the separators
+    assert [chunk["content"] for chunk in packed] == ["A b c d e f.", "G h i j k"]
+    assert packer.stats()["tokens_packed"] == 25
+
+
+def test_packing_never_exceeds_the_budget_and_drops_what_cannot_fit(make_packer):
+    packer = make_packer(budget_tokens=12, min_chunk_tokens=4)
+    chunks = [make_chunk("A b c d e f g."), make_chunk("H i j k."), make_chunk("L m n o.")]
+
+    packed = packer.pack(chunks, header=no_header)
+
+    assert packed_tokens(packed) <= 12
+    assert [chunk["content"] for chunk in packed] == ["A b c d e f g."]
+    assert packer.stats()["chunks_dropped"] == 2
+
+
+def test_untracked_packs_leave_the_stats_alone(make_packer):
+    packer = make_packer()
+
+    packer.pack([make_chunk("A b c.")], header=no_header, track=False)
+
+    assert packer.stats()["prompts_packed"] == 0
+    assert packer.pack([], header=no_header) == []
+
+
+def test_truncate_keeps_leading_whole_sentences(make_packer):
+    packer = make_packer()
+
+    assert packer.truncate("A b c. D e f.", 6) == "A b c. D e f."
+    assert packer.truncate("A b c. D e f.", 5) == "A b c."
+    assert packer.truncate("One two three four.", 2) == "One two"
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+import pytest
+
+from backend.services import job_manager as job_manager_module
+from backend.services.job_manager import JobManager
+
+
+class Clock:
+    """Stands in for the time module so expiry can be stepped by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_manager_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def manager(monkeypatch, clock):
+    # JobManager is a process-wide singleton; give it fresh state per test
+    manager = JobManager()
+    monkeypatch.setattr(manager, "_jobs", OrderedDict())
+    monkeypatch.setattr(manager, "_expiry", [])
+    monkeypatch.setattr(manager, "max_jobs", 3)
+    monkeypatch.setattr(manager, "ttl", 60.0)
+    return manager
+
+
+def test_least_recently_used_job_is_evicted_at_capacity(manager):
+    first, second, third = (manager.create_job(f"q{i}") for i in range(3))
+    manager.get_job(first)
+
+    fourth = manager.create_job("q3")
+
+    assert manager.count() == 3
+    assert manager.get_job(second) is None
+    assert all(manager.get_job(job_id) is not None for job_id in (first, third, fourth))
+
+
+def test_status_update_counts_as_use(manager):
+    first, second, _ = (manager.create_job(f"q{i}") for i in range(3))
+    manager.update_status(first, "processing")
+
+    manager.create_job("q3")
+
+    assert manager.get_job(first).status == "processing"
+    assert manager.get_job(second) is None
+
+
+def test_jobs_expire_ttl_after_their_last_update(manager, clock):
+    idle = manager.create_job("idle")
+    active = manager.create_job("active")
+
+    clock.now += 50
+    manager.update_status(active, "processing")
+    clock.now += 20
+
+    assert manager.cleanup_expired() == 1
+    assert manager.get_job(idle) is None
+    assert manager.get_job(active) is not None
+
+    clock.now += 50
+    assert manager.cleanup_expired() == 1
+    assert manager.count() == 0
+
+
+def test_stale_expiry_entries_are_compacted(manager, clock, monkeypatch):
+    monkeypatch.setattr(manager, "max_jobs", 10000)
+    job_id = manager.create_job("busy")
+    for _ in range(5000):
+        manager.update_status(job_id, "processing")
+
+    assert manager.cleanup_expired() == 0
+    assert manager._expiry == [(manager.get_job(job_id).expires_at, job_id)]
+
+
+def test_list_jobs_pages_most_recent_first(manager):
+    first, second, third = (manager.create_job(f"q{i}") for i in range(3))
+    manager.update_status(first, "completed")
+
+    assert [job["id"] for job in manager.list_jobs()] == [first, third, second]
+    assert [job["id"] for job in manager.list_jobs(offset=1, limit=1)] == [third]
+
+
+def test_delete_job(manager):
+    job_id = manager.create_job("q")
+
+    manager.delete_job(job_id)
+    manager.delete_job(job_id)
+
+    assert manager.get_job(job_id) is None
+    assert manager.count() == 0
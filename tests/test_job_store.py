@@ -0,0 +1,120 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("fakeredis")
+
+from backend.services.job_store import JobStore, RedisJobStore
+
+
+@pytest.fixture
+async def store():
+    store = RedisJobStore("fakeredis://", prefix=f"test-{uuid.uuid4().hex[:8]}:", block_ms=50)
+    yield store
+    await store.stop()
+
+
+async def collect(store, job_id, last_event_id=None):
+    return [entry async for batch in store.subscribe(job_id, last_event_id) for entry in batch]
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+
+async def test_job_lifecycle(store):
+    job_id = await store.create_job("What was revenue?")
+
+    job = await store.get_job(job_id)
+    assert job["query"] == "What was revenue?"
+    assert job["status"] == "pending"
+    assert job["cache_hit"] is False
+
+    await store.update_status(job_id, "processing")
+    await store.set_cache_hit(job_id)
+    job = await store.get_job(job_id)
+    assert job["status"] == "processing"
+    assert job["cache_hit"] is True
+
+    assert await store.count() == 1
+    assert [job["id"] for job in await store.list_jobs()] == [job_id]
+
+    await store.delete_job(job_id)
+    assert await store.get_job(job_id) is None
+    assert not await store.exists(job_id)
+
+
+async def test_subscribe_stops_at_close_marker(store):
+    job_id = await store.create_job("q")
+    for event, data in [("tool_call", "{}"), ("text", '"Revenue"'), ("end", "complete")]:
+        await store.publish(job_id, event, data)
+    await store.close_stream(job_id)
+
+    entries = await collect(store, job_id)
+
+    assert [(event, data) for _, event, data in entries] == [
+        ("tool_call", "{}"), ("text", '"Revenue"'), ("end", "complete")
+    ]
+    assert all(RedisJobStore.STREAM_ID.match(entry_id) for entry_id, _, _ in entries)
+    assert RedisJobStore.CLOSE_EVENT not in [event for _, event, _ in entries]
+
+
+async def test_subscribe_resumes_after_last_event_id(store):
+    job_id = await store.create_job("q")
+    for i in range(5):
+        await store.publish(job_id, "text", f'"{i}"')
+    await store.close_stream(job_id)
+
+    entries = await collect(store, job_id)
+    resumed = await collect(store, job_id, last_event_id=entries[1][0])
+
+    assert [data for _, _, data in resumed] == ['"2"', '"3"', '"4"']
+    assert resumed == entries[2:]
+
+
+async def test_invalid_last_event_id_replays_from_start(store):
+    job_id = await store.create_job("q")
+    await store.publish(job_id, "text", '"a"')
+    await store.close_stream(job_id)
+
+    entries = await collect(store, job_id, last_event_id="not-an-id")
+
+    assert [data for _, _, data in entries] == ['"a"']
+
+
+async def test_subscribe_tails_events_published_later(store):
+    job_id = await store.create_job("q")
+    reader = asyncio.create_task(collect(store, job_id))
+
+    # Longer than block_ms, so the reader has to go round XREAD BLOCK again
+    await asyncio.sleep(0.15)
+    await store.publish(job_id, "text", '"late"')
+    await store.publish(job_id, "end", "complete")
+    await store.close_stream(job_id)
+
+    entries = await asyncio.wait_for(reader, timeout=5)
+    assert [(event, data) for _, event, data in entries] == [("text", '"late"'), ("end", "complete")]
+
+
+async def test_subscribe_returns_when_job_is_deleted(store):
+    job_id = await store.create_job("q")
+    await store.publish(job_id, "text", '"a"')
+    reader = asyncio.create_task(collect(store, job_id))
+
+    await asyncio.sleep(0.1)
+    await store.delete_job(job_id)
+
+    entries = await asyncio.wait_for(reader, timeout=5)
+    assert [data for _, _, data in entries] == ['"a"']
+
+
+async def test_finished_job_without_stream_gets_terminal_events(store):
+    job_id = await store.create_job("q")
+    await store.update_status(job_id, "completed")
+
+    entries = await asyncio.wait_for(collect(store, job_id), timeout=5)
+
+    assert [event for _, event, _ in entries] == ["error", "end"]
+    assert "completed" in entries[0][2]
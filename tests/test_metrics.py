@@ -0,0 +1,82 @@
+import pytest
+
+from backend.services.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def samples(lines):
+    """sample name with labels -> value, skipping HELP/TYPE lines"""
+    return dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage="retrieval")
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP latency_seconds Latency", "# TYPE latency_seconds histogram"]
+    assert samples(lines) == {
+        'latency_seconds_bucket{stage="retrieval",le="0.1"}': "2",
+        'latency_seconds_bucket{stage="retrieval",le="1"}': "3",
+        'latency_seconds_bucket{stage="retrieval",le="+Inf"}': "4",
+        'latency_seconds_sum{stage="retrieval"}': "2.65",
+        'latency_seconds_count{stage="retrieval"}': "4"
+    }
+
+
+def test_histogram_keeps_one_series_per_label_set_and_skips_empty_labels():
+    histogram = Histogram("ingest_seconds", "Ingest", ["stage", "outcome"], buckets=(1.0,))
+
+    histogram.observe(0.5, stage="embed")
+    histogram.observe(3, stage="total", outcome="failed")
+
+    rendered = samples(histogram.render())
+    assert rendered['ingest_seconds_bucket{stage="embed",le="1"}'] == "1"
+    assert rendered['ingest_seconds_count{stage="embed"}'] == "1"
+    assert rendered['ingest_seconds_bucket{stage="total",outcome="failed",le="1"}'] == "0"
+    assert rendered['ingest_seconds_sum{stage="total",outcome="failed"}'] == "3"
+
+
+def test_histogram_timer_observes_the_block():
+    histogram = Histogram("block_seconds", "Block", buckets=(60.0,))
+
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError("still timed")
+
+    assert samples(histogram.render())["block_seconds_count"] == "1"
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ["reason"])
+
+    counter.inc(reason='bad "quote"\nand \\ slash')
+
+    assert samples(counter.render()) == {'errors_total{reason="bad \\"quote\\"\\nand \\\\ slash"}': "1"}
+
+
+def test_unlabelled_metrics_render_zero_before_first_use():
+    assert samples(Counter("tokens_total", "Tokens").render()) == {"tokens_total": "0"}
+    assert samples(Counter("jobs_total", "Jobs", ["outcome"]).render()) == {}
+
+
+def test_gauge_tracks_blocks_in_flight():
+    gauge = Gauge("streams", "Open streams", ["endpoint"])
+
+    with gauge.track(endpoint="stream"):
+        assert samples(gauge.render()) == {'streams{endpoint="stream"}': "1"}
+    assert samples(gauge.render()) == {'streams{endpoint="stream"}': "0"}
+
+
+def test_registry_prefixes_names_and_returns_existing_metrics():
+    registry = MetricsRegistry(prefix="app_")
+    counter = registry.counter("requests_total", "Requests")
+
+    assert registry.counter("requests_total", "Requests") is counter
+    counter.inc(2)
+    registry.gauge("queue_depth", "Queue").set(1.5)
+
+    text = registry.render()
+    assert text.endswith("\n")
+    assert samples(text.splitlines()) == {"app_requests_total": "2", "app_queue_depth": "1.5"}
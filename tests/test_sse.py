@@ -0,0 +1,100 @@
+import json
+
+from backend.services.sse import SSECoalescer, encode_batch, encode_multiplexed
+
+
+def parse_sse(payload: bytes):
+    frames = []
+    for block in payload.decode().split("\n\n"):
+        if block:
+            frames.append(dict(line.split(": ", 1) for line in block.split("\n")))
+    return frames
+
+
+def text_event(event_id, text):
+    return (event_id, "text", json.dumps(text))
+
+
+def test_text_runs_merge_into_one_frame_with_the_last_id():
+    deltas = ['He said "hi"', "\n", "café — ", "a\\", "n", "\U0001F600"]
+    batch = [text_event(str(i), delta) for i, delta in enumerate(deltas, 1)]
+
+    frames = parse_sse(encode_batch(batch))
+
+    assert len(frames) == 1
+    assert frames[0]["id"] == "6"
+    assert frames[0]["event"] == "text"
+    assert json.loads(frames[0]["data"]) == "".join(deltas)
+
+
+def test_other_events_break_text_runs_and_keep_their_order():
+    batch = [
+        text_event("1", "Rev"),
+        text_event("2", "enue"),
+        ("3", "citation", json.dumps({"page": 4})),
+        text_event("4", " grew"),
+        ("5", "end", "complete")
+    ]
+
+    frames = parse_sse(encode_batch(batch))
+
+    assert [(f["id"], f["event"]) for f in frames] == [("2", "text"), ("3", "citation"), ("4", "text"), ("5", "end")]
+    assert json.loads(frames[0]["data"]) == "Revenue"
+    assert json.loads(frames[1]["data"]) == {"page": 4}
+    assert frames[3]["data"] == "complete"
+
+
+def test_multiplexed_text_merges_only_within_one_answer():
+    batch = [
+        (0, "text", json.dumps("a\"")),
+        (0, "text", json.dumps("b\n")),
+        (1, "text", json.dumps("x")),
+        (0, "text", json.dumps("c")),
+        (0, "error", "Retrieval failed"),
+        (None, "batch_end", json.dumps({"completed": 1}))
+    ]
+
+    frames = parse_sse(encode_multiplexed(batch))
+
+    assert [f["event"] for f in frames] == ["text", "text", "text", "error", "batch_end"]
+    payloads = [json.loads(f["data"]) for f in frames]
+    assert payloads[0] == {"index": 0, "data": "a\"b\n"}
+    assert payloads[1] == {"index": 1, "data": "x"}
+    assert payloads[2] == {"index": 0, "data": "c"}
+    assert payloads[3] == {"index": 0, "data": "Retrieval failed"}
+    assert payloads[4] == {"index": None, "data": {"completed": 1}}
+
+
+def test_multiplexed_ndjson_is_one_object_per_line():
+    batch = [(2, "text", json.dumps("to")), (2, "text", json.dumps("ken")), (2, "end", "completed")]
+
+    lines = encode_multiplexed(batch, fmt="ndjson").decode().splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {"index": 2, "event": "text", "data": "token"},
+        {"index": 2, "event": "end", "data": "completed"}
+    ]
+
+
+async def batches(*items):
+    for item in items:
+        yield item
+
+
+async def test_coalescer_without_window_sends_one_frame_per_event():
+    coalescer = SSECoalescer(window_ms=0)
+
+    chunks = [chunk async for chunk in coalescer.frames(batches([text_event("1", "a"), text_event("2", "b")]))]
+
+    assert len(chunks) == 2
+    assert [f["id"] for chunk in chunks for f in parse_sse(chunk)] == ["1", "2"]
+
+
+async def test_coalescer_writes_one_chunk_per_batch():
+    coalescer = SSECoalescer(window_ms=1)
+    first = [text_event("1", "a"), text_event("2", "b")]
+    last = [text_event("3", "c"), ("4", "end", "complete")]
+
+    chunks = [chunk async for chunk in coalescer.frames(batches(first, last))]
+
+    assert chunks == [encode_batch(first), encode_batch(last)]